@@ -1,11 +1,13 @@
 import asyncio
-from datetime import datetime
 
-import pandas as pd
-from fastapi import APIRouter
+from fastapi import APIRouter, Query
+from fastapi.responses import Response
 
+from app import cache
+from app.api.utils import JSONArrayResponse, JSONResponse
 from app.db import db
 from app.services import run_pipeline
+from app.services.utils import utilities as utils
 
 router = APIRouter()
 
@@ -16,20 +18,27 @@ async def start_betting_lines_pipeline():
     return {'message': 'Betting lines pipeline started.'}
 
 
+@router.get('/metrics')
+async def metrics():
+    return Response(utils.instrumenter.render(), media_type='text/plain; version=0.0.4; charset=utf-8')
+
+
 def _to_dict(**kwargs):
     return {k: v for k, v in kwargs.items() if v is not None}
 
 
 @router.get('/betting_lines')
-async def betting_lines(bookmaker: str | None = None, league: str | None = None, subject: str | None = None):
+async def betting_lines(bookmaker: str | None = None, league: str | None = None, subject: str | None = None,
+                        min_ev: float | None = None, limit: int = Query(20, ge=1, le=500), offset: int = Query(0, ge=0)):
     query = _to_dict(bookmaker=bookmaker, league=league, subject=subject)
-    if most_recent_betting_lines := await db.betting_lines.get_betting_lines(query, most_recent=True):
-        most_recent_betting_lines.sort(key=lambda x: x['ev'], reverse=True)  # Todo: set up an index in mongodb for this
-        most_recent_betting_lines_df = pd.DataFrame(most_recent_betting_lines)
-        most_recent_betting_lines_df['batch_timestamp'] = most_recent_betting_lines_df['batch_timestamp'].astype(str)
-        most_recent_betting_lines_df['collection_timestamp'] = most_recent_betting_lines_df['collection_timestamp'].astype(str)
-        return (
-            most_recent_betting_lines_df.head(20).to_dict(orient='records')
-        )
+    # the cache is ranked per league only, queries by bookmaker or subject (and cache misses) go to mongo
+    if (not (bookmaker or subject)) and ((cached_betting_lines := await cache.betting_lines.get_top_betting_lines(
+            league, min_ev=min_ev, limit=limit, offset=offset)) is not None):
+        if cached_betting_lines:
+            return JSONArrayResponse(cached_betting_lines)
+
+    elif top_betting_lines := await db.betting_lines.get_top_betting_lines(query, min_ev=min_ev, limit=limit,
+                                                                            offset=offset):
+        return JSONResponse(top_betting_lines)
 
     return {'message': f'No betting lines found for query: {query}.'}
@@ -0,0 +1,37 @@
+from fastapi.testclient import TestClient
+
+from app import cache, main
+from app.db import db
+from app.main import app
+
+
+def test_betting_lines_are_served_from_the_cache_and_fall_back_to_mongo(monkeypatch):
+    cache_calls, mongo_calls = [], []
+
+    async def get_cached_top_betting_lines(league, min_ev=None, limit=20, offset=0):
+        cache_calls.append((league, min_ev, limit, offset))
+        return {'NBA': [b'{"subject":"cached"}'], 'NHL': []}.get(league)
+
+    async def get_top_betting_lines(query, min_ev=None, limit=20, offset=0):
+        mongo_calls.append(query)
+        return [{'subject': 'stored'}]
+
+    async def create_indexes():
+        pass
+
+    monkeypatch.setattr(main, '_create_indexes', create_indexes)  # no mongo to create them on
+    monkeypatch.setattr(cache.betting_lines, 'get_top_betting_lines', get_cached_top_betting_lines)
+    monkeypatch.setattr(db.betting_lines, 'get_top_betting_lines', get_top_betting_lines)
+    with TestClient(app) as client:
+        assert client.get('/betting_lines', params={'league': 'NBA', 'min_ev': 0.1, 'limit': 5}).json() == [{'subject': 'cached'}]
+        assert cache_calls == [('NBA', 0.1, 5, 0)]
+        assert not mongo_calls
+
+        # a hit without lines above min_ev is not looked up again in mongo
+        assert 'message' in client.get('/betting_lines', params={'league': 'NHL'}).json()
+        assert not mongo_calls
+
+        assert client.get('/betting_lines', params={'league': 'NCAAM'}).json() == [{'subject': 'stored'}]  # a miss
+        assert client.get('/betting_lines', params={'subject': 'Alex Sarr'}).json() == [{'subject': 'stored'}]
+        assert mongo_calls == [{'league': 'NCAAM'}, {'subject': 'Alex Sarr'}]
+        assert len(cache_calls) == 3  # queries by subject are not cached
@@ -1 +1,2 @@
-from .helpers import get_query, get_sample_betting_lines
\ No newline at end of file
+from .helpers import get_query, get_sample_betting_lines
+from .responses import JSONArrayResponse, JSONResponse
@@ -0,0 +1,22 @@
+from typing import Any
+
+from fastapi.responses import Response
+
+from app.services.utils import utilities as utils
+
+
+class JSONResponse(Response):
+    # rendered with the shared (orjson/msgspec/json) serializer, return it directly to skip fastapi's jsonable_encoder
+    media_type = 'application/json'
+
+    def render(self, content: Any) -> bytes:
+        return utils.serializer.dumps(content)
+
+
+
+class JSONArrayResponse(Response):
+    # for items that are already serialized (e.g. cached lines), joined into an array without decoding them
+    media_type = 'application/json'
+
+    def render(self, content: list[bytes]) -> bytes:
+        return b'[' + b','.join(content) + b']'
@@ -0,0 +1,136 @@
+import heapq
+import logging
+
+try:
+    from redis.exceptions import RedisError
+except ImportError:  # without redis there is no client, so nothing to catch
+    RedisError = ()
+
+from app.db.collections import betting_lines as db_betting_lines  # the module, app.db imports app.services first
+from app.services.utils import utilities as utils
+from app.services.utils.modelling import BettingLine
+from app.services.utils.serializing import Serializing
+
+
+logger = logging.getLogger(__name__)
+
+LEAGUES_KEY = 'betting_lines:leagues'
+
+
+def _get_ev_key(league: str) -> str:
+    return f'betting_lines:{league}:ev'
+
+
+def _get_snapshots_key(league: str) -> str:
+    return f'betting_lines:{league}:snapshots'
+
+
+class BettingLinesCache:
+    # the latest snapshot of every line, written through by the pipeline after each stored batch, per league:
+    #   betting_lines:{league}:ev         sorted set, line id -> ev
+    #   betting_lines:{league}:snapshots  hash, line id -> the line serialized as /betting_lines returns it
+    # so a top n read is a range over the sorted set plus one hmget instead of a mongo query. a batch replaces its
+    # league's keys in one transaction, readers see either the previous batch or this one. the keys expire ttl seconds
+    # after the league's last batch, so a stopped pipeline turns into misses (served from mongo) instead of stale lines.
+    # without a client (redis not installed or caching disabled) every read is a miss and writes are skipped
+
+    def __init__(self, r, serializer: Serializing, ttl: int):
+        self._r = r
+        self.serializer = serializer
+        self.ttl = ttl
+
+    def _serialize(self, betting_line: BettingLine) -> bytes:
+        return self.serializer.dumps(db_betting_lines.BettingLines.get_latest_doc(betting_line))
+
+    async def store_betting_lines(self, league: str, betting_lines: list[BettingLine]) -> None:
+        if self._r is None:
+            return
+
+        try:
+            await self._store_betting_lines(league, betting_lines)
+
+        except RedisError:  # mongo has the batch, the league is served from there once its keys expire
+            logger.exception('Could not cache betting lines', extra={'league': league})
+
+    async def _store_betting_lines(self, league: str, betting_lines: list[BettingLine]) -> None:
+        # lines without an ev are never served, on a hit or from mongo (see BettingLines.get_top_betting_lines)
+        betting_lines = [betting_line for betting_line in betting_lines if betting_line.ev is not None]
+        ev_key, snapshots_key = _get_ev_key(league), _get_snapshots_key(league)
+        async with self._r.pipeline(transaction=True) as pipe:
+            pipe.delete(ev_key, snapshots_key)
+            if betting_lines:
+                pipe.zadd(ev_key, { betting_line.id: betting_line.ev for betting_line in betting_lines })
+                pipe.hset(snapshots_key, mapping={ betting_line.id: self._serialize(betting_line) for betting_line in betting_lines })
+                pipe.expire(ev_key, self.ttl)
+                pipe.expire(snapshots_key, self.ttl)
+                pipe.sadd(LEAGUES_KEY, league)
+                pipe.expire(LEAGUES_KEY, self.ttl)
+            else:  # only leagues with a sorted set are listed
+                pipe.srem(LEAGUES_KEY, league)
+
+            await pipe.execute()
+
+    async def _get_top_line_ids(self, league: str, min_ev: float | None, num_lines: int) -> list[tuple[float, bytes]] | None:
+        ev_key = _get_ev_key(league)
+        async with self._r.pipeline(transaction=False) as pipe:
+            pipe.exists(ev_key)
+            pipe.zrevrangebyscore(ev_key, '+inf', '-inf' if min_ev is None else min_ev, start=0, num=num_lines, withscores=True)
+            is_cached, top_line_ids = await pipe.execute()
+
+        return [(ev, line_id) for line_id, ev in top_line_ids] if is_cached else None
+
+    async def get_top_betting_lines(self, league: str = None, min_ev: float = None, limit: int = 20,
+                                    offset: int = 0) -> list[bytes] | None:
+        # the serialized lines, ev descending, or None on a miss (nothing cached for the league, or any league when
+        # no league is asked for)
+        if self._r is None:
+            return None
+
+        try:
+            top_betting_lines = await self._get_top_betting_lines(league, min_ev, limit, offset)
+
+        except RedisError:
+            logger.warning('Could not read cached betting lines', exc_info=True, extra={'league': league})
+            top_betting_lines = None
+
+        utils.instrumenter.inc('cache_requests_total', cache='betting_lines', hit=top_betting_lines is not None)
+        return top_betting_lines
+
+    async def _get_top_betting_lines(self, league: str | None, min_ev: float | None, limit: int,
+                                     offset: int) -> list[bytes] | None:
+        league_is_asked_for = league is not None
+        leagues = [league] if league else [league.decode('utf-8') for league in await self._r.smembers(LEAGUES_KEY)]
+        if not leagues:
+            return None
+
+        top_line_ids_by_league = {}
+        for league in leagues:
+            if (top_line_ids := await self._get_top_line_ids(league, min_ev, offset + limit)) is not None:
+                top_line_ids_by_league[league] = top_line_ids
+
+            elif league_is_asked_for:  # across leagues, one whose lines expired just has none left to serve
+                return None
+
+        if not top_line_ids_by_league:
+            return None
+
+        # each league's lines are already in ev order, so across leagues it is a merge of the first offset + limit
+        top_line_ids = list(heapq.merge(
+            *([(-ev, line_id, league) for ev, line_id in league_top_line_ids]
+              for league, league_top_line_ids in top_line_ids_by_league.items())
+        ))[offset:offset + limit]
+        if not top_line_ids:
+            return []
+
+        line_ids_by_league = {}
+        for _, line_id, league in top_line_ids:
+            line_ids_by_league.setdefault(league, []).append(line_id)
+
+        snapshots = {}
+        for league, line_ids in line_ids_by_league.items():
+            snapshots.update(zip(line_ids, await self._r.hmget(_get_snapshots_key(league), line_ids)))
+
+        if any(snapshot is None for snapshot in snapshots.values()):  # a batch was written in between
+            return None
+
+        return [snapshots[line_id] for _, line_id, _ in top_line_ids]
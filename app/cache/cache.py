@@ -0,0 +1,15 @@
+try:
+    import redis.asyncio as redis
+except ImportError:
+    redis = None
+
+from app.cache.betting_lines import BettingLinesCache
+from app.services.configs import load_configs
+from app.services.utils import utilities as utils
+
+
+_configs = load_configs('caching')
+
+client = redis.Redis.from_url(_configs['url']) if (redis and _configs['enabled']) else None
+
+betting_lines = BettingLinesCache(client, utils.serializer, _configs['ttl'])
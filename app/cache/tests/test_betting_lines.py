@@ -0,0 +1,80 @@
+from datetime import datetime
+
+import pytest
+
+fakeredis = pytest.importorskip('fakeredis')
+
+from app.cache.betting_lines import BettingLinesCache
+from app.db.collections import BettingLines
+from app.services.utils import utilities as utils
+from app.services.utils.modelling import BettingLine
+
+
+def _betting_line(league: str, subject: str, ev: float | None) -> BettingLine:
+    return BettingLine(
+        batch_num=0,
+        batch_timestamp=datetime(2025, 1, 1),
+        collection_timestamp=datetime(2025, 1, 1),
+        bookmaker='FanDuel',
+        league=league,
+        market='Points',
+        subject=subject,
+        label='Over',
+        line=24.5,
+        odds=1.9,
+        impl_prb=0.5,
+        tw_prb=0.55,
+        ev=ev,
+    )
+
+
+@pytest.fixture
+def betting_lines_cache():
+    return BettingLinesCache(fakeredis.FakeAsyncRedis(), utils.serializer, ttl=60)
+
+
+def _get_subjects(cached_betting_lines: list[bytes]) -> list[str]:
+    return [utils.serializer.loads(betting_line)['subject'] for betting_line in cached_betting_lines]
+
+
+@pytest.mark.asyncio
+async def test_top_betting_lines_come_from_the_ev_sorted_sets(betting_lines_cache):
+    assert await betting_lines_cache.get_top_betting_lines('NBA') is None
+
+    nba_betting_lines = [_betting_line('NBA', subject, ev) for subject, ev in [('A', 0.1), ('B', 0.3), ('C', -0.2), ('D', None)]]
+    await betting_lines_cache.store_betting_lines('NBA', nba_betting_lines)
+    await betting_lines_cache.store_betting_lines('NCAAM', [_betting_line('NCAAM', 'E', 0.2)])
+
+    top_betting_lines = await betting_lines_cache.get_top_betting_lines('NBA')
+    assert _get_subjects(top_betting_lines) == ['B', 'A', 'C']
+    assert utils.serializer.loads(top_betting_lines[0]) == utils.serializer.loads(
+        utils.serializer.dumps(BettingLines.get_latest_doc(nba_betting_lines[1]))
+    )
+    assert _get_subjects(await betting_lines_cache.get_top_betting_lines('NBA', min_ev=0, limit=1, offset=1)) == ['A']
+    assert _get_subjects(await betting_lines_cache.get_top_betting_lines(limit=3)) == ['B', 'E', 'A']
+    assert _get_subjects(await betting_lines_cache.get_top_betting_lines(min_ev=0, offset=2)) == ['A']
+    assert await betting_lines_cache.get_top_betting_lines('NBA', min_ev=1) == []
+    assert await betting_lines_cache.get_top_betting_lines('NHL') is None
+
+    # a batch replaces its league's lines
+    await betting_lines_cache.store_betting_lines('NBA', [_betting_line('NBA', 'F', 0.05)])
+    assert _get_subjects(await betting_lines_cache.get_top_betting_lines()) == ['E', 'F']
+
+
+@pytest.mark.asyncio
+async def test_leagues_without_ev_lines_are_not_listed(betting_lines_cache):
+    await betting_lines_cache.store_betting_lines('NBA', [_betting_line('NBA', 'A', 0.1)])
+    await betting_lines_cache.store_betting_lines('NCAAM', [_betting_line('NCAAM', 'B', 0.2)])
+    await betting_lines_cache.store_betting_lines('NBA', [_betting_line('NBA', 'C', None)])
+    assert await betting_lines_cache.get_top_betting_lines('NBA') is None
+    assert _get_subjects(await betting_lines_cache.get_top_betting_lines()) == ['B']
+
+    await betting_lines_cache._r.delete('betting_lines:NCAAM:ev')  # expired
+    assert await betting_lines_cache.get_top_betting_lines() is None
+
+
+@pytest.mark.asyncio
+async def test_cache_is_a_miss_without_a_client():
+    betting_lines_cache = BettingLinesCache(None, utils.serializer, ttl=60)
+    await betting_lines_cache.store_betting_lines('NBA', [_betting_line('NBA', 'A', 0.1)])
+    assert await betting_lines_cache.get_top_betting_lines('NBA') is None
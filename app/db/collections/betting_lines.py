@@ -1,91 +1,249 @@
-from pymongo import InsertOne, UpdateOne
+from datetime import datetime
+from itertools import combinations
+
+from pymongo import InsertOne, UpdateOne, ASCENDING, DESCENDING
 from motor.motor_asyncio import AsyncIOMotorDatabase
 
 from app.db.base import BaseCollection
+from app.services.utils.modelling import BettingLine
+
+
+IN_QUERY_CHUNK_SIZE = 50_000
+BATCH_FIELDS = ['batch_num', 'batch_timestamp', 'collection_timestamp']
+FILTER_FIELDS = ['league', 'bookmaker', 'subject']  # the fields /betting_lines can filter on, in any combination
 
 
 class BettingLines(BaseCollection):
+    # documents only keep the most recent snapshot under 'latest', the history lives in 'betting_line_streams' as one
+    # bucket per line per day ('stream_bucket' points at the bucket and tail record the next batch extends)
 
     def __init__(self, db: AsyncIOMotorDatabase):
         super().__init__(db)
         self.collection = self.db['betting_lines']
+        self.streams = self.db['betting_line_streams']
+
+    async def create_indexes(self) -> None:
+        await self.streams.create_index([('line_id', ASCENDING), ('date', ASCENDING)])
+        # one per filter combination served by get_top_betting_lines, so the ev sort never happens in memory
+        for num_filter_fields in range(len(FILTER_FIELDS) + 1):
+            for filter_fields in combinations(FILTER_FIELDS, num_filter_fields):
+                await self.collection.create_index([*((field, ASCENDING) for field in filter_fields), ('latest.ev', DESCENDING)])
 
     async def get_betting_line(self, query: dict) -> dict:
         return await self.collection.find_one(query)
 
     @staticmethod
-    def _get_most_recent_stream_record(stream: list[dict]):
-        most_recent_stream_record = stream[-1]
-        for k, v in most_recent_stream_record.items():
-            if isinstance(v, list):
-                most_recent_stream_record[k] = v[-1]
-
-        return most_recent_stream_record
+    def _flatten_latest(betting_line: dict) -> dict:
+        return { **{k: v for k, v in betting_line.items() if k != 'latest'}, **betting_line['latest'] }
 
     async def _get_most_recent_betting_lines(self, query: dict) -> list[dict]:
-        most_recent_betting_lines = []
-        async for betting_line in self.collection.find(query, {'stream': { '$slice': -1 }}):
-            most_recent_stream_record = self._get_most_recent_stream_record(betting_line['stream'])
-            most_recent_betting_lines.append(
-                { **{k: v for k, v in betting_line.items() if k != 'stream'}, **most_recent_stream_record }
-            )
+        return [
+            self._flatten_latest(betting_line)
+            async for betting_line in self.collection.find(query, { 'stream_bucket': 0 })
+        ]
 
-        return most_recent_betting_lines
+    async def _get_betting_lines_with_streams(self, query: dict) -> list[dict]:
+        pipeline = [
+            { '$match': query },
+            { '$lookup': {
+                'from': self.streams.name,
+                'localField': '_id',
+                'foreignField': 'line_id',
+                'pipeline': [{ '$sort': { 'date': 1 } }],
+                'as': 'stream'
+            }},
+            { '$set': { 'stream': {
+                '$reduce': { 'input': '$stream.stream', 'initialValue': [], 'in': { '$concatArrays': ['$$value', '$$this'] } }
+            }}},
+            { '$project': { 'stream_bucket': 0 } }
+        ]
+        return await self.collection.aggregate(pipeline).to_list()
+
+    async def get_top_betting_lines(self, query: dict, min_ev: float = None, limit: int = 20,
+                                    offset: int = 0) -> list[dict]:
+        # lines without an ev are never served, the same as from the cache
+        query = { **query, 'latest.ev': { '$gte': min_ev } if min_ev is not None else { '$ne': None } }
+
+        cursor = (
+            self.collection.find(query, { 'stream_bucket': 0 })
+                           .sort('latest.ev', DESCENDING)
+                           .skip(offset)
+                           .limit(limit)
+        )
+        return [self._flatten_latest(betting_line) async for betting_line in cursor]
 
     async def get_betting_lines(self, query: dict, most_recent: bool = True) -> list[dict]:
         if most_recent:
             return await self._get_most_recent_betting_lines(query)
 
-        return await self.collection.find(query).to_list()
+        return await self._get_betting_lines_with_streams(query)
+
+    @staticmethod
+    def _get_bucket_date(batch_timestamp: datetime) -> datetime:
+        return datetime(batch_timestamp.year, batch_timestamp.month, batch_timestamp.day)
+
+    @staticmethod
+    def _get_bucket_id(unique_id: str, batch_timestamp: datetime) -> str:
+        return f"{unique_id}:{batch_timestamp.strftime('%Y-%m-%d')}"
 
     @staticmethod
-    def _create_doc(line: dict):
+    def _create_doc(line: BettingLine) -> dict:
         return {
-            **{k: line[k] for k in ['_id', 'bookmaker', 'league', 'subject', 'market', 'label']},
-            'stream': [ BettingLines._create_record(line) ]
+            '_id': line.id,
+            **{k: getattr(line, k) for k in ['bookmaker', 'league', 'subject', 'market', 'label']},
+            'latest': BettingLines._create_snapshot(line),
+            'stream_bucket': { '_id': BettingLines._get_bucket_id(line.id, line.batch_timestamp), 'tail_idx': 0 }
         }
 
     @staticmethod
-    def _create_record(line: dict) -> dict:
+    def get_latest_doc(line: BettingLine) -> dict:
+        # the line as get_top_betting_lines returns it once stored
+        return BettingLines._flatten_latest({ k: v for k, v in BettingLines._create_doc(line).items() if k != 'stream_bucket' })
+
+    @staticmethod
+    def _create_snapshot(line: BettingLine) -> dict:
         return {
-            'batch_num': [line['batch_num']],
-            'line': line['line'],
-            'odds': line['odds'],
-            'impl_prb': line['impl_prb'],
-            'tw_prb': line.get('tw_prb'),
-            'ev': line.get('ev'),
-            'batch_timestamp': [line['batch_timestamp']],
-            'collection_timestamp': [line['collection_timestamp']]
+            'batch_num': line.batch_num,
+            'line': line.line,
+            'odds': line.odds,
+            'impl_prb': line.impl_prb,
+            'tw_prb': line.tw_prb,
+            'ev': line.ev,
+            'batch_timestamp': line.batch_timestamp,
+            'collection_timestamp': line.collection_timestamp
         }
 
-    async def store_betting_lines(self, betting_lines: list[dict]) -> None:
-        requests = []
-        for betting_line_dict in betting_lines:
-            if betting_line_doc_match := await self.get_betting_line(betting_line_dict['_id']):
-                stream = betting_line_doc_match['stream']
-                most_recent_record = stream[-1]
-                if (not (betting_line_dict['line'] == most_recent_record['line']) or
-                    not (betting_line_dict['odds'] == most_recent_record['odds']) or
-                    not (betting_line_dict['ev'] == most_recent_record['ev'])):
+    @staticmethod
+    def _create_record(line: BettingLine) -> dict:
+        return {
+            'batch_num': [line.batch_num],
+            'line': line.line,
+            'odds': line.odds,
+            'impl_prb': line.impl_prb,
+            'tw_prb': line.tw_prb,
+            'ev': line.ev,
+            'batch_timestamp': [line.batch_timestamp],
+            'collection_timestamp': [line.collection_timestamp]
+        }
+
+    @staticmethod
+    def _create_bucket_insert_op(line: BettingLine, bucket_id: str) -> UpdateOne:
+        # a no-op when the bucket is already there, e.g. written by a batch whose pointer update failed
+        return UpdateOne(
+            { '_id': bucket_id },
+            { '$setOnInsert': {
+                'line_id': line.id,
+                'date': BettingLines._get_bucket_date(line.batch_timestamp),
+                'stream': [BettingLines._create_record(line)]
+            }},
+            upsert=True
+        )
+
+    @staticmethod
+    def _create_bucket_push_op(line: BettingLine, bucket_id: str, tail_idx: int) -> UpdateOne:
+        # only applied while the bucket still ends at tail_idx, so a stale pointer never pushes into the wrong place
+        return UpdateOne({ '_id': bucket_id, 'stream': { '$size': tail_idx + 1 } }, { '$push': {
+            'stream': BettingLines._create_record(line)
+        }})
+
+    @staticmethod
+    def _create_bucket_append_op(line: BettingLine, bucket_id: str, tail_idx: int) -> UpdateOne:
+        return UpdateOne({ '_id': bucket_id, 'stream': { '$size': tail_idx + 1 } }, { '$push': {
+            f'stream.{tail_idx}.{k}': getattr(line, k) for k in BATCH_FIELDS
+        }})
+
+    @staticmethod
+    def _get_tail_snapshot(record: dict) -> dict:
+        # the snapshot of a bucket's tail record, as of its last batch
+        return {
+            'batch_num': record['batch_num'][-1],
+            **{k: record[k] for k in ['line', 'odds', 'impl_prb', 'tw_prb', 'ev']},
+            'batch_timestamp': record['batch_timestamp'][-1],
+            'collection_timestamp': record['collection_timestamp'][-1]
+        }
+
+    async def _get_latest(self, unique_ids: list[str]) -> dict[str, dict]:
+        latest = {}
+        for i in range(0, len(unique_ids), IN_QUERY_CHUNK_SIZE):
+            query = { '_id': { '$in': unique_ids[i:i + IN_QUERY_CHUNK_SIZE] } }
+            async for betting_line in self.collection.find(query, { 'latest': 1, 'stream_bucket': 1 }):
+                latest[betting_line['_id']] = betting_line
+
+        return latest
+
+    @staticmethod
+    def _is_same_record(betting_line: BettingLine, record: dict) -> bool:
+        return all(getattr(betting_line, k) == record.get(k) for k in ['line', 'odds', 'ev'])
+
+    @staticmethod
+    def _get_store_ops(betting_lines: list[BettingLine], latest: dict[str, dict]) -> tuple[list, list]:
+        requests, bucket_requests = [], []
+        for betting_line in betting_lines:
+            unique_id = betting_line.id
+            bucket_id = BettingLines._get_bucket_id(unique_id, betting_line.batch_timestamp)
+            if betting_line_doc_match := latest.get(unique_id):
+                stream_bucket = betting_line_doc_match['stream_bucket']
+                if ((bucket_id == stream_bucket['_id']) and
+                    BettingLines._is_same_record(betting_line, betting_line_doc_match['latest'])):
 
-                    new_record = self._create_record(betting_line_dict)
-                    stream.append(new_record)
+                    tail_idx = stream_bucket['tail_idx']
+                    bucket_requests.append(BettingLines._create_bucket_append_op(betting_line, bucket_id, tail_idx))
+
+                elif bucket_id == stream_bucket['_id']:
+                    tail_idx = stream_bucket['tail_idx'] + 1
+                    bucket_requests.append(BettingLines._create_bucket_push_op(betting_line, bucket_id, tail_idx - 1))
 
                 else:
-                    most_recent_record['batch_num'].append(betting_line_dict['batch_num'])
-                    most_recent_record['batch_timestamp'].append(betting_line_dict['batch_timestamp'])
-                    most_recent_record['collection_timestamp'].append(betting_line_dict['collection_timestamp'])
+                    tail_idx = 0
+                    bucket_requests.append(BettingLines._create_bucket_insert_op(betting_line, bucket_id))
 
-                update_op = await self.update_betting_line(betting_line_dict['_id'], return_op=True,
-                                                           stream=stream)  # Todo: do you need to replace the entire records field?
-                requests.append(update_op)
+                betting_line_doc_match['latest'] = BettingLines._create_snapshot(betting_line)
+                betting_line_doc_match['stream_bucket'] = { '_id': bucket_id, 'tail_idx': tail_idx }
+                requests.append(UpdateOne({ '_id': unique_id }, { '$set': {
+                    'latest': betting_line_doc_match['latest'], 'stream_bucket': betting_line_doc_match['stream_bucket']
+                }}))
 
             else:
-                new_betting_line_doc = self._create_doc(betting_line_dict)
-                insert_op = InsertOne(new_betting_line_doc)
-                requests.append(insert_op)
+                new_betting_line_doc = BettingLines._create_doc(betting_line)
+                requests.append(InsertOne(new_betting_line_doc))
+                bucket_requests.append(BettingLines._create_bucket_insert_op(betting_line, bucket_id))
+                latest[unique_id] = new_betting_line_doc
+
+        return requests, bucket_requests
+
+    async def store_betting_lines(self, betting_lines: list[BettingLine]) -> None:
+        unique_ids = list({ betting_line.id for betting_line in betting_lines })
+        latest = await self._get_latest(unique_ids)
+        requests, bucket_requests = self._get_store_ops(betting_lines, latest)
+        num_bucket_writes = 0
+        if bucket_requests:  # ordered, lines sharing an _id depend on earlier ops
+            result = await self.streams.bulk_write(bucket_requests)
+            num_bucket_writes = result.modified_count + result.upserted_count
+
+        if requests:
+            await self.collection.bulk_write(requests)
+
+        # the two writes are not atomic, a bucket op left out means a pointer that was behind its bucket
+        if num_bucket_writes < len(bucket_requests):
+            await self._resync_stream_buckets([betting_line_doc['stream_bucket']['_id'] for betting_line_doc in latest.values()])
+
+    async def _resync_stream_buckets(self, bucket_ids: list[str]) -> None:
+        # points the lines back at the tail record their buckets actually end with
+        requests = []
+        for i in range(0, len(bucket_ids), IN_QUERY_CHUNK_SIZE):
+            pipeline = [
+                { '$match': { '_id': { '$in': bucket_ids[i:i + IN_QUERY_CHUNK_SIZE] } } },
+                { '$project': { 'line_id': 1, 'tail_idx': { '$subtract': [{ '$size': '$stream' }, 1] },
+                                'tail': { '$arrayElemAt': ['$stream', -1] } } }
+            ]
+            async for bucket in self.streams.aggregate(pipeline):
+                requests.append(UpdateOne({ '_id': bucket['line_id'] }, { '$set': {
+                    'latest': self._get_tail_snapshot(bucket['tail']),
+                    'stream_bucket': { '_id': bucket['_id'], 'tail_idx': bucket['tail_idx'] }
+                }}))
 
-        await self.collection.bulk_write(requests)
+        if requests:
+            await self.collection.bulk_write(requests)
 
     async def update_betting_line(self, unique_id: str, return_op: bool = False, **kwargs):
         if return_op:
@@ -95,3 +253,4 @@ class BettingLines(BaseCollection):
 
     async def delete_betting_lines(self):
         await self.collection.delete_many({})
+        await self.streams.delete_many({})
@@ -1,13 +1,27 @@
-from pymongo import UpdateOne, InsertOne
+from datetime import datetime
+
+from pymongo import ASCENDING, DESCENDING, UpdateOne
 from motor.motor_asyncio import AsyncIOMotorDatabase
 
 from app.db.base import BaseCollection
 
 
+UPSERT_CHUNK_SIZE = 1_000
+
+
 class Rosters(BaseCollection):
+    # every roster document carries the 'hash' of its content, so a run only writes the teams that changed, and what
+    # changed is kept as one diff event per run in 'roster_diffs' for the consumers of the rosters to poll
+
     def __init__(self, db: AsyncIOMotorDatabase):
         super().__init__(db)
         self.collection = self.db['rosters']
+        self.diffs = self.db['roster_diffs']
+
+    async def create_indexes(self) -> None:
+        # duplicates left by earlier runs have to go first, see app.db.migrations.dedupe_rosters_and_teams
+        await self.collection.create_index([('team.full_name', ASCENDING)], unique=True)
+        await self.diffs.create_index([('timestamp', ASCENDING)])
 
     async def get_rosters(self, query: dict) -> list[dict]:
         return await self.collection.find(query, { '_id': 0 }).to_list()
@@ -15,18 +29,33 @@ class Rosters(BaseCollection):
     async def get_roster(self, query: dict) -> dict:
         return await self.collection.find_one(query)
 
+    async def get_roster_hashes(self) -> dict[str, str]:
+        cursor = self.collection.find({}, { '_id': 0, 'team.full_name': 1, 'hash': 1 })
+        return { roster['team']['full_name']: roster.get('hash') async for roster in cursor }
+
+    async def store_roster_diff(self, roster_diff: dict) -> None:
+        await self.diffs.insert_one(roster_diff)
+
+    async def get_roster_diffs(self, since: datetime = None) -> list[dict]:
+        query = { 'timestamp': { '$gt': since } } if since else {}
+        return await self.diffs.find(query, { '_id': 0 }).sort('timestamp', ASCENDING).to_list()
+
+    async def get_latest_roster_diff_timestamp(self) -> datetime | None:
+        if roster_diff := await self.diffs.find_one({}, { '_id': 0, 'timestamp': 1 }, sort=[('timestamp', DESCENDING)]):
+            return roster_diff['timestamp']
+
+    @staticmethod
+    def _get_store_ops(rosters: list[dict]) -> list[UpdateOne]:
+        # upserts on the unique index instead of a find per document, so two runs at once cannot insert duplicates
+        return [
+            UpdateOne({ 'team.full_name': roster['team']['full_name'] }, { '$set': roster }, upsert=True)
+            for roster in rosters
+        ]
+
     async def store_rosters(self, rosters: list[dict]) -> None:
-        requests = []
-        for roster in rosters:
-            query = { 'team.full_name': roster['team']['full_name'] }
-            if await self.get_roster(query):
-                update_op = await self.update_roster(query, return_op=True, **roster)
-                requests.append(update_op)
-            else:
-                insert_op = InsertOne(roster)
-                requests.append(insert_op)
-
-        await self.collection.bulk_write(requests)
+        requests = self._get_store_ops(rosters)
+        for i in range(0, len(requests), UPSERT_CHUNK_SIZE):
+            await self.collection.bulk_write(requests[i:i + UPSERT_CHUNK_SIZE], ordered=False)
 
     async def update_roster(self, query: dict, return_op: bool = False, **kwargs):
         if return_op:
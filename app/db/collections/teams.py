@@ -1,32 +1,38 @@
-from pymongo import UpdateOne, InsertOne
+from pymongo import ASCENDING, UpdateOne
 from motor.motor_asyncio import AsyncIOMotorDatabase
 
 from app.db.base import BaseCollection
 
 
+UPSERT_CHUNK_SIZE = 1_000
+
+
 class Teams(BaseCollection):
     def __init__(self, db: AsyncIOMotorDatabase):
         super().__init__(db)
         self.collection = self.db['teams']
 
+    async def create_indexes(self) -> None:
+        await self.collection.create_index([('league', ASCENDING), ('full_name', ASCENDING)], unique=True)
+
     async def get_teams(self, query: dict) -> list[dict]:
         return await self.collection.find(query, { '_id': 0 }).to_list()
 
     async def get_team(self, query: dict) -> dict:
         return await self.collection.find_one(query)
 
+    @staticmethod
+    def _get_store_ops(teams: list[dict]) -> list[UpdateOne]:
+        # same as Rosters._get_store_ops, keyed by (league, full_name) since college and pro teams can share a name
+        return [
+            UpdateOne({ 'league': team['league'], 'full_name': team['full_name'] }, { '$set': team }, upsert=True)
+            for team in teams
+        ]
+
     async def store_teams(self, teams: list[dict]) -> None:
-        requests = []
-        for team in teams:
-            query = {'full_name': team['full_name']}
-            if await self.get_team(query):
-                update_op = await self.update_team(query, return_op=True, **team)
-                requests.append(update_op)
-            else:
-                insert_op = InsertOne(team)
-                requests.append(insert_op)
-
-        await self.collection.bulk_write(requests)
+        requests = self._get_store_ops(teams)
+        for i in range(0, len(requests), UPSERT_CHUNK_SIZE):
+            await self.collection.bulk_write(requests[i:i + UPSERT_CHUNK_SIZE], ordered=False)
 
     async def update_team(self, query: dict, return_op: bool = False, **kwargs):
         if return_op:
@@ -0,0 +1,90 @@
+"""
+Moves the embedded 'stream' of every betting line document into day buckets in 'betting_line_streams' and
+replaces it with the 'latest' snapshot. Stop the betting lines pipeline before running it; it is safe to re-run.
+
+Usage (from the repo root):
+    python -m app.db.migrations.bucket_betting_line_streams
+"""
+import asyncio
+
+from pymongo import ReplaceOne, UpdateOne
+
+from app.db.collections import BettingLines
+
+
+MIGRATION_CHUNK_SIZE = 1_000
+
+
+def _split_record_by_day(record: dict) -> dict[str, dict]:
+    # a record that kept matching across midnight is continued in the next day's bucket
+    record_by_day = {}
+    for batch_num, batch_timestamp, collection_timestamp in zip(
+        record['batch_num'], record['batch_timestamp'], record['collection_timestamp']
+    ):
+        day = batch_timestamp.strftime('%Y-%m-%d')
+        if day not in record_by_day:
+            record_by_day[day] = {
+                **record, 'batch_num': [], 'batch_timestamp': [], 'collection_timestamp': []
+            }
+
+        day_record = record_by_day[day]
+        day_record['batch_num'].append(batch_num)
+        day_record['batch_timestamp'].append(batch_timestamp)
+        day_record['collection_timestamp'].append(collection_timestamp)
+
+    return record_by_day
+
+
+def bucket_stream(betting_line: dict) -> tuple[list[dict], dict]:
+    buckets = {}
+    for record in betting_line['stream']:
+        for day, day_record in _split_record_by_day(record).items():
+            bucket_id = f"{betting_line['_id']}:{day}"
+            if bucket_id not in buckets:
+                buckets[bucket_id] = {
+                    '_id': bucket_id,
+                    'line_id': betting_line['_id'],
+                    'date': BettingLines._get_bucket_date(day_record['batch_timestamp'][0]),
+                    'stream': []
+                }
+
+            buckets[bucket_id]['stream'].append(day_record)
+
+    tail_bucket = buckets[bucket_id]
+    tail_record = tail_bucket['stream'][-1]
+    latest = { k: v[-1] if isinstance(v, list) else v for k, v in tail_record.items() }
+    stream_bucket = { '_id': tail_bucket['_id'], 'tail_idx': len(tail_bucket['stream']) - 1 }
+    return list(buckets.values()), { 'latest': latest, 'stream_bucket': stream_bucket }
+
+
+async def _migrate_chunk(betting_lines: BettingLines, chunk: list[dict]) -> None:
+    bucket_requests, requests = [], []
+    for betting_line in chunk:
+        buckets, latest_fields = bucket_stream(betting_line)
+        bucket_requests.extend(ReplaceOne({ '_id': bucket['_id'] }, bucket, upsert=True) for bucket in buckets)
+        requests.append(UpdateOne({ '_id': betting_line['_id'] }, { '$set': latest_fields, '$unset': { 'stream': '' } }))
+
+    await betting_lines.streams.bulk_write(bucket_requests, ordered=False)
+    await betting_lines.collection.bulk_write(requests, ordered=False)
+
+
+async def migrate(betting_lines: BettingLines) -> int:
+    await betting_lines.create_indexes()
+    num_migrated, chunk = 0, []
+    async for betting_line in betting_lines.collection.find({ 'stream.0': { '$exists': True } }):
+        chunk.append(betting_line)
+        if len(chunk) == MIGRATION_CHUNK_SIZE:
+            await _migrate_chunk(betting_lines, chunk)
+            num_migrated += len(chunk)
+            chunk = []
+
+    if chunk:
+        await _migrate_chunk(betting_lines, chunk)
+        num_migrated += len(chunk)
+
+    return num_migrated
+
+
+if __name__ == '__main__':
+    from app.db import db
+    print(f'[Migrations]: Bucketed the streams of {asyncio.run(migrate(db.betting_lines))} betting lines...')
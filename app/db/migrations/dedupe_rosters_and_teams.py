@@ -0,0 +1,42 @@
+"""
+Deletes the duplicate rosters (same 'team.full_name') and teams (same 'league' and 'full_name') that racing or
+repeated store runs inserted, keeping the most recently inserted document of each, then creates the unique indexes
+that keep them out. Stop the rosters pipeline before running it; it is safe to re-run.
+
+Usage (from the repo root):
+    python -m app.db.migrations.dedupe_rosters_and_teams
+"""
+import asyncio
+
+from pymongo import DeleteMany
+
+from app.db.collections import Rosters, Teams
+
+
+async def _delete_duplicates(collection, key_fields: dict) -> int:
+    requests, num_duplicates = [], 0
+    async for group in collection.aggregate([
+        { '$sort': { '_id': -1 } },  # object ids grow with insertion time
+        { '$group': { '_id': key_fields, 'ids': { '$push': '$_id' }, 'count': { '$sum': 1 } } },
+        { '$match': { 'count': { '$gt': 1 } } },
+    ]):
+        requests.append(DeleteMany({ '_id': { '$in': group['ids'][1:] } }))
+        num_duplicates += group['count'] - 1
+
+    if requests:
+        await collection.bulk_write(requests, ordered=False)
+
+    return num_duplicates
+
+
+async def migrate(rosters: Rosters, teams: Teams) -> int:
+    num_deleted = await _delete_duplicates(rosters.collection, '$team.full_name')
+    num_deleted += await _delete_duplicates(teams.collection, { 'league': '$league', 'full_name': '$full_name' })
+    await rosters.create_indexes()
+    await teams.create_indexes()
+    return num_deleted
+
+
+if __name__ == '__main__':
+    from app.db import db
+    print(f'[Migrations]: Deleted {asyncio.run(migrate(db.rosters, db.teams))} duplicate rosters and teams...')
@@ -1,9 +1,12 @@
+from dataclasses import replace
 from datetime import datetime
 
 import pytest
 import copy
 
 from app.db import db
+from app.db.migrations.bucket_betting_line_streams import bucket_stream
+from app.services.utils.modelling import BettingLine
 
 
 @pytest.fixture
@@ -164,4 +167,70 @@ async def test_betting_lines(setup):
     stored_docs = await db.betting_lines.get_betting_lines({})
     assert stored_docs == setup_batch_3_docs
 
-    await betting_lines_test_collection.delete_many({})
\ No newline at end of file
+    await betting_lines_test_collection.delete_many({})
+
+def _processed_betting_line(batch_num: int, odds: float) -> BettingLine:
+    return BettingLine(
+        batch_num=batch_num,
+        batch_timestamp=datetime(2025, 1, 1, 0, batch_num),
+        collection_timestamp=datetime(2025, 1, 1, 0, batch_num),
+        bookmaker='FanDuel',
+        league='NBA',
+        subject='LeBron James',
+        market='Points',
+        label='Over',
+        line=24.5,
+        odds=odds,
+        impl_prb=1 / odds,
+        tw_prb=0.5,
+        ev=0.5 * odds - 1,
+    )
+
+
+def test_store_ops_only_write_changes():
+    first_line, unchanged_line, changed_line = (
+        _processed_betting_line(0, 1.9), _processed_betting_line(1, 1.9), _processed_betting_line(2, 2.0)
+    )
+    bucket_id = 'FanDuel:NBA:Points:LeBron James:Over:2025-01-01'
+    latest = {}
+    (insert_op,), (bucket_insert_op,) = db.betting_lines._get_store_ops([first_line], latest)
+    assert insert_op._doc == db.betting_lines._create_doc(first_line)
+    assert bucket_insert_op._doc['$setOnInsert']['stream'] == [db.betting_lines._create_record(first_line)]
+
+    (_, update_op), (append_op, push_op) = db.betting_lines._get_store_ops([unchanged_line, changed_line], latest)
+    assert append_op._filter == { '_id': bucket_id, 'stream': { '$size': 1 } }
+    assert append_op._doc == { '$push': {
+        'stream.0.batch_num': 1,
+        'stream.0.batch_timestamp': unchanged_line.batch_timestamp,
+        'stream.0.collection_timestamp': unchanged_line.collection_timestamp,
+    }}
+    assert push_op._filter == { '_id': bucket_id, 'stream': { '$size': 1 } }
+    assert push_op._doc['$push'] == { 'stream': db.betting_lines._create_record(changed_line) }
+    assert update_op._doc == { '$set': {
+        'latest': db.betting_lines._create_snapshot(changed_line),
+        'stream_bucket': { '_id': bucket_id, 'tail_idx': 1 }
+    }}
+
+    next_day_line = replace(_processed_betting_line(3, 2.0), batch_timestamp=datetime(2025, 1, 2))
+    (update_op,), (bucket_insert_op,) = db.betting_lines._get_store_ops([next_day_line], latest)
+    assert bucket_insert_op._filter == { '_id': 'FanDuel:NBA:Points:LeBron James:Over:2025-01-02' }
+    assert update_op._doc['$set']['stream_bucket']['tail_idx'] == 0
+
+
+def test_tail_snapshot_matches_stored_snapshot():
+    line = _processed_betting_line(0, 1.9)
+    record = db.betting_lines._create_record(line)
+    assert db.betting_lines._get_tail_snapshot(record) == db.betting_lines._create_snapshot(line)
+
+
+def test_bucket_stream_migration():
+    record = db.betting_lines._create_record(_processed_betting_line(0, 1.9))
+    for k, v in [('batch_num', 1), ('batch_timestamp', datetime(2025, 1, 2)), ('collection_timestamp', datetime(2025, 1, 2))]:
+        record[k].append(v)
+
+    buckets, latest_fields = bucket_stream({ '_id': 'line', 'stream': [record] })
+    assert [(bucket['_id'], bucket['stream'][0]['batch_num']) for bucket in buckets] == [
+        ('line:2025-01-01', [0]), ('line:2025-01-02', [1])
+    ]
+    assert latest_fields['latest']['batch_num'] == 1
+    assert latest_fields['stream_bucket'] == { '_id': 'line:2025-01-02', 'tail_idx': 0 }
@@ -0,0 +1,21 @@
+from pymongo import UpdateOne
+
+from app.db import db
+
+
+ROSTER = {
+    'league': 'NBA',
+    'team': { 'abbr_name': 'WAS', 'full_name': 'Washington Wizards' },
+    'players': [{ 'name': 'Alex Sarr', 'position': 'C', 'jersey_number': '20' }],
+}
+TEAM = { 'league': 'NCAA', 'abbr_name': 'DUKE', 'full_name': 'Duke Blue Devils' }
+
+
+def test_store_ops_upsert_on_the_unique_keys():
+    assert db.rosters._get_store_ops([ROSTER]) == [
+        UpdateOne({ 'team.full_name': 'Washington Wizards' }, { '$set': ROSTER }, upsert=True)
+    ]
+    assert db.teams._get_store_ops([TEAM]) == [
+        UpdateOne({ 'league': 'NCAA', 'full_name': 'Duke Blue Devils' }, { '$set': TEAM }, upsert=True)
+    ]
+    assert db.teams._get_store_ops([]) == []
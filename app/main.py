@@ -1,8 +1,42 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 
+from app import cache
 from app.api import router as api_router
+from app.db import db
+from app.services.betting_lines.data_processing import parallel_processor
+from app.services.utils import utilities as utils
+
+
+logger = logging.getLogger(__name__)
+
+
+async def _create_indexes() -> None:
+    # the api can serve requests before the pipeline ever ran (and created them)
+    try:
+        await db.betting_lines.create_indexes()
+
+    except Exception:
+        logger.exception('Could not create the betting lines indexes')
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    utils.instrumenter.start_logging()
+    # in the background, so an unreachable mongo does not hold up startup (or the cached reads)
+    create_indexes_task = asyncio.create_task(_create_indexes())
+    yield
+    create_indexes_task.cancel()
+    await utils.requester.close()
+    if cache.client is not None:
+        await cache.client.aclose()
+    parallel_processor.close()
+    utils.instrumenter.stop_logging()
 
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 app.include_router(api_router)
@@ -1 +1 @@
-from .main import run_collectors
+from .main import collector_metrics, run_collectors, stream_collectors
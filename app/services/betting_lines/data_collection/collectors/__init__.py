@@ -1,2 +1,27 @@
-# from .boomfantasy import run_boomfantasy_collector
+import functools
+import importlib
+import logging
+import pkgutil
+
+from .base import Collector, CollectorMetrics, get_collector_configs
+from .boomfantasy import BoomFantasyCollector
 from .oddsshopper import OddsShopperCollector
+
+
+logger = logging.getLogger(__name__)
+
+@functools.cache
+def _import_collector_modules() -> None:
+    # importing a module is enough for its collectors to register, one that fails to import is left out
+    for module_info in pkgutil.iter_modules(__path__):
+        try:
+            importlib.import_module(f'{__name__}.{module_info.name}')
+
+        except Exception as e:
+            logger.exception('Could not import collector module',
+                             extra={'collector_module': module_info.name, 'error': str(e)})
+
+
+def discover_collectors() -> dict[str, type[Collector]]:
+    _import_collector_modules()
+    return dict(Collector.registry)
@@ -0,0 +1,50 @@
+import asyncio
+from dataclasses import dataclass
+from datetime import datetime
+
+from app.services.configs import load_configs
+from app.services.utils import Standardizer
+from app.services.utils.modelling import BettingLine
+
+
+@dataclass(slots=True)
+class CollectorMetrics:
+    num_runs: int = 0
+    num_failures: int = 0
+    num_timeouts: int = 0
+    last_status: str | None = None  # 'completed', 'failed', 'timed_out' or 'cancelled'
+    last_duration: float | None = None  # seconds
+    last_num_betting_lines: int = 0
+    total_duration: float = 0.0
+
+
+class Collector:
+    # every subclass with a name registers itself, so adding a bookmaker only takes a module in this package.
+    # a collector puts (name, league, betting lines) once per league, with every line it has for that league
+    name: str | None = None
+    registry: dict[str, type['Collector']] = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        if cls.name:
+            Collector.registry[cls.name] = cls
+
+    def __init__(self, batch_num: int, batch_timestamp: datetime, collected_betting_lines_queue: asyncio.Queue,
+                 standardizer: Standardizer):
+        self.batch_num = batch_num
+        self.batch_timestamp = batch_timestamp
+        self.collected_betting_lines_queue = collected_betting_lines_queue
+        self.standardizer = standardizer
+
+        self.collector_configs = get_collector_configs(self.name)
+
+    async def put_betting_lines(self, league: str, betting_lines: list[BettingLine]) -> None:
+        await self.collected_betting_lines_queue.put((self.name, league, betting_lines))
+
+    async def run_collector(self) -> None:
+        raise NotImplementedError
+
+
+def get_collector_configs(collector_name: str) -> dict:
+    configs = load_configs('collecting')
+    return {**configs['default'], **configs.get(collector_name, {})}
@@ -1,221 +1,204 @@
-from datetime import datetime
-from typing import Optional, Iterable, Union
+import asyncio
+import base64
+import json
+import logging
 import time
+from datetime import datetime
 
 from app.services.configs import load_configs
-from app.services.utils import Standardizer, utilities as utils
-from app.services.utils.storing import generate_unique_id, get_betting_line_key
-
-
-CONFIGS = load_configs('general')
-PAYLOAD = utils.requester.get_payload('betting_lines', 'BoomFantasy')
-
-num_betting_lines_collected = 0
+from app.services.utils import utilities as utils, Standardizer
+from app.services.utils.modelling import BettingLine
+from app.services.betting_lines.data_collection.collectors.base import Collector
 
 
-def _get_tokens(token_type: str = None) -> Optional[Union[str, dict]]:
-    credentials = PAYLOAD['json_data']['tokens']['authentication']['credentials']
-    return credentials.get(token_type, credentials)
+logger = logging.getLogger(__name__)
 
-
-def _update_tokens(tokens: dict) -> None:
-    PAYLOAD['json_data']['tokens']['authentication']['credentials'].update(tokens)
-    headers = PAYLOAD['headers']
-    headers['betting_lines']['authorization'] = f'Bearer {tokens["accessToken"]}'
-    headers['contest_ids']['authorization'] = f'Bearer {tokens["accessToken"]}'
-
-
-async def _request_new_tokens() -> bool:
-    try:
-        url = PAYLOAD['urls'].get('tokens')
-        headers = PAYLOAD['headers'].get('tokens')
-        json_data = PAYLOAD['json_data'].get('tokens')
-        if resp_json := await utils.requester.post(url, headers=headers, json=json_data):
-            relevant_tokens = {k: v for k, v in resp_json.items() if k in ['accessToken', 'refreshToken']}
-            _update_tokens(relevant_tokens)
-            return True
-    
-    except Exception as e:
-        print('[BoomFantasy]: !! ERROR -', e, '!!')
-        return False
-
-
-async def _request_contest_id() -> str | None:
+def get_token_expiry(access_token: str) -> float | None:
+    # the access token is a jwt, its unverified payload is only read for the 'exp' claim (unix seconds)
     try:
-        url = PAYLOAD['urls'].get('contest_ids')
-        headers = PAYLOAD['headers'].get('contest_ids')
-        json_data = PAYLOAD['json_data'].get('contest_ids')
-        if resp_json := await utils.requester.post(url, headers=headers, json=json_data):
-            return _parse_contest_id(resp_json)
-    
-    except Exception as e:
-        print('[BoomFantasy]: !! ERROR -', e, '!!')
-        
-
-def _parse_contest_id(resp: dict) -> str | None:
-    if data := resp.get('data'):
-        for contest in data.get('contests', []):
+        payload = access_token.split('.')[1]
+        return float(json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))['exp'])
+
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+class BoomFantasyCollector(Collector):
+    name = 'BoomFantasy'
+    # kept across batches: the tokens are only refreshed when they are about to expire and the pick'em contest id
+    # only changes when the contest does, so most batches skip both round trips
+    tokens: dict[str, str] | None = None
+    token_expiry: float = 0.0
+    contest_id: str | None = None
+
+    def __init__(self, batch_num: int, batch_timestamp: datetime, collected_betting_lines_queue: asyncio.Queue,
+                 standardizer: Standardizer):
+        super().__init__(batch_num, batch_timestamp, collected_betting_lines_queue, standardizer)
+        self.configs = load_configs('general')
+        self.payload = utils.requester.get_payload(domain='betting_lines', source_name='BoomFantasy')
+        self.num_betting_lines_collected = 0
+
+    def _get_headers(self, request_name: str) -> dict:
+        return {**self.payload['headers'][request_name], 'authorization': f"Bearer {self.tokens['accessToken']}"}
+
+    @classmethod
+    def _invalidate(cls) -> None:
+        cls.token_expiry, cls.contest_id = 0.0, None  # the refresh token is kept, it is what gets the new ones
+
+    async def _request_tokens(self) -> None:
+        url = self.payload['urls']['tokens']
+        headers = self.payload['headers']['tokens']
+        json_data = self.payload['json_data']['tokens']
+        # the last refresh token, not the one the payload started out with
+        json_data = {**json_data, 'authentication': {**json_data['authentication'], 'credentials': self.tokens}}
+
+        resp_json = await utils.requester.post(url, source_name='BoomFantasy', headers=headers, json=json_data)
+        if not (resp_json and resp_json.get('accessToken') and resp_json.get('refreshToken')):
+            raise ValueError(f'No tokens in response: {resp_json}')
+
+        cls = type(self)
+        cls.tokens = {'accessToken': resp_json['accessToken'], 'refreshToken': resp_json['refreshToken']}
+        cls.token_expiry = get_token_expiry(resp_json['accessToken']) or (time.time() + self.collector_configs['token_ttl'])
+
+    async def _ensure_tokens(self) -> None:
+        if self.tokens is None:  # the payload's tokens are used for as long as they are valid
+            credentials = self.payload['json_data']['tokens']['authentication']['credentials']
+            type(self).tokens = {'accessToken': credentials['accessToken'], 'refreshToken': credentials['refreshToken']}
+            type(self).token_expiry = get_token_expiry(credentials['accessToken']) or 0.0
+
+        if time.time() >= self.token_expiry - self.collector_configs['token_refresh_margin']:
+            logger.info('Requesting new tokens', extra={'source': 'BoomFantasy'})
+            await self._request_tokens()
+
+    @staticmethod
+    def _parse_contest_id(resp: dict) -> str | None:
+        for contest in (resp.get('data') or {}).get('contests', []):
             if contest.get('title') == "Pick' Em":
                 return contest.get('_id')
 
+    async def _ensure_contest_id(self) -> None:
+        if self.contest_id is None:
+            logger.info('Requesting contest id', extra={'source': 'BoomFantasy'})
+            url = self.payload['urls']['contest_ids']
+            json_data = self.payload['json_data']['contest_ids']
+            resp_json = await utils.requester.post(url, source_name='BoomFantasy', headers=self._get_headers('contest_ids'),
+                                                   json=json_data)
+            if not (contest_id := resp_json and self._parse_contest_id(resp_json)):
+                raise ValueError("No Pick' Em contest found")
+
+            type(self).contest_id = contest_id
+
+    async def _request_betting_lines(self) -> dict | None:
+        await self._ensure_tokens()
+        await self._ensure_contest_id()
+        url = self.payload['urls']['betting_lines'].format(self.contest_id)
+        params = self.payload['params']['betting_lines']
+        return await utils.requester.fetch(url, source_name='BoomFantasy', headers=self._get_headers('betting_lines'),
+                                           params=params)
+
+    def _get_market(self, statistic: str, period: str | None, league: str) -> str | None:
+        try:
+            std_period_name = self.standardizer.standardize_period_name(period) if period not in (None, 'fullGame') else None
+
+        except ValueError as e:
+            logger.warning('Could not standardize period', extra={'source': 'BoomFantasy', 'error': str(e)})
+            return None
+
+        return self.standardizer.standardize_market_name(statistic, utils.get_sport(league), period=std_period_name)
+
+    def _get_subject(self, first_name: str, last_name: str, league: str) -> str | None:
+        try:
+            with utils.instrumenter.span('standardize', source='BoomFantasy', league=league):
+                cleaned_subject_name = utils.cleaner.clean_subject_name(f'{first_name} {last_name}')
+                subject_key = utils.storer.get_subject_key(league, cleaned_subject_name)
+                return self.standardizer.standardize_subject_name(subject_key)
+
+        except Exception as e:
+            logger.warning('Could not standardize subject', extra={'source': 'BoomFantasy', 'error': str(e)})
+
+    def _parse_betting_lines(self, resp: dict) -> dict[str, list[BettingLine]]:
+        # one pass over section > question group (a subject) > question (a market) > choice (a line) > outcome
+        # (label, odds), with markets and subjects standardized once per response instead of once per line
+        league_betting_lines = {}
+        markets, subjects = {}, {}
+        collection_timestamp = datetime.now()
+        contest = (resp.get('data') or {}).get('multiLineContest') or {}
+        for section in contest.get('sections', []):
+            league = (section.get('league') or '').strip().upper()
+            if (section.get('status') != 'active') or (league not in self.configs['leagues_to_collect_from']):
+                continue
+
+            for qg in section.get('qG', []):
+                subject_name = ((qg.get('title') or {}).get('o')) or {}
+                first_name, last_name = subject_name.get('firstName'), subject_name.get('lastName')
+                if not (first_name and last_name):
+                    continue
+
+                subject_key = (league, first_name, last_name)
+                if subject_key not in subjects:
+                    subjects[subject_key] = self._get_subject(first_name, last_name, league)
+
+                if not (subject := subjects[subject_key]):
+                    continue
+
+                period = qg.get('periodClassifier')
+                for q in qg.get('q', []):
+                    if not (statistic := q.get('statistic')):
+                        continue
+
+                    market_key = (league, statistic, period)
+                    if market_key not in markets:
+                        markets[market_key] = self._get_market(statistic, period, league)
+
+                    if not (market := markets[market_key]):
+                        continue
+
+                    for c in q.get('c', []):
+                        if (line := c.get('l')) is None:
+                            continue
+
+                        for outcome in c.get('c', []):
+                            if (len(outcome) == 3) and (label := outcome[1]) and (odds := outcome[2]):
+                                league_betting_lines.setdefault(league, []).append(BettingLine(
+                                    batch_num=self.batch_num,
+                                    batch_timestamp=self.batch_timestamp,
+                                    collection_timestamp=collection_timestamp,
+                                    bookmaker='BoomFantasy',
+                                    league=league,
+                                    market=market,
+                                    subject=subject,
+                                    label=label.title(),
+                                    line=float(line),
+                                    odds=float(odds),
+                                ))
+
+        return league_betting_lines
+
+    async def run_collector(self) -> None:
+        logger.info('Requesting prop lines', extra={'source': 'BoomFantasy'})
+        try:
+            betting_lines_resp = await self._request_betting_lines()
+
+        except Exception as e:  # revoked tokens or an ended contest, both are requested again once
+            logger.warning('Prop lines request failed, retrying with new tokens and contest id', extra={
+                'source': 'BoomFantasy', 'error': str(e)
+            })
+            self._invalidate()
+            betting_lines_resp = await self._request_betting_lines()
+
+        if betting_lines_resp:
+            with utils.instrumenter.span('parse', source='BoomFantasy'):
+                league_betting_lines = self._parse_betting_lines(betting_lines_resp)
+
+            for league, betting_lines in league_betting_lines.items():
+                self.num_betting_lines_collected += len(betting_lines)
+                await self.put_betting_lines(league, betting_lines)
+
+            logger.info('Collected betting lines', extra={
+                'source': 'BoomFantasy', 'num_betting_lines': self.num_betting_lines_collected
+            })
 
-async def _request_betting_lines(contest_id: str) -> dict | None:
-    try:
-        url = PAYLOAD['urls']['betting_lines'].format(contest_id)
-        headers = PAYLOAD['headers'].get('betting_lines')
-        params = PAYLOAD['params'].get('betting_lines')
-        if resp_json := await utils.requester.fetch(url, headers=headers, params=params):
-            return resp_json
-
-    except Exception as e:
-        print('[BoomFantasy]: !! ERROR -', e, '!!')
-
-
-def _get_sections(resp: dict) -> Iterable:
-    if data := resp.get('data'):
-        if contest := data.get('multiLineContest'):
-            for section in contest.get('sections', []):
-                yield section
-
-
-def _extract_league(section: dict) -> str | None:
-    if raw_league_name := section.get('league'):
-        cleaned_league_name = raw_league_name.strip().upper()
-        if cleaned_league_name in CONFIGS['leagues_to_collect_from']:
-            return cleaned_league_name
-
-
-def _get_qgs(section: dict) -> Iterable:
-    if section.get('status') == 'active':
-        for qg in section.get('qG', []):
-            yield qg
-
-
-def _get_qg_data(section: dict) -> Iterable:
-    for qg in _get_qgs(section):
-        yield qg
-
-
-def _extract_team(qg: dict) -> str | None:
-    if player_image := qg.get('playerImage'):
-        if team_name := player_image.get('abbreviation'):
-            return team_name
-
-
-def _extract_subject(qg: dict) -> str | None:
-    try:
-        if title := qg.get('title'):
-            if options := title.get('o'):
-                if (raw_first_name := options.get('firstName')) and (raw_last_name := options.get('lastName')):
-                    raw_full_subj_name = ' '.join([raw_first_name, raw_last_name])
-                    return raw_full_subj_name
-
-    except Exception as e:
-        print('[BoomFantasy]: !! ERROR -', e, '!!')
-
-
-def _extract_period(qg: dict) -> str | None:
-    if (period := qg.get('periodClassifier')) and (period != 'fullGame'):
-        std_period_name = utils.standardizer.standardize_period_name(period)
-        return std_period_name
-
-
-def _get_q_data(qg: dict) -> Iterable:
-    yield _extract_subject(qg)
-    for q in qg.get('q', []):
-        yield q
-
-
-def _extract_market(qg: dict, q: dict, league: str) -> str | None:
-    try:
-        period = _extract_period(qg)
-        if raw_market_name := q.get("statistic"):
-            sport = utils.standardizer.get_sport(league)
-            std_market_name = utils.standardizer.standardize_market_name(raw_market_name, sport, period=period)
-            return std_market_name
-
-    except Exception as e:
-        print('[BoomFantasy]: !! ERROR -', e, '!!')
-
-
-def _get_c_data(qg: dict, q: dict, league: str) -> Iterable:
-    yield _extract_market(qg, q, league)
-    if c_data := q.get('c', []):
-        for c in c_data:
-            yield c
-
-
-def _get_c_data_2(c: dict) -> Iterable:
-    yield c.get('l')
-    for c_2_data in c.get('c', []):
-        yield c_2_data
-
-
-def _extract_label_and_odds(c_2: list) -> Optional[tuple[str, float]]:
-    if len(c_2) == 3:
-        if (label := c_2[1]) and (odds := c_2[2]):
-            return label.title(), float(odds)
-
-
-def _parse_betting_lines(resp: dict, collected_betting_lines: list[dict]) -> None:
-    global num_betting_lines_collected
-    for section in _get_sections(resp):
-        if league := _extract_league(section):
-            for qg in _get_qg_data(section):
-               q_data_iter = iter(_get_q_data(qg))
-               if subject := next(q_data_iter):
-                    for q in q_data_iter:
-                        c_data_iter = iter(_get_c_data(qg, q, league))
-                        if market := next(c_data_iter):
-                            for c in c_data_iter:
-                                c_2_data_iter = iter(_get_c_data_2(c))
-                                if line := next(c_2_data_iter):
-                                    for c_2 in c_2_data_iter:
-                                        label, odds = _extract_label_and_odds(c_2)
-                                        if label and odds:
-                                            betting_line_doc = {
-                                                'timestamp': datetime.now().isoformat(),
-                                                'bookmaker': 'BoomFantasy',
-                                                'league': league,
-                                                'subject': subject,
-                                                'market': market,
-                                                'label': label,
-                                                'line': line,
-                                                'odds': odds,
-                                            }
-                                            betting_line_doc_key = get_betting_line_key(betting_line_doc)
-                                            betting_line_doc['_id'] = betting_line_doc_key
-                                            collected_betting_lines.append(betting_line_doc)
-                                            num_betting_lines_collected += 1
-
-
-async def run_boomfantasy_collector(collected_betting_lines: list, standardizer: Standardizer) -> None:
-    # Todo: don't get new tokens every time...randomize every three requests
-    global num_betting_lines_collected
-    try:
-        start_time = time.time()
-        print('[BoomFantasy]: Running collector...')
-        print('[BoomFantasy]: Requesting new tokens...')
-        if await _request_new_tokens():
-            print('[BoomFantasy]: Tokens received...')
-            print('[BoomFantasy]: Requesting contest id...')
-            if contest_id := await _request_contest_id():
-                print('[BoomFantasy]: Contest id received...')
-                print('[BoomFantasy]: Requesting prop lines...')
-                if betting_lines_resp := await _request_betting_lines(contest_id):
-                    print('[BoomFantasy]: Prop lines received...')
-                    print('[BoomFantasy]: Parsing prop lines...')
-                    _parse_betting_lines(betting_lines_resp, collected_betting_lines)
-                    print('[BoomFantasy]: Prop lines parsed...')
-                    print(f'[BoomFantasy]: Collected {num_betting_lines_collected} betting lines...')
-                    num_betting_lines_collected = 0
-                    end_time = time.time()
-                    print(f'[BoomFantasy]: Time taken: {round(end_time - start_time, 2)} seconds...')
-
-
-    except Exception as e:
-        raise e
 
 if __name__ == '__main__':
-    import asyncio
-    asyncio.run(run_boomfantasy_collector([]))
+    collector = BoomFantasyCollector(0, datetime.now(), asyncio.Queue(), Standardizer())
+    asyncio.run(collector.run_collector())
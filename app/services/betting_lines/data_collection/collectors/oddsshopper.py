@@ -1,20 +1,25 @@
 import asyncio
-import time
+import logging
+from dataclasses import replace
 from datetime import datetime, timedelta
 from typing import Optional, Iterable
 
 from app.services.configs import load_configs
 from app.services.utils import utilities as utils, Standardizer
+from app.services.utils.modelling import BettingLine
+from app.services.betting_lines.data_collection.collectors.base import Collector
 
 
-class OddsShopperCollector:
+logger = logging.getLogger(__name__)
 
-    def __init__(self, batch_num: int, batch_timestamp: datetime, collected_betting_lines: list[dict], standardizer: Standardizer):
-        self.batch_num = batch_num
-        self.batch_timestamp = batch_timestamp
-        self.collected_betting_lines = collected_betting_lines
-        self.standardizer = standardizer
+class OddsShopperCollector(Collector):
+    name = 'OddsShopper'
+    # parsed betting lines of the last batch per offer id, reused when the offer's outcomes have not changed
+    parsed_betting_lines_cache: dict[str, list[BettingLine]] = {}
 
+    def __init__(self, batch_num: int, batch_timestamp: datetime, collected_betting_lines_queue: asyncio.Queue,
+                 standardizer: Standardizer):
+        super().__init__(batch_num, batch_timestamp, collected_betting_lines_queue, standardizer)
         self.configs = load_configs('general')
         self.payload = utils.requester.get_payload(domain='betting_lines', source_name='OddsShopper')
         self.num_betting_lines_collected = 0
@@ -23,7 +28,7 @@ class OddsShopperCollector:
         url = self.payload['urls']['matchups']
         headers = self.payload['headers']
         cookies = self.payload['cookies']
-        if resp_json := await utils.requester.fetch(url, headers=headers, cookies=cookies):
+        if resp_json := await utils.requester.fetch(url, source_name='OddsShopper', headers=headers, cookies=cookies):
             return resp_json
 
     @staticmethod
@@ -47,9 +52,12 @@ class OddsShopperCollector:
 
     @staticmethod
     def _get_dates() -> tuple[str, str]:
+        # from now, so games already underway are left out. the dates are not part of the response cache key (see
+        # _request_offer_betting_lines), so the moving window does not make every batch a new request
         date_format = '%Y-%m-%dT%H:%M:%S.%f'
-        return (datetime.now().strftime(date_format)[:-3] + 'Z',
-                (datetime.now() + timedelta(days=8)).strftime(date_format)[:-3] + 'Z')
+        start_date = datetime.now()
+        return (start_date.strftime(date_format)[:-3] + 'Z',
+                (start_date + timedelta(days=8)).strftime(date_format)[:-3] + 'Z')
 
 
     def _get_params(self):
@@ -58,29 +66,74 @@ class OddsShopperCollector:
         return {**params, 'startDate': start_date, 'endDate': end_date}
 
 
-    async def _request_betting_lines(self, league: str, offer_id: str) -> None:
+    async def _request_betting_lines(self, league: str, offer_id: str) -> list[BettingLine]:
+        # a failed offer only loses its own lines, the league's other offers are still handed on
+        try:
+            betting_lines = await self._request_offer_betting_lines(league, offer_id)
+
+        except Exception as e:
+            utils.instrumenter.inc('collector_request_failures_total', source='OddsShopper', league=league)
+            logger.warning('Could not collect offer', extra={
+                'source': 'OddsShopper', 'league': league, 'offer_id': offer_id, 'error': str(e)
+            })
+            return []
+
+        self.num_betting_lines_collected += len(betting_lines)
+        return betting_lines
+
+    async def _request_offer_betting_lines(self, league: str, offer_id: str) -> list[BettingLine]:
         url = self.payload['urls']['betting_lines'].format(offer_id)
         headers = self.payload['headers']
         params = self._get_params()
-        if resp_json := await utils.requester.fetch(url, headers=headers, params=params):
-            self._parse_betting_lines(league, resp_json)
+        resp_json = await utils.requester.fetch(url, source_name='OddsShopper', cache=True,
+                                                uncached_params=('startDate', 'endDate'), headers=headers, params=params)
+        if (resp_json is utils.NOT_MODIFIED) and (offer_id in self.parsed_betting_lines_cache):
+            betting_lines = self._reuse_betting_lines(self.parsed_betting_lines_cache[offer_id])
 
+        else:
+            if resp_json is utils.NOT_MODIFIED:  # the parsed lines were evicted while the response stayed cached
+                resp_json = await utils.requester.fetch(url, source_name='OddsShopper', headers=headers, params=params)
 
-    def _extract_market(self, event: dict, league: str) -> str | None:
-        try:
-            if raw_market_name := event.get('offerName'):
-                sport = utils.get_sport(league)
-                std_market_name = self.standardizer.standardize_market_name(raw_market_name, sport)
-                return std_market_name
+            if not resp_json:
+                return []
 
-        except Exception as e:
-            print('[OddsShopper]: !! ERROR -', e, '!!')
+            with utils.instrumenter.span('parse', source='OddsShopper', league=league):
+                betting_lines = self._parse_betting_lines(league, resp_json)
+
+        self.parsed_betting_lines_cache[offer_id] = betting_lines
+        return betting_lines
+
+    async def _collect_league(self, league: str, offer_ids: list[str]) -> None:
+        # every offer of a league has to be in before its lines are handed on, since a market can only be devigged
+        # with all of its sharp lines. gathered in offer order, so the collection order is the same every batch
+        betting_lines = []
+        for offer_betting_lines in await asyncio.gather(*[
+            self._request_betting_lines(league, offer_id) for offer_id in offer_ids
+        ]):
+            betting_lines.extend(offer_betting_lines)
+
+        await self.put_betting_lines(league, betting_lines)
+
+    def _reuse_betting_lines(self, betting_lines: list[BettingLine]) -> list[BettingLine]:
+        collection_timestamp = datetime.now()
+        return [
+            replace(betting_line, batch_num=self.batch_num, batch_timestamp=self.batch_timestamp,
+                    collection_timestamp=collection_timestamp, impl_prb=None, tw_prb=None, ev=None)
+            for betting_line in betting_lines
+        ]
+
+
+    def _extract_market(self, event: dict, league: str) -> str | None:
+        # a cached dict hit, unknown markets are None and reported per batch by the standardizer
+        if raw_market_name := event.get('offerName'):
+            return self.standardizer.standardize_market_name(raw_market_name, utils.get_sport(league))
 
 
     def _extract_subject(self, event: dict, league: str) -> str | None:
         try:
             if (participants := event.get('participants')) and (first_participants := participants[0]):
                 if raw_subject_name := first_participants.get('name'):
+                    # timed as part of the 'parse' span, a span per event costs more than the lookup
                     cleaned_subject_name = utils.cleaner.clean_subject_name(raw_subject_name)
                     subject_key = utils.storer.get_subject_key(league, cleaned_subject_name)
                     std_subject_name = self.standardizer.standardize_subject_name(subject_key)
@@ -89,7 +142,7 @@ class OddsShopperCollector:
                 raise ValueError(f"No subject name found in event participants: '{event}'")
 
         except Exception as e:
-            print('[OddsShopper]: !! ERROR -', e, '!!')
+            logger.warning('Could not standardize subject', extra={'source': 'OddsShopper', 'error': str(e)})
 
     @staticmethod
     def _extract_bookmaker(outcome: dict) -> str | None:
@@ -112,7 +165,8 @@ class OddsShopperCollector:
             return ev
 
 
-    def _parse_betting_lines(self, league: str, resp: dict) -> None:
+    def _parse_betting_lines(self, league: str, resp: dict) -> list[BettingLine]:
+        betting_lines = []
         for event in resp:
             if market := self._extract_market(event, league):
                 if subject := self._extract_subject(event, league):
@@ -121,49 +175,51 @@ class OddsShopperCollector:
                             for outcome in side.get('outcomes', []):
                                 if bookmaker_name := self._extract_bookmaker(outcome):
                                     if odds := self._extract_odds(outcome):
-                                        betting_line_dict = {
-                                            'batch_num': self.batch_num,
-                                            'batch_timestamp': self.batch_timestamp,
-                                            'collection_timestamp': datetime.now(),  # Todo: are you sure this is the format to use?
-                                            'bookmaker': bookmaker_name,
-                                            'league': league,
-                                            'market': market,
-                                            'subject': subject,
-                                            'label': label,
-                                            'line': float(outcome.get('line', 0.5)),
-                                            'odds': odds,
-                                        }
-                                        betting_line_key = utils.storer.get_betting_line_key(betting_line_dict)
-                                        betting_line_dict['_id'] = betting_line_key
-                                        self.collected_betting_lines.append(betting_line_dict)
-                                        self.num_betting_lines_collected += 1
+                                        betting_lines.append(BettingLine(
+                                            batch_num=self.batch_num,
+                                            batch_timestamp=self.batch_timestamp,
+                                            collection_timestamp=datetime.now(),  # Todo: are you sure this is the format to use?
+                                            bookmaker=bookmaker_name,
+                                            league=league,
+                                            market=market,
+                                            subject=subject,
+                                            label=label,
+                                            line=float(outcome.get('line', 0.5)),
+                                            odds=odds,
+                                        ))
+
+        return betting_lines
 
 
     async def run_collector(self) -> None:
-        try:
-            start_time = time.time()
-            print('[Oddsshopper]: Running collector...')
-            print('[Oddsshopper]: Requesting matchups...')
-            if matchups_resp := await self._request_matchups():
-                print('[OddsShopper]: Matchups received...')
-                betting_lines_tasks = []
-                for event_data in self._parse_matchups(matchups_resp):
-                    if event_data:
-                        league, offer_id = event_data
-                        betting_lines_tasks.append(self._request_betting_lines(league, offer_id))
-
-                print('[Oddsshopper]: Requesting betting lines...')
-                await asyncio.gather(*betting_lines_tasks)
-                print('[Oddsshopper]: Betting lines received...')
-                print(f'[Oddsshopper]: Collected {self.num_betting_lines_collected} betting lines...')
-                self.num_betting_lines_collected = 0
-                end_time = time.time()
-                print(f'[Oddsshopper]: Time taken: {round(end_time - start_time, 2)} seconds')
-
-        except Exception as e:
-            print(e)
+        # errors and the time taken are handled by the collector runner, which keeps a failure from reaching the batch
+        logger.info('Requesting matchups', extra={'source': 'OddsShopper'})
+        if matchups_resp := await self._request_matchups():
+            league_offer_ids = {}
+            for event_data in self._parse_matchups(matchups_resp):
+                if event_data:
+                    league, offer_id = event_data
+                    league_offer_ids.setdefault(league, []).append(offer_id)
+
+            logger.info('Requesting betting lines', extra={'source': 'OddsShopper', 'num_offers': sum(
+                len(offer_ids) for offer_ids in league_offer_ids.values()
+            )})
+            # a task group, so a league that fails (or the collector timing out) cancels the others, none of them can put
+            # lines after the collector has finished
+            async with asyncio.TaskGroup() as league_tasks:
+                for league, offer_ids in league_offer_ids.items():
+                    league_tasks.create_task(self._collect_league(league, offer_ids))
+
+            collected_offer_ids = {offer_id for offer_ids in league_offer_ids.values() for offer_id in offer_ids}
+            for offer_id in set(self.parsed_betting_lines_cache) - collected_offer_ids:
+                del self.parsed_betting_lines_cache[offer_id]
+
+            logger.info('Collected betting lines', extra={
+                'source': 'OddsShopper', 'num_betting_lines': self.num_betting_lines_collected
+            })
+            self.num_betting_lines_collected = 0
 
 
 if __name__ == '__main__':
-    collector = OddsShopperCollector(datetime.now().isoformat(), [], Standardizer())  # Todo: how to get rosters dependency?
+    collector = OddsShopperCollector(0, datetime.now(), asyncio.Queue(), Standardizer())  # Todo: how to get rosters dependency?
     asyncio.run(collector.run_collector())
@@ -1,18 +1,113 @@
 import asyncio
+import logging
+from collections import Counter, defaultdict
 from datetime import datetime
+from typing import AsyncIterator
 
-from app.services.utils import Standardizer
+from app.services.utils import Standardizer, utilities as utils
+from app.services.utils.modelling import BettingLine
 from app.services.betting_lines.data_collection import collectors
 
 
-async def run_collectors(batch_num: int, batch_timestamp: datetime, standardizer: Standardizer):
+logger = logging.getLogger(__name__)
+
+collector_metrics: dict[str, collectors.CollectorMetrics] = defaultdict(collectors.CollectorMetrics)
+
+
+def _get_collectors(batch_num: int, batch_timestamp: datetime, standardizer: Standardizer,
+                    collected_betting_lines_queue: asyncio.Queue) -> dict[str, collectors.Collector]:
+    return {
+        collector_name: collector_class(batch_num, batch_timestamp, collected_betting_lines_queue, standardizer)
+        for collector_name, collector_class in collectors.discover_collectors().items()
+        if collectors.get_collector_configs(collector_name)['enabled']
+    }
+
+
+async def _run_collector(collector_name: str, collector: collectors.Collector,
+                         collected_betting_lines_queue: asyncio.Queue) -> None:
+    # every collector runs in its own time budget and a failing or hanging one only loses the leagues it had not
+    # delivered yet. the leagues it did deliver are complete, so they still go on. it always ends with (name, None, None)
+    loop = asyncio.get_running_loop()
+    metrics = collector_metrics[collector_name]
+    timeout = collectors.get_collector_configs(collector_name)['timeout']
+    start_time = loop.time()
+    try:
+        with utils.instrumenter.span('collect', source=collector_name):
+            async with asyncio.timeout(timeout):
+                await collector.run_collector()
+
+        metrics.last_status = 'completed'
+
+    except asyncio.CancelledError:  # the batch was abandoned, not the collector's fault
+        metrics.last_status = 'cancelled'
+        raise
+
+    except TimeoutError:
+        metrics.num_timeouts += 1
+        metrics.last_status = 'timed_out'
+        logger.error('Collector timed out', extra={'source': collector_name, 'timeout': timeout})
+
+    except Exception as e:
+        metrics.num_failures += 1
+        metrics.last_status = 'failed'
+        logger.exception('Collector failed', extra={'source': collector_name, 'error': str(e)})
+
+    finally:
+        metrics.num_runs += 1
+        metrics.last_duration = loop.time() - start_time
+        metrics.total_duration += metrics.last_duration
+        collected_betting_lines_queue.put_nowait((collector_name, None, None))
+
+
+async def stream_collectors(batch_num: int, batch_timestamp: datetime,
+                            standardizer: Standardizer) -> AsyncIterator[tuple[str, list[BettingLine]]]:
+    # collectors put (collector name, league, betting lines) once per league, and a league is yielded, with the lines
+    # of every collector, as soon as no collector that is still running can add to it anymore. so a league is not held
+    # back by a slow source or by the other leagues
+    collected_betting_lines_queue = asyncio.Queue()
+    running_collector_names = set()
+    tasks = []
+    for collector_name, collector in _get_collectors(batch_num, batch_timestamp, standardizer, collected_betting_lines_queue).items():
+        tasks.append(asyncio.create_task(_run_collector(collector_name, collector, collected_betting_lines_queue)))
+        running_collector_names.add(collector_name)
+
+    league_betting_lines, league_collector_names = {}, {}
+    num_betting_lines = Counter()
+    try:
+        while running_collector_names:
+            collector_name, league, betting_lines = await collected_betting_lines_queue.get()
+            if league is None:  # the collector finished
+                running_collector_names.discard(collector_name)
+                metrics = collector_metrics[collector_name]
+                metrics.last_num_betting_lines = num_betting_lines[collector_name]
+                logger.info('Collector finished', extra={
+                    'source': collector_name, 'status': metrics.last_status,
+                    'num_betting_lines': metrics.last_num_betting_lines, 'duration': round(metrics.last_duration, 2)
+                })
+            else:
+                league_betting_lines.setdefault(league, []).extend(betting_lines)
+                num_betting_lines[collector_name] += len(betting_lines)
+                utils.instrumenter.inc('collector_betting_lines_total', len(betting_lines), source=collector_name,
+                                       league=league)
+                league_collector_names.setdefault(league, set()).add(collector_name)
+
+            for league in [league for league, collector_names in league_collector_names.items()
+                           if running_collector_names <= collector_names]:
+                del league_collector_names[league]
+                yield league, league_betting_lines.pop(league)
+
+    finally:
+        for task in tasks:  # only still running when the consumer stopped early
+            task.cancel()
+
+
+async def run_collectors(batch_num: int, batch_timestamp: datetime, standardizer: Standardizer) -> list[BettingLine]:
     collected_betting_lines = []
-    coros = [
-        collectors.OddsShopperCollector(batch_num, batch_timestamp, collected_betting_lines, standardizer).run_collector()
-    ]
-    await asyncio.gather(*coros)
+    async for _, betting_lines in stream_collectors(batch_num, batch_timestamp, standardizer):
+        collected_betting_lines.extend(betting_lines)
+
     return collected_betting_lines
 
 
 if __name__ == '__main__':
-    asyncio.run(run_collectors())
\ No newline at end of file
+    asyncio.run(run_collectors(0, datetime.now(), Standardizer()))
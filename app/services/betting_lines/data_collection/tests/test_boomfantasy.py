@@ -0,0 +1,93 @@
+import asyncio
+import base64
+import json
+import time
+from datetime import datetime
+
+import pytest
+
+from app.services.betting_lines.data_collection.collectors import boomfantasy
+from app.services.utils import Standardizer, utilities as utils
+
+
+def _get_access_token(expiry: float) -> str:
+    payload = base64.urlsafe_b64encode(json.dumps({'exp': expiry}).encode()).decode().rstrip('=')
+    return f'header.{payload}.signature'
+
+
+def _get_betting_lines_resp() -> dict:
+    return {'data': {'multiLineContest': {'sections': [
+        {'league': 'nba', 'status': 'active', 'qG': [
+            {'title': {'o': {'firstName': 'Alexandre', 'lastName': 'Sarr'}}, 'periodClassifier': 'fullGame', 'q': [
+                {'statistic': 'POINTS', 'c': [
+                    {'l': 12.5, 'c': [[0, 'over', 1.85], [0, 'under', 1.95]]},
+                    {'l': 0, 'c': [[0, 'over', 1.2], ['malformed']]},
+                ]},
+                {'statistic': 'POINTS', 'c': [{'l': 4.5, 'c': [[0, 'over', 1.9]]}]},
+                {'statistic': 'UNKNOWN', 'c': [{'l': 1.5, 'c': [[0, 'over', 1.9]]}]},
+            ]},
+            {'title': {'o': {'firstName': 'Alexandre', 'lastName': 'Sarr'}}, 'periodClassifier': 'firstQuarter', 'q': [
+                {'statistic': 'POINTS', 'c': [{'l': 3.5, 'c': [[0, 'under', 1.8]]}]},
+            ]},
+        ]},
+        {'league': 'NBA', 'status': 'closed', 'qG': [
+            {'title': {'o': {'firstName': 'Alexandre', 'lastName': 'Sarr'}}, 'q': [
+                {'statistic': 'POINTS', 'c': [{'l': 8.5, 'c': [[0, 'over', 1.9]]}]},
+            ]},
+        ]},
+    ]}}}
+
+
+@pytest.fixture
+def collector(monkeypatch):
+    monkeypatch.setattr(boomfantasy.BoomFantasyCollector, 'tokens', None)
+    monkeypatch.setattr(boomfantasy.BoomFantasyCollector, 'token_expiry', 0.0)
+    monkeypatch.setattr(boomfantasy.BoomFantasyCollector, 'contest_id', None)
+    return boomfantasy.BoomFantasyCollector(0, datetime.now(), asyncio.Queue(), Standardizer())
+
+
+def test_get_token_expiry():
+    assert boomfantasy.get_token_expiry(_get_access_token(1735660187)) == 1735660187
+    assert boomfantasy.get_token_expiry('not a jwt') is None
+
+
+def test_parse_betting_lines(collector):
+    betting_lines = collector._parse_betting_lines(_get_betting_lines_resp())['NBA']
+    assert [(line.subject, line.market, line.label, line.line, line.odds) for line in betting_lines] == [
+        ('Alex Sarr', 'Points', 'Over', 12.5, 1.85),
+        ('Alex Sarr', 'Points', 'Under', 12.5, 1.95),
+        ('Alex Sarr', 'Points', 'Over', 0.0, 1.2),
+        ('Alex Sarr', 'Points', 'Over', 4.5, 1.9),
+        ('Alex Sarr', '1Q Points', 'Under', 3.5, 1.8),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_tokens_and_contest_id_are_reused_until_they_expire_or_fail(collector, monkeypatch):
+    posted_urls, fetch_results = [], []
+
+    async def post(url, **kwargs):
+        posted_urls.append(url)
+        if url == collector.payload['urls']['tokens']:
+            return {'accessToken': _get_access_token(time.time() + 3600), 'refreshToken': 'refresh'}
+
+        return {'data': {'contests': [{'title': "Pick' Em", '_id': 'contest'}]}}
+
+    async def fetch(url, **kwargs):
+        if result := fetch_results.pop(0):
+            raise result
+
+        return _get_betting_lines_resp()
+
+    monkeypatch.setattr(utils.requester, 'post', post)
+    monkeypatch.setattr(utils.requester, 'fetch', fetch)
+    tokens_url, contest_ids_url = collector.payload['urls']['tokens'], collector.payload['urls']['contest_ids']
+
+    fetch_results.extend([None, None])
+    await collector.run_collector()
+    await collector.run_collector()
+    assert posted_urls == [tokens_url, contest_ids_url]  # the payload's token has expired, then both are kept
+
+    fetch_results.extend([Exception('status code 401'), None])
+    await collector.run_collector()
+    assert posted_urls == [tokens_url, contest_ids_url, tokens_url, contest_ids_url]
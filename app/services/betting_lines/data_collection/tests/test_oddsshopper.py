@@ -0,0 +1,51 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from app.services.betting_lines.data_collection.collectors import OddsShopperCollector
+from app.services.utils import Standardizer
+
+
+@pytest.fixture
+def collector():
+    return OddsShopperCollector(0, datetime.now(), asyncio.Queue(), Standardizer())
+
+
+@pytest.mark.asyncio
+async def test_failed_offers_only_lose_their_own_lines(collector, monkeypatch):
+    async def request_offer_betting_lines(league, offer_id):
+        if offer_id == 'failing':
+            raise ValueError('404')
+
+        return [f'{offer_id} line']
+
+    monkeypatch.setattr(collector, '_request_offer_betting_lines', request_offer_betting_lines)
+    await collector._collect_league('NBA', ['first', 'failing', 'last'])
+    assert collector.collected_betting_lines_queue.get_nowait() == ('OddsShopper', 'NBA', ['first line', 'last line'])
+    assert collector.num_betting_lines_collected == 2
+
+
+@pytest.mark.asyncio
+async def test_a_failing_league_cancels_the_others(collector, monkeypatch):
+    async def request_matchups():
+        return {'offerCategories': []}
+
+    def parse_matchups(resp):
+        return [('NBA', 'nba offer'), ('NCAAM', 'ncaam offer')]
+
+    async def collect_league(league, offer_ids):
+        if league == 'NBA':
+            raise ValueError('unexpected')
+
+        await asyncio.sleep(1)
+        await collector.put_betting_lines(league, ['late line'])
+
+    monkeypatch.setattr(collector, '_request_matchups', request_matchups)
+    monkeypatch.setattr(collector, '_parse_matchups', parse_matchups)
+    monkeypatch.setattr(collector, '_collect_league', collect_league)
+    with pytest.raises(ExceptionGroup):
+        await collector.run_collector()
+
+    await asyncio.sleep(0)
+    assert collector.collected_betting_lines_queue.empty()  # nothing is put after the collector has finished
@@ -0,0 +1,93 @@
+import asyncio
+import importlib
+from collections import defaultdict
+from datetime import datetime
+
+import pytest
+
+from app.services.betting_lines.data_collection import main, collectors
+from app.services.configs import _CONFIGS
+
+
+def test_named_collectors_register_themselves(monkeypatch):
+    monkeypatch.setattr(collectors.Collector, 'registry', {})
+
+    class _Base(collectors.Collector):
+        pass
+
+    class _Named(_Base):
+        name = 'Named'
+
+    assert collectors.Collector.registry == {'Named': _Named}
+
+
+def test_discovery_finds_the_package_collectors():
+    assert collectors.discover_collectors()['OddsShopper'] is collectors.OddsShopperCollector
+
+
+@pytest.mark.asyncio
+async def test_a_collector_module_that_fails_to_import_is_left_out(monkeypatch):
+    monkeypatch.setattr(collectors.Collector, 'registry', {})
+
+    class _Healthy(collectors.Collector):
+        name = 'Healthy'
+
+        async def run_collector(self) -> None:
+            await self.put_betting_lines('NBA', ['Healthy NBA'])
+
+    import_module = importlib.import_module
+
+    def _import_module(name: str, *args):
+        if name == f'{collectors.__name__}.boomfantasy':
+            raise ImportError('broken collector')
+
+        return import_module(name, *args)
+
+    monkeypatch.setattr(importlib, 'import_module', _import_module)
+    monkeypatch.setattr(main, 'collector_metrics', defaultdict(collectors.CollectorMetrics))
+    collectors._import_collector_modules.cache_clear()
+    try:
+        assert collectors.discover_collectors() == {'Healthy': _Healthy}
+        collected = {league: betting_lines async for league, betting_lines in main.stream_collectors(0, datetime.now(), None)}
+        assert collected == {'NBA': ['Healthy NBA']}
+
+    finally:
+        collectors._import_collector_modules.cache_clear()
+
+
+@pytest.mark.asyncio
+async def test_a_hanging_or_failing_collector_does_not_stall_the_batch(monkeypatch):
+    monkeypatch.setattr(collectors.Collector, 'registry', {})
+
+    class _Healthy(collectors.Collector):
+        name = 'Healthy'
+
+        async def run_collector(self) -> None:
+            await self.put_betting_lines('NBA', ['Healthy NBA'])
+
+    class _Hanging(collectors.Collector):
+        name = 'Hanging'
+
+        async def run_collector(self) -> None:
+            await self.put_betting_lines('NCAAM', ['Hanging NCAAM'])
+            await asyncio.sleep(60)
+
+    class _Failing(collectors.Collector):
+        name = 'Failing'
+
+        async def run_collector(self) -> None:
+            raise ValueError('unexpected response')
+
+    monkeypatch.setitem(_CONFIGS['collecting'], 'Hanging', {'timeout': 0.1})
+    monkeypatch.setattr(collectors, 'discover_collectors', lambda: dict(collectors.Collector.registry))
+    monkeypatch.setattr(main, 'collector_metrics', defaultdict(collectors.CollectorMetrics))
+
+    collected = {league: betting_lines async for league, betting_lines in main.stream_collectors(0, datetime.now(), None)}
+
+    assert collected == {'NBA': ['Healthy NBA'], 'NCAAM': ['Hanging NCAAM']}  # delivered leagues survive a timeout
+    assert main.collector_metrics['Healthy'].last_status == 'completed'
+    assert main.collector_metrics['Hanging'].last_status == 'timed_out'
+    assert main.collector_metrics['Hanging'].num_timeouts == 1
+    assert 0.1 <= main.collector_metrics['Hanging'].last_duration < 1
+    assert main.collector_metrics['Failing'].last_status == 'failed'
+    assert main.collector_metrics['Failing'].last_num_betting_lines == 0
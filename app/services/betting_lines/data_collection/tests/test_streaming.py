@@ -0,0 +1,40 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from app.services.betting_lines.data_collection import main
+
+
+class _Collector:
+    def __init__(self, name: str, queue: asyncio.Queue, deliveries: list[tuple[float, str]], finish_delay: float = 0):
+        self.name, self.queue, self.deliveries, self.finish_delay = name, queue, deliveries, finish_delay
+
+    async def run_collector(self) -> None:
+        for delay, league in self.deliveries:
+            await asyncio.sleep(delay)
+            await self.queue.put((self.name, league, [f'{self.name} {league}']))
+
+        await asyncio.sleep(self.finish_delay)
+
+
+@pytest.mark.asyncio
+async def test_leagues_are_yielded_once_no_running_collector_can_add_to_them(monkeypatch):
+    def get_collectors(batch_num, batch_timestamp, standardizer, queue):
+        return {
+            'Fast': _Collector('Fast', queue, [(0, 'NBA'), (0, 'NCAAM')]),
+            'Slow': _Collector('Slow', queue, [(0.05, 'NBA')], finish_delay=0.2),
+        }
+
+    monkeypatch.setattr(main, '_get_collectors', get_collectors)
+    loop = asyncio.get_running_loop()
+    start_time = loop.time()
+    yielded = []
+    async for league, betting_lines in main.stream_collectors(0, datetime.now(), None):
+        yielded.append((league, betting_lines, loop.time() - start_time))
+
+    (first_league, first_betting_lines, first_time), (second_league, second_betting_lines, second_time) = yielded
+    assert (first_league, first_betting_lines) == ('NBA', ['Fast NBA', 'Slow NBA'])
+    assert first_time < 0.15  # not held back until the slow collector finishes
+    assert (second_league, second_betting_lines) == ('NCAAM', ['Fast NCAAM'])
+    assert second_time >= 0.2  # the slow collector could still have delivered NCAAM lines until it finished
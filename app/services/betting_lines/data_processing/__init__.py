@@ -1,3 +1,4 @@
 from .processors import *
+from .parallel import ParallelProcessor, parallel_processor
 
-__all__ = ['run_processors']
\ No newline at end of file
+__all__ = ['run_processors', 'ParallelProcessor', 'parallel_processor']
\ No newline at end of file
@@ -0,0 +1,156 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+import pandas as pd
+
+from app.services.configs import load_configs
+from app.services.betting_lines.data_processing.processors import PROCESSING_FIELDS, evaluate_betting_lines, run_processors
+from app.services.utils.modelling import BettingLine, to_columns
+from app.services.utils.standardization.vocabulary import Vocabulary, CATEGORICAL_FIELDS
+
+
+RESULT_FIELDS = ['impl_prb', 'tw_prb', 'ev']
+
+logger = logging.getLogger(__name__)
+
+
+def _get_layout(num_rows: int) -> list[tuple[str, str, int]]:
+    # (field, dtype, byte offset) of every column inside the shared input block, categorical fields travel as codes
+    layout, offset = [], 0
+    for field_name in PROCESSING_FIELDS:
+        dtype = 'int32' if field_name in CATEGORICAL_FIELDS else 'float64'
+        layout.append((field_name, dtype, offset))
+        offset += num_rows * np.dtype(dtype).itemsize
+
+    return layout
+
+
+def _get_shard_ids(league_codes: np.ndarray, subject_codes: np.ndarray, num_shards: int) -> np.ndarray:
+    # every line of a (league, subject) lands in the same shard, so each market is devigged and averaged whole
+    return ((league_codes.astype(np.int64) << 32) + subject_codes) % num_shards
+
+
+def _process_shard(input_name: str, output_name: str, layout: list, num_rows: int, start: int, end: int,
+                   bookmakers: list[str]) -> None:
+    input_shm, output_shm = SharedMemory(input_name), SharedMemory(output_name)
+    try:
+        columns = {
+            field_name: np.ndarray(num_rows, dtype, buffer=input_shm.buf, offset=offset)[start:end].copy()
+            for field_name, dtype, offset in layout
+        }
+        # only the bookmaker values are needed (for the sharp weights), the other keys stay plain int32 codes
+        columns['bookmaker'] = pd.Categorical.from_codes(columns['bookmaker'], categories=bookmakers)
+        evaluated_betting_lines_df = evaluate_betting_lines(pd.DataFrame(columns))
+
+        outputs = np.ndarray((len(RESULT_FIELDS), num_rows), 'float64', buffer=output_shm.buf)
+        rows = start + evaluated_betting_lines_df.index.to_numpy()
+        for i, field_name in enumerate(RESULT_FIELDS):
+            outputs[i, rows] = evaluated_betting_lines_df[field_name].to_numpy(dtype=float)
+
+        del outputs  # the views have to be released before the blocks can be closed
+
+    finally:
+        input_shm.close()
+        output_shm.close()
+
+
+class ParallelProcessor:
+    # runs the processors on a process pool, sharded by (league, subject), with the batch columns passed through
+    # shared memory instead of being pickled to every worker
+
+    def __init__(self):
+        self.configs = load_configs('processing')
+        self.max_workers = self.configs['max_workers'] or os.cpu_count()
+        self._executor: ProcessPoolExecutor | None = None
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawned, since forking the api process would also copy its event loop and driver threads
+            self._executor = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context('spawn'))
+
+        return self._executor
+
+    @staticmethod
+    def _write_columns(shm: SharedMemory, layout: list, columns: dict[str, np.ndarray], order: np.ndarray) -> None:
+        for field_name, dtype, offset in layout:
+            column = np.ndarray(len(order), dtype, buffer=shm.buf, offset=offset)
+            column[:] = columns[field_name][order]
+            del column
+
+    async def _run_shards(self, betting_lines: list[BettingLine], vocabulary: Vocabulary) -> list[BettingLine]:
+        num_rows = len(betting_lines)
+        columns = {
+            field_name: (vocabulary.encode(field_name, values) if field_name in CATEGORICAL_FIELDS
+                         else np.asarray(values, dtype=float))
+            for field_name, values in to_columns(betting_lines, PROCESSING_FIELDS).items()
+        }
+        num_shards = self.max_workers * self.configs['shards_per_worker']
+        shard_ids = _get_shard_ids(columns['league'], columns['subject'], num_shards)
+        order = np.argsort(shard_ids, kind='stable')  # each shard becomes a contiguous slice, in collection order
+        shard_bounds = np.searchsorted(shard_ids[order], np.arange(num_shards + 1))
+
+        layout = _get_layout(num_rows)
+        input_shm = SharedMemory(create=True, size=sum(num_rows * np.dtype(dtype).itemsize for _, dtype, _ in layout))
+        output_shm = SharedMemory(create=True, size=len(RESULT_FIELDS) * num_rows * 8)
+        try:
+            self._write_columns(input_shm, layout, columns, order)
+            outputs = np.ndarray((len(RESULT_FIELDS), num_rows), 'float64', buffer=output_shm.buf)
+            outputs.fill(np.nan)
+
+            loop = asyncio.get_running_loop()
+            executor = self._get_executor()
+            bookmakers = list(vocabulary.values['bookmaker'])
+            await asyncio.gather(*[
+                loop.run_in_executor(executor, _process_shard, input_shm.name, output_shm.name, layout, num_rows,
+                                     int(start), int(end), bookmakers)
+                for start, end in zip(shard_bounds[:-1], shard_bounds[1:]) if end > start
+            ])
+            results = np.empty_like(outputs)
+            results[:, order] = outputs  # back to collection order
+            del outputs
+
+        finally:
+            input_shm.close()
+            input_shm.unlink()
+            output_shm.close()
+            output_shm.unlink()
+
+        impl_prbs, tw_prbs, evs = results
+        # same order as the in-process path: ev descending, ties kept in collection order
+        evaluated_rows = np.flatnonzero(~(np.isnan(tw_prbs) | np.isnan(evs)))
+        evaluated_rows = evaluated_rows[np.argsort(-evs[evaluated_rows], kind='stable')]
+        evaluated_betting_lines = []
+        for i, impl_prb, tw_prb, ev in zip(evaluated_rows.tolist(), impl_prbs[evaluated_rows].tolist(),
+                                           tw_prbs[evaluated_rows].tolist(), evs[evaluated_rows].tolist()):
+            betting_line = betting_lines[i]
+            betting_line.impl_prb, betting_line.tw_prb, betting_line.ev = impl_prb, tw_prb, ev
+            evaluated_betting_lines.append(betting_line)
+
+        return evaluated_betting_lines
+
+    async def run_processors(self, betting_lines: list[BettingLine], vocabulary: Vocabulary = None) -> list[BettingLine]:
+        vocabulary = vocabulary or Vocabulary()
+        if not betting_lines:
+            return []
+
+        if len(betting_lines) < self.configs['min_parallel_size']:  # not worth the transfer, keep it off the loop only
+            return await asyncio.to_thread(run_processors, betting_lines, vocabulary)
+
+        evaluated_betting_lines = await self._run_shards(betting_lines, vocabulary)
+        logger.info('Calculated expected values', extra={
+            'num_betting_lines': len(evaluated_betting_lines), 'num_processes': self.max_workers
+        })
+        return evaluated_betting_lines
+
+    def close(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+
+parallel_processor = ParallelProcessor()
@@ -1,6 +1,12 @@
-import asyncio
+import logging
+
+import numpy as np
 import pandas as pd
 
+from app.services.utils import utilities as utils
+from app.services.utils.modelling import BettingLine, to_columns
+from app.services.utils.standardization.vocabulary import Vocabulary, CATEGORICAL_FIELDS
+
 
 SHARP_PROP_BOOKMAKERS_WEIGHTS = {
     'BetOnline': 0.6,
@@ -8,86 +14,126 @@ SHARP_PROP_BOOKMAKERS_WEIGHTS = {
     'Caesars': 0.1
 }
 
+MARKET_KEY_FIELDS = ['league', 'subject', 'market', 'line']
+PROCESSING_FIELDS = ['bookmaker', *MARKET_KEY_FIELDS, 'label', 'odds']
 
-def _get_true_prb(df: pd.DataFrame) -> pd.DataFrame:
-    sharp_betting_lines = df[df['bookmaker'].isin(SHARP_PROP_BOOKMAKERS_WEIGHTS.keys())]
-
-    def devig(row):
-        matching_prop_lines = sharp_betting_lines[
-            (sharp_betting_lines['line'] == row['line']) &
-            (sharp_betting_lines['league'] == row['league']) &
-            (sharp_betting_lines['subject'] == row['subject']) &
-            (sharp_betting_lines['market'] == row['market']) &
-            (sharp_betting_lines['bookmaker'] == row['bookmaker']) &
-            (sharp_betting_lines['label'] != row['label'])
-        ]
-
-        if len(matching_prop_lines) == 1:
-            matching_prop_line = matching_prop_lines.iloc[0]
-            row['tw_prb'] = row['impl_prb'] / (matching_prop_line['impl_prb'] + row['impl_prb'])
-
-        return row
-
-    def weighted_market_avg(grouped_df):
-        weighted_market_avg_betting_line_df = grouped_df.iloc[[0]].drop(['bookmaker', 'odds', 'impl_prb'], axis=1)
-        if len(grouped_df) > 1:
-            weights_sum = 0
-            weighted_market_total = 0
-            for _, row in grouped_df.iterrows():
-                weights = SHARP_PROP_BOOKMAKERS_WEIGHTS[row['bookmaker']]
-                weights_sum += weights
-                weighted_market_total += weights * row['tw_prb']
-
-            weighted_market_avg_betting_line_df['tw_prb'] = weighted_market_total / weights_sum
-
-        return weighted_market_avg_betting_line_df
-
-    devigged_betting_lines = sharp_betting_lines.apply(devig, axis=1).dropna()
-    print('[BettingLines]: Devigged sharp betting lines...')
-    weighted_market_avg_betting_lines = (
-              devigged_betting_lines.groupby(['line', 'league', 'subject', 'market', 'label'])
-                                    .apply(weighted_market_avg)
-    )
-    print('[BettingLines]: Calculated weighted market average...')
+logger = logging.getLogger(__name__)
 
-    return weighted_market_avg_betting_lines
 
+def _devig(sharp_betting_lines: pd.DataFrame) -> pd.Series:
+    # pairs every sharp line with the opposite side(s) offered by the same bookmaker for the same market
+    pair_key_fields = [*MARKET_KEY_FIELDS, 'bookmaker']
+    sides = sharp_betting_lines[[*pair_key_fields, 'label', 'impl_prb']].reset_index(names='row_id')
+    pairs = sides.merge(sides.drop(columns='row_id'), on=pair_key_fields, suffixes=('', '_opp'))
+    pairs = pairs[pairs['label'] != pairs['label_opp']]
+
+    # a line is only devigged when there is exactly one opposite side to pair it with
+    num_opposite_sides = pairs.groupby('row_id', sort=False)['row_id'].transform('size')
+    pairs = pairs[num_opposite_sides == 1]
+
+    tw_prb = pairs['impl_prb'] / (pairs['impl_prb_opp'] + pairs['impl_prb'])
+    return pd.Series(tw_prb.to_numpy(), index=pairs['row_id'].to_numpy()).reindex(sharp_betting_lines.index)
 
-def _calculate_ev(betting_lines: pd.DataFrame, sharp_betting_lines: pd.DataFrame):
 
-    def expected_value(row):
-        matching_sharp_prop_line = sharp_betting_lines[
-            (sharp_betting_lines['line'] == row['line']) &
-            (sharp_betting_lines['league'] == row['league']) &
-            (sharp_betting_lines['subject'] == row['subject']) &
-            (sharp_betting_lines['market'] == row['market']) &
-            (sharp_betting_lines['label'] == row['label'])
-        ]
-        if len(matching_sharp_prop_line) == 1:
-            prb_of_winning = matching_sharp_prop_line.iloc[0]['tw_prb']
-            potential_winnings = row['odds'] - 1
-            row['tw_prb'] = prb_of_winning
-            row['ev'] = (prb_of_winning * potential_winnings) - (1 - prb_of_winning)
+def _weighted_market_avg(devigged_betting_lines: pd.DataFrame) -> pd.DataFrame:
+    if devigged_betting_lines.empty:
+        return devigged_betting_lines[[*MARKET_KEY_FIELDS, 'label', 'tw_prb']]
 
-        return row
+    group_ids = devigged_betting_lines.groupby([*MARKET_KEY_FIELDS, 'label'], sort=False, observed=True).ngroup().to_numpy()
+    order = np.argsort(group_ids, kind='stable')  # keeps bookmakers in collection order within each market
+    sorted_group_ids = group_ids[order]
+    tw_prbs = devigged_betting_lines['tw_prb'].to_numpy()[order]
+    weights = devigged_betting_lines['bookmaker'].map(SHARP_PROP_BOOKMAKERS_WEIGHTS).to_numpy(dtype=float)[order]
 
+    group_starts = np.flatnonzero(np.r_[True, sorted_group_ids[1:] != sorted_group_ids[:-1]])
+    group_sizes = np.diff(np.r_[group_starts, len(sorted_group_ids)])
+    weighted_tw_prbs = weights * tw_prbs
+    weighted_market_totals = np.zeros(len(group_starts))
+    weights_sums = np.zeros(len(group_starts))
+    for offset in range(group_sizes.max()):  # sums each market's bookmakers in order, one position at a time
+        in_group = group_sizes > offset
+        group_rows = group_starts[in_group] + offset
+        weighted_market_totals[in_group] += weighted_tw_prbs[group_rows]
+        weights_sums[in_group] += weights[group_rows]
+
+    weighted_market_avg_betting_lines = devigged_betting_lines.iloc[order[group_starts]][[*MARKET_KEY_FIELDS, 'label']]
+    weighted_market_avg_betting_lines['tw_prb'] = np.where(
+        group_sizes > 1, weighted_market_totals / weights_sums, tw_prbs[group_starts]
+    )
+    return weighted_market_avg_betting_lines.reset_index(drop=True)
+
+
+def _get_true_prb(df: pd.DataFrame) -> pd.DataFrame:
+    sharp_betting_lines = df[df['bookmaker'].isin(SHARP_PROP_BOOKMAKERS_WEIGHTS.keys())].copy()
+    sharp_betting_lines['tw_prb'] = _devig(sharp_betting_lines)
+    devigged_betting_lines = sharp_betting_lines.dropna()
+    weighted_market_avg_betting_lines = _weighted_market_avg(devigged_betting_lines)
+
+    return weighted_market_avg_betting_lines
+
+
+def _calculate_ev(betting_lines: pd.DataFrame, sharp_betting_lines: pd.DataFrame) -> pd.DataFrame:
+    betting_lines_with_ev = betting_lines.merge(
+        sharp_betting_lines, on=[*MARKET_KEY_FIELDS, 'label'], how='left', validate='many_to_one'
+    )
+    potential_winnings = betting_lines_with_ev['odds'] - 1
+    prb_of_winning = betting_lines_with_ev['tw_prb']
+    betting_lines_with_ev['ev'] = (prb_of_winning * potential_winnings) - (1 - prb_of_winning)
     betting_lines_with_ev = (
-        betting_lines.apply(expected_value, axis=1)
-                               .dropna()
-                               .sort_values(by='ev', ascending=False)
+        betting_lines_with_ev.dropna()
+                             .sort_values(by='ev', ascending=False, kind='stable')
     )
-    print('[BettingLines]: Calculated expected values...')
     return betting_lines_with_ev
 
 
-def run_processors(betting_lines: list[dict]):
-    betting_lines_df = pd.DataFrame(betting_lines)
+def _update_betting_lines(betting_lines: list[BettingLine], evaluated_betting_lines_df: pd.DataFrame) -> list[BettingLine]:
+    # fills in impl_prb/tw_prb/ev on the evaluated lines themselves (the frame's index is their batch position)
+    evaluated_betting_lines = []
+    for i, impl_prb, tw_prb, ev in zip(evaluated_betting_lines_df.index.tolist(),
+                                       evaluated_betting_lines_df['impl_prb'].tolist(),
+                                       evaluated_betting_lines_df['tw_prb'].tolist(),
+                                       evaluated_betting_lines_df['ev'].tolist()):
+        betting_line = betting_lines[i]
+        betting_line.impl_prb, betting_line.tw_prb, betting_line.ev = impl_prb, tw_prb, ev
+        evaluated_betting_lines.append(betting_line)
+
+    return evaluated_betting_lines
+
+
+def _create_betting_lines_df(betting_lines: list[BettingLine], vocabulary: Vocabulary) -> pd.DataFrame:
+    # the string fields are dictionary-encoded, so every merge/groupby below hashes integer codes instead of strings
+    columns = to_columns(betting_lines, PROCESSING_FIELDS)
+    for field_name in CATEGORICAL_FIELDS:
+        columns[field_name] = vocabulary.to_categorical(field_name, columns[field_name])
+
+    return pd.DataFrame(columns)
+
+
+def evaluate_betting_lines(betting_lines_df: pd.DataFrame) -> pd.DataFrame:
+    # shared by the in-process path and the process pool shards, so it must not log (once per shard). the spans of
+    # a shard are recorded in its worker process and never exposed, the shards are only timed as a whole
     betting_lines_df['impl_prb'] = 1 / betting_lines_df['odds']
-    sharp_betting_lines_df = _get_true_prb(betting_lines_df)
-    evaluated_betting_lines_df = _calculate_ev(betting_lines_df, sharp_betting_lines_df)
-    return evaluated_betting_lines_df.to_dict(orient='records')
+    with utils.instrumenter.span('devig'):
+        sharp_betting_lines_df = _get_true_prb(betting_lines_df)
+
+    with utils.instrumenter.span('ev'):
+        return _calculate_ev(betting_lines_df, sharp_betting_lines_df)
+
+
+def run_processors(betting_lines: list[BettingLine], vocabulary: Vocabulary = None) -> list[BettingLine]:
+    if not betting_lines:
+        return []
+
+    betting_lines_df = _create_betting_lines_df(betting_lines, vocabulary or Vocabulary())
+    evaluated_betting_lines_df = evaluate_betting_lines(betting_lines_df)
+    logger.info('Calculated expected values', extra={'num_betting_lines': len(evaluated_betting_lines_df)})
+    return _update_betting_lines(betting_lines, evaluated_betting_lines_df)
 
 
 if __name__ == '__main__':
-    betting_lines_data = pd.read_csv('data-samples/oddsshopper-betting-lines-sample.csv').to_dict(orient='records')
-    asyncio.run(run_processors(betting_lines_data))
\ No newline at end of file
+    from datetime import datetime
+    sample_df = pd.read_csv('data-samples/oddsshopper-betting-lines-sample.csv').drop(columns='impl_prb')
+    betting_lines_data = [
+        BettingLine(0, datetime.now(), datetime.now(), **row) for row in sample_df.to_dict(orient='records')
+    ]
+    print(len(run_processors(betting_lines_data)))
@@ -0,0 +1,30 @@
+import copy
+
+import pytest
+
+from app.services.betting_lines.data_processing import ParallelProcessor, run_processors
+from app.services.utils.standardization import Vocabulary
+from app.services.betting_lines.tests.synthetic import generate_betting_lines
+
+
+def _create_processor(**configs) -> ParallelProcessor:
+    processor = ParallelProcessor()
+    processor.configs = {**processor.configs, **configs}
+    processor.max_workers = 2
+    return processor
+
+
+@pytest.mark.asyncio
+async def test_sharded_processing_matches_in_process():
+    betting_lines = generate_betting_lines(5_000, seed=3)
+    expected = run_processors(copy.deepcopy(betting_lines))
+
+    processor = _create_processor(min_parallel_size=0, shards_per_worker=3)
+    try:
+        vocabulary = Vocabulary()
+        vocabulary.encode('bookmaker', ['Pinnacle'])  # codes already handed out by earlier batches
+        actual = await processor.run_processors(betting_lines, vocabulary)
+    finally:
+        processor.close()
+
+    assert actual == expected  # same values, bit for bit, in the same order
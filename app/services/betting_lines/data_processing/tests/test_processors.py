@@ -0,0 +1,111 @@
+from collections import defaultdict
+from datetime import datetime
+
+import pytest
+
+from app.services.betting_lines.data_processing import processors, run_processors
+from app.services.utils.modelling import BettingLine
+from app.services.utils.standardization import Vocabulary
+from app.services.betting_lines.tests.synthetic import generate_betting_lines
+
+
+def _line(bookmaker: str, label: str, odds: float, subject: str = 'LeBron James', line: float = 24.5) -> BettingLine:
+    return BettingLine(
+        batch_num=0,
+        batch_timestamp=datetime(2025, 1, 1),
+        collection_timestamp=datetime(2025, 1, 1),
+        bookmaker=bookmaker,
+        league='NBA',
+        market='Points',
+        subject=subject,
+        label=label,
+        line=line,
+        odds=odds,
+    )
+
+
+def _reference_values(betting_lines: list[BettingLine]) -> dict:
+    # brute-force version of the original row-wise devig and ev, one python loop per step
+    weights = processors.SHARP_PROP_BOOKMAKERS_WEIGHTS
+    betting_lines = [line.to_dict() for line in betting_lines]
+    sharp_lines = [{**line, 'impl_prb': 1 / line['odds']} for line in betting_lines if line['bookmaker'] in weights]
+    markets = defaultdict(list)
+    for line in sharp_lines:
+        opposite_sides = [
+            other for other in sharp_lines
+            if all(other[k] == line[k] for k in ['league', 'subject', 'market', 'line', 'bookmaker'])
+            and other['label'] != line['label']
+        ]
+        if len(opposite_sides) == 1:
+            tw_prb = line['impl_prb'] / (opposite_sides[0]['impl_prb'] + line['impl_prb'])
+            markets[(line['league'], line['subject'], line['market'], line['line'], line['label'])].append(
+                (weights[line['bookmaker']], tw_prb)
+            )
+
+    consensus = {}
+    for market_key, weighted_tw_prbs in markets.items():
+        if len(weighted_tw_prbs) == 1:
+            consensus[market_key] = weighted_tw_prbs[0][1]
+        else:
+            weights_sum, weighted_market_total = 0, 0
+            for weight, tw_prb in weighted_tw_prbs:
+                weights_sum += weight
+                weighted_market_total += weight * tw_prb
+
+            consensus[market_key] = weighted_market_total / weights_sum
+
+    values = {}
+    for line in betting_lines:
+        if (tw_prb := consensus.get((line['league'], line['subject'], line['market'], line['line'], line['label']))) is not None:
+            values[(line['_id'], line['line'])] = (tw_prb, (tw_prb * (line['odds'] - 1)) - (1 - tw_prb))
+
+    return values
+
+
+def test_devig_and_ev_for_single_market():
+    betting_lines = [
+        _line('BetOnline', 'Over', 1.8), _line('BetOnline', 'Under', 2.0),
+        _line('FanDuel', 'Over', 1.9), _line('FanDuel', 'Under', 1.9),
+        _line('PrizePicks', 'Over', 2.1),
+    ]
+    evaluated_betting_lines = {line.id: line for line in run_processors(betting_lines)}
+
+    betonline_over = (1 / 1.8) / (1 / 2.0 + 1 / 1.8)
+    tw_prb_over = (0.6 * betonline_over + 0.3 * 0.5) / (0.6 + 0.3)
+    prizepicks_over = evaluated_betting_lines['PrizePicks:NBA:Points:LeBron James:Over']
+    assert prizepicks_over.tw_prb == pytest.approx(tw_prb_over)
+    assert prizepicks_over.ev == pytest.approx(tw_prb_over * 1.1 - (1 - tw_prb_over))
+    assert len(evaluated_betting_lines) == 5
+
+
+def test_lines_without_a_sharp_pair_are_dropped():
+    betting_lines = [
+        _line('BetOnline', 'Over', 1.8),  # no under to devig against
+        _line('FanDuel', 'Over', 1.9), _line('FanDuel', 'Under', 1.9, line=25.5),  # different line
+        _line('DraftKings', 'Over', 1.9),
+    ]
+    assert run_processors(betting_lines) == []
+    assert run_processors([]) == []
+
+
+def test_evaluated_betting_lines_are_sorted_by_ev():
+    evaluated_betting_lines = run_processors(generate_betting_lines(2_000, seed=1))
+    evs = [line.ev for line in evaluated_betting_lines]
+    assert evs == sorted(evs, reverse=True)
+
+
+@pytest.mark.parametrize('seed', [0, 1, 2])
+def test_matches_row_wise_reference_exactly(seed):
+    betting_lines = generate_betting_lines(3_000, seed=seed)
+    evaluated_betting_lines = run_processors(betting_lines)
+    values = {(line.id, line.line): (line.tw_prb, line.ev) for line in evaluated_betting_lines}
+    assert values == _reference_values(betting_lines)
+
+
+def test_shared_vocabulary_across_batches():
+    vocabulary = Vocabulary()
+    for seed in [0, 1]:
+        betting_lines = generate_betting_lines(1_000, seed=seed)
+        evaluated_betting_lines = run_processors(betting_lines, vocabulary)
+        values = {(line.id, line.line): (line.tw_prb, line.ev) for line in evaluated_betting_lines}
+        assert values == _reference_values(betting_lines)
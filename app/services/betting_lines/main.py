@@ -1,38 +1,119 @@
 import asyncio
-import time
+import logging
 from datetime import datetime
 
+from app import cache
 from app.db import db
-from app.services.utils import Standardizer
-from app.services.betting_lines.data_collection import run_collectors
-from app.services.betting_lines.data_processing import run_processors
+from app.services.configs import load_configs
+from app.services.utils import Standardizer, utilities as utils
+from app.services.betting_lines.data_collection import stream_collectors
+from app.services.betting_lines.data_processing import parallel_processor
+from app.services.betting_lines.scheduling import Batch, CoalescingQueue, get_next_start
 
 
+logger = logging.getLogger(__name__)
+
 def _update_batch_num(batch_num: int) -> int:
     return 0 if datetime.now().hour == 0 else batch_num + 1
 
 
-async def run_pipeline():
-    rosters = await db.rosters.get_rosters({})
-    standardizer = Standardizer(rosters)
+async def _collect_batches(standardizer: Standardizer, process_queue: CoalescingQueue, cadence: float) -> None:
+    loop = asyncio.get_running_loop()
     batch_num = 0
+    start_time = loop.time()
     while True:
         batch_timestamp = datetime.now()
-        start_time = time.time()
-        print('[BettingLines]: Running betting lines pipeline...')
-        print('[BettingLines]: Starting data collectors...')
-        collected_betting_lines = await run_collectors(batch_num, batch_timestamp, standardizer)
-        print('[BettingLines]: Finished data collection...')
-        print('[BettingLines]: Starting data processors...')
-        betting_lines_pr = run_processors(collected_betting_lines) # Todo: should be multi-processed
-        print('[BettingLines]: Finished data processing...')
-        print('[BettingLines]: Storing processed betting lines...')
-        await db.betting_lines.store_betting_lines(betting_lines_pr)
-        print(f'[BettingLines]: Stored {len(betting_lines_pr)} processed betting lines...')
-        end_time = time.time()
-        print(f'[BettingLines]: Pipeline completed in {round(end_time - start_time, 2)} seconds. Sleeping for 60 seconds...')
+        logger.info('Starting data collectors', extra={'batch_num': batch_num})
+        async for league, collected_betting_lines in stream_collectors(batch_num, batch_timestamp, standardizer):
+            # each league goes on to processing as soon as it is complete, while the others are still collected
+            batch = Batch(batch_num, batch_timestamp, start_time, league, collected_betting_lines)
+            if stale_batch := process_queue.put(league, batch):
+                logger.warning('Processing is behind, skipped a batch', extra={
+                    'league': league, 'skipped_batch_num': stale_batch.batch_num, 'batch_num': batch_num
+                })
+
+        logger.info('Finished data collection', extra={'batch_num': batch_num})
+        standardizer.market_resolver.report_unknown_markets()
         batch_num = _update_batch_num(batch_num)
-        await asyncio.sleep(60)
+        start_time, num_skipped_ticks = get_next_start(start_time, cadence, loop.time())
+        if num_skipped_ticks:
+            logger.warning('Collection overran the cadence', extra={'cadence': cadence, 'num_skipped_batches': num_skipped_ticks})
+
+        await asyncio.sleep(start_time - loop.time())
+
+
+async def _process_batches(standardizer: Standardizer, process_queue: CoalescingQueue, store_queue: asyncio.Queue) -> None:
+    while True:
+        batch = await process_queue.get()
+        with utils.instrumenter.span('process', league=batch.league):
+            batch.betting_lines = await parallel_processor.run_processors(batch.betting_lines, standardizer.vocabulary)
+
+        logger.info('Finished data processing', extra={
+            'league': batch.league, 'batch_num': batch.batch_num, 'num_betting_lines': len(batch.betting_lines)
+        })
+        await store_queue.put(batch)  # every processed batch is stored, a slow store holds processing back instead
+
+
+async def _store_batches(store_queue: asyncio.Queue) -> None:
+    loop = asyncio.get_running_loop()
+    while True:
+        batch = await store_queue.get()
+        with utils.instrumenter.span('store', league=batch.league):
+            await db.betting_lines.store_betting_lines(batch.betting_lines)
+
+        with utils.instrumenter.span('cache', league=batch.league):  # after mongo, so a cache hit is always stored
+            await cache.betting_lines.store_betting_lines(batch.league, batch.betting_lines)
+
+        utils.instrumenter.inc('betting_lines_stored_total', len(batch.betting_lines), league=batch.league)
+        logger.info('Batch completed', extra={
+            'league': batch.league, 'batch_num': batch.batch_num, 'num_betting_lines': len(batch.betting_lines),
+            'duration': round(loop.time() - batch.start_time, 2)
+        })
+        store_queue.task_done()
+
+
+async def _reload_subjects(standardizer: Standardizer, interval: float, roster_diff_timestamp: datetime | None) -> None:
+    # the rosters pipeline stores a diff event whenever a daily refresh changed any roster (trades, call ups), a
+    # running pipeline picks those up without a restart. only the teams whose rosters changed are rebuilt
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            latest_roster_diff_timestamp = await db.rosters.get_latest_roster_diff_timestamp()
+            if latest_roster_diff_timestamp == roster_diff_timestamp:
+                continue
+
+            rosters = await db.rosters.get_rosters({})
+
+        except Exception:  # the current version keeps serving until the next try
+            logger.exception('Could not load rosters to reload subjects')
+            continue
+
+        roster_diff_timestamp = latest_roster_diff_timestamp
+        if standardizer.reload_subjects(rosters):
+            logger.info('Reloaded subjects', extra={
+                'version': standardizer.subject_index.version, 'num_rosters': len(rosters),
+                'changed_leagues': sorted(standardizer.subject_index.changed_leagues)
+            })
+
+
+async def run_pipeline():
+    # collection, processing and storage run as separate stages connected by queues, league by league, so a league is
+    # processed and stored while the others (and later the next batch) are still collected, on a fixed cadence from
+    # each batch start
+    utils.instrumenter.start_logging()
+    configs = load_configs('betting_lines')
+    await db.betting_lines.create_indexes()
+    roster_diff_timestamp = await db.rosters.get_latest_roster_diff_timestamp()  # read first, so no diff is missed
+    rosters = await db.rosters.get_rosters({})
+    standardizer = Standardizer(rosters)
+    process_queue = CoalescingQueue()
+    store_queue = asyncio.Queue(maxsize=configs['queue_size'])
+    logger.info('Running betting lines pipeline')
+    async with asyncio.TaskGroup() as stages:  # a failing stage cancels the others instead of leaving them hanging
+        stages.create_task(_collect_batches(standardizer, process_queue, configs['cadence']))
+        stages.create_task(_process_batches(standardizer, process_queue, store_queue))
+        stages.create_task(_store_batches(store_queue))
+        stages.create_task(_reload_subjects(standardizer, configs['subjects_reload_interval'], roster_diff_timestamp))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,48 @@
+import asyncio
+import math
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Hashable
+
+
+@dataclass(slots=True)
+class Batch:
+    batch_num: int
+    batch_timestamp: datetime
+    start_time: float  # loop time the batch's collection started at
+    league: str  # batches are handed between stages one league at a time
+    betting_lines: list
+
+
+class CoalescingQueue:
+    # holds at most one waiting item per key, put never waits: when the consumer is behind, the waiting (now stale)
+    # item of the key is swapped for the newer one, keeping its place in line, and returned
+
+    def __init__(self):
+        self._items: dict[Hashable, Any] = {}
+        self._not_empty = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def put(self, key: Hashable, item: Any) -> Any:
+        stale_item = self._items.get(key)
+        self._items[key] = item
+        self._not_empty.set()
+        return stale_item
+
+    async def get(self) -> Any:
+        while not self._items:
+            self._not_empty.clear()
+            await self._not_empty.wait()
+
+        return self._items.pop(next(iter(self._items)))
+
+
+def get_next_start(start_time: float, cadence: float, now: float) -> tuple[float, int]:
+    # next tick on the fixed grid start_time + k * cadence that has not passed yet, and how many ticks were missed
+    num_ticks = max(1, math.ceil((now - start_time) / cadence))
+    if start_time + num_ticks * cadence <= now:
+        num_ticks += 1
+
+    return start_time + num_ticks * cadence, num_ticks - 1
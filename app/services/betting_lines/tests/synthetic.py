@@ -0,0 +1,99 @@
+import random
+from datetime import datetime, timedelta
+
+from app.services.utils.modelling import BettingLine
+
+
+BOOKMAKERS = [
+    'BetOnline', 'FanDuel', 'Caesars', 'DraftKings', 'BetMGM', 'ESPNBet', 'BetRivers', 'Fliff', 'HardRock',
+    'Unibet', 'Bovada', 'PrizePicks', 'Underdog', 'Sleeper', 'Dabble', 'Pick6'
+]
+LEAGUES = ['NBA', 'NCAAM']
+MARKETS = ['Points', 'Rebounds', 'Assists', 'Points + Rebounds + Assists', 'Three Pointers Made', 'Steals']
+
+
+def generate_betting_lines(num_betting_lines: int, seed: int = 0, batch_num: int = 0) -> list[BettingLine]:
+    """Deterministic, collector-shaped betting lines (both sides of each prop for a random set of books)."""
+    rng = random.Random(seed)
+    batch_timestamp = datetime(2025, 1, 1) + timedelta(minutes=batch_num)
+    betting_lines = []
+    subject_num = 0
+    while len(betting_lines) < num_betting_lines:
+        league = rng.choice(LEAGUES)
+        subject = f'Subject {subject_num}'
+        subject_num += 1
+        for market in rng.sample(MARKETS, k=rng.randint(1, len(MARKETS))):
+            line = rng.randint(0, 30) + 0.5
+            over_prb = rng.uniform(0.3, 0.7)
+            for bookmaker in rng.sample(BOOKMAKERS, k=rng.randint(2, len(BOOKMAKERS))):
+                vig = rng.uniform(1.02, 1.08)
+                for label, prb in [('Over', over_prb), ('Under', 1 - over_prb)]:
+                    betting_lines.append(BettingLine(
+                        batch_num=batch_num,
+                        batch_timestamp=batch_timestamp,
+                        collection_timestamp=batch_timestamp,
+                        bookmaker=bookmaker,
+                        league=league,
+                        market=market,
+                        subject=subject,
+                        label=label,
+                        line=line,
+                        odds=round(1 / (prb * vig), 2),
+                    ))
+
+    return betting_lines[:num_betting_lines]
+
+
+# raw offer names as OddsShopper sends them, all of them standardize
+ODDSSHOPPER_OFFER_NAMES = ['Points', 'Rebounds', 'Assists', 'Points + Rebounds + Assists', '3-Pointers Made', 'Steals']
+ROSTER_SIZE = 15
+
+# betting lines per batch, from a quiet weeknight to a full nba + ncaam slate
+SLATE_SIZES = {'small': 1_000, 'medium': 10_000, 'large': 100_000}
+
+
+def generate_rosters(num_subjects: int, seed: int = 0) -> list[dict]:
+    """Deterministic CBSSports-shaped rosters holding 'Subject 0' ... 'Subject {num_subjects - 1}' in every league."""
+    rng = random.Random(seed)
+    rosters = []
+    for league in LEAGUES:
+        for team_num, first_subject_num in enumerate(range(0, num_subjects, ROSTER_SIZE)):
+            rosters.append({
+                'league': league,
+                'team': {'abbr_name': f'T{team_num}', 'full_name': f'Team {team_num}'},
+                'players': [
+                    {'name': f'Subject {subject_num}', 'position': rng.choice(['G', 'F', 'C']), 'jersey_number': str(i)}
+                    for i, subject_num in enumerate(range(first_subject_num, min(first_subject_num + ROSTER_SIZE, num_subjects)))
+                ],
+            })
+
+    return rosters
+
+
+def generate_oddsshopper_resp(num_betting_lines: int, seed: int = 0) -> tuple[list[dict], int]:
+    """Deterministic OddsShopper-shaped offer outcomes with about num_betting_lines outcomes, and the number of subjects
+    they use (see generate_rosters)."""
+    rng = random.Random(seed)
+    events = []
+    num_outcomes = subject_num = 0
+    while num_outcomes < num_betting_lines:
+        for offer_name in rng.sample(ODDSSHOPPER_OFFER_NAMES, k=rng.randint(1, len(ODDSSHOPPER_OFFER_NAMES))):
+            line = rng.randint(0, 30) + 0.5
+            over_prb = rng.uniform(0.3, 0.7)
+            bookmakers = rng.sample(BOOKMAKERS, k=rng.randint(2, len(BOOKMAKERS)))
+            events.append({
+                'offerName': offer_name,
+                'participants': [{'name': f'Subject {subject_num}'}],
+                'sides': [
+                    {'label': label, 'outcomes': [
+                        {'sportsbookCode': bookmaker, 'odds': round(1 / (prb * rng.uniform(1.02, 1.08)), 2), 'line': str(line)}
+                        for bookmaker in bookmakers
+                    ]}
+                    for label, prb in [('Over', over_prb), ('Under', 1 - over_prb)]
+                ],
+            })
+            num_outcomes += 2 * len(bookmakers)
+
+        subject_num += 1
+
+    return events, subject_num
@@ -0,0 +1,25 @@
+import asyncio
+
+import pytest
+
+from app.services.betting_lines.scheduling import CoalescingQueue, get_next_start
+
+
+@pytest.mark.asyncio
+async def test_coalescing_queue_replaces_the_waiting_item_of_a_key():
+    queue = CoalescingQueue()
+    assert queue.put('NBA', 'NBA batch 0') is None
+    assert queue.put('NCAAM', 'NCAAM batch 0') is None
+    assert queue.put('NBA', 'NBA batch 1') == 'NBA batch 0'
+    assert [await queue.get(), await queue.get()] == ['NBA batch 1', 'NCAAM batch 0']
+
+    waiting_get = asyncio.create_task(queue.get())
+    await asyncio.sleep(0)
+    queue.put('NBA', 'NBA batch 2')
+    assert await waiting_get == 'NBA batch 2'
+
+
+def test_next_start_stays_on_the_cadence_grid():
+    assert get_next_start(100, 60, 130) == (160, 0)  # finished early, waits for the next tick
+    assert get_next_start(100, 60, 170) == (220, 1)  # overran one tick, which is skipped
+    assert get_next_start(100, 60, 280) == (340, 3)
@@ -7,6 +7,66 @@ _CONFIGS = {
         'ncaa_conferences_to_collect_from': {
             'ACC', 'Big East', 'Big Ten', 'Big 12', 'Ivy', 'Mid American', 'Mountain West', 'SEC', 'West Coast'
         }
+    },
+    'betting_lines': {
+        'cadence': 60,  # seconds between the starts of consecutive batches
+        'queue_size': 1,  # processed batches waiting to be stored
+        'subjects_reload_interval': 60 * 15,  # seconds between checks for new roster diffs (trades, call ups)
+    },
+    'collecting': {
+        'default': {
+            'enabled': True,
+            'timeout': 45,  # seconds a collector gets per batch, below the cadence so a hanging source cannot stall it
+        },
+        'BoomFantasy': {
+            'token_refresh_margin': 120,  # seconds before the access token expires that it is already refreshed
+            'token_ttl': 900,  # seconds, assumed when the access token does not carry its expiry
+        },
+    },
+    'processing': {
+        'max_workers': None,  # defaults to the number of cores
+        'shards_per_worker': 4,  # more shards than workers, so one heavy slate does not leave the other workers idle
+        'min_parallel_size': 50_000,  # smaller batches are processed on a thread, the pool transfer is not worth it
+    },
+    'standardization': {
+        'max_subject_distance': 2,  # edits between a raw subject name and the roster name it is matched to
+        'min_chars_per_edit': 4,  # so a 7 character name is matched within 1 edit
+        'max_subject_candidates': 5,  # roster names sharing the most trigrams with the raw name that are compared
+    },
+    'caching': {
+        'enabled': True,
+        'url': 'redis://localhost:6379/0',
+        'ttl': 60 * 5,  # seconds a league's latest lines are served after its last batch, a few betting lines cadences
+    },
+    'instrumenting': {
+        'log_level': 'INFO',
+        'duration_buckets': [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60],  # seconds
+    },
+    'requesting': {
+        'default': {
+            'limit': 100,  # total connections kept open per source
+            'limit_per_host': 20,
+            'ttl_dns_cache': 300,  # seconds
+            'keepalive_timeout': 75,  # seconds, longer than the 60 second betting lines cadence
+            'timeout': 30,  # seconds per request
+            'max_concurrency': 20,  # requests in flight per source
+            'rate': 10,  # requests per second per source
+            'burst': 20,
+            'max_retries': 3,  # on 429 and 5xx responses
+            'backoff_base': 0.5,  # seconds
+            'backoff_max': 30,  # seconds
+            'response_cache_size': 10_000,  # requests whose last response is remembered for fetch(cache=True)
+        },
+        'OddsShopper': {
+            'limit_per_host': 30,
+            'max_concurrency': 30,
+            'rate': 25,
+            'burst': 50,
+        },
+        'CBSSports': {
+            'limit_per_host': 10,
+            'max_concurrency': 10,
+        }
     }
 }
 
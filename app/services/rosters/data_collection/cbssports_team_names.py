@@ -2,6 +2,11 @@ import asyncio
 
 from bs4 import BeautifulSoup
 
+try:
+    from lxml import html as lxml_html
+except ImportError:
+    lxml_html = None
+
 from app.services.configs import load_configs
 from app.services.utils import utilities as utils
 
@@ -9,35 +14,59 @@ from app.services.utils import utilities as utils
 CONFIGS = load_configs('general')
 PAYLOAD = utils.requester.get_payload('teams', 'CBSSports')
 
+_CONFERENCE_NAME_XPATH = "//span[contains(concat(' ', normalize-space(@class), ' '), ' TeamLogoNameLockup-name ')]"
+_TEAM_NAME_XPATH = ".//span[contains(concat(' ', normalize-space(@class), ' '), ' TeamName ')]//a[@href]"
+
 
-async def _request_teams(collected_teams: list, league: str) -> dict | None:
+async def _request_teams(collected_teams: list, league: str) -> None:
     url = PAYLOAD['urls'][league]['teams']
     headers = PAYLOAD['headers']
     cookies = PAYLOAD['cookies']
-    if resp_html := await utils.requester.fetch(url, to_html=True, headers=headers, cookies=cookies):
-        return _parse_teams(collected_teams, league, resp_html)
+    if resp_html := await utils.requester.fetch(url, to_html=True, source_name='CBSSports', headers=headers,
+                                                cookies=cookies):
+        parse_teams = _parse_teams_with_lxml if lxml_html else _parse_teams_with_bs4
+        collected_teams.extend(await asyncio.to_thread(parse_teams, league, resp_html))  # a page per league only
+
 
+def _get_team(league: str, conference_name: str, href: str, full_name: str) -> dict | None:
+    if (league != 'NCAA') or (conference_name.strip() in CONFIGS['ncaa_conferences_to_collect_from']):
+        if len(href_comps := href.split("/")) > 3:
+            return { 'league': league, 'abbr_name': href_comps[3], 'full_name': full_name }
+
+
+def _parse_teams_with_lxml(league: str, html: str) -> list[dict]:
+    collected_teams = []
+    doc = lxml_html.document_fromstring(html)
+    if (tables := doc.findall('.//table')) and (conference_names := doc.xpath(_CONFERENCE_NAME_XPATH)):
+        if len(tables) == len(conference_names):
+            for table, conference_name in zip(tables, conference_names):
+                for row in list(table.iter('tr'))[1:]:
+                    if 'TableBase-headTr' not in (row.get('class') or '').split():
+                        if a_elems := row.xpath(_TEAM_NAME_XPATH):
+                            if team := _get_team(league, conference_name.text_content(), a_elems[0].get('href'),
+                                                 a_elems[0].text_content()):
+                                collected_teams.append(team)
 
-def _parse_teams(collected_teams: list, league: str, html: str) -> None:
+    return collected_teams
+
+
+def _parse_teams_with_bs4(league: str, html: str) -> list[dict]:
+    collected_teams = []
     soup = BeautifulSoup(html, 'html.parser')
     if tables := soup.find_all('table'):
         if conference_names := soup.find_all('span', {'class': 'TeamLogoNameLockup-name'}):
             if len(tables) == len(conference_names):
                 for table, conference_name in zip(tables, conference_names):
-                    if (league != 'NCAA') or (conference_name.text.strip() in CONFIGS['ncaa_conferences_to_collect_from']):
-                        if (rows := table.find_all('tr')) and (len(rows) > 1):
-                            for row in rows[1:]:
-                                if row.get('class') != 'TableBase-headTr':
-                                    if team_name_span := row.find('span', {'class': 'TeamName'}):
-                                        if (a_elem := team_name_span.find('a')) and (href := a_elem.get('href')):
-                                            href_comps = href.split("/")
-                                            if len(href_comps) > 3:
-                                                abbr_name, full_name = href_comps[3], a_elem.text
-                                                collected_teams.append({
-                                                    'league': league,
-                                                    'abbr_name': abbr_name,
-                                                    'full_name': full_name,
-                                                })
+                    if (rows := table.find_all('tr')) and (len(rows) > 1):
+                        for row in rows[1:]:
+                            if 'TableBase-headTr' not in (row.get('class') or []):
+                                if team_name_span := row.find('span', {'class': 'TeamName'}):
+                                    if (a_elem := team_name_span.find('a')) and (href := a_elem.get('href')):
+                                        if team := _get_team(league, conference_name.text, href, a_elem.text):
+                                            collected_teams.append(team)
+
+    return collected_teams
+
 
 async def run_cbssports_team_names_collector() -> None:
     from app.db import db
@@ -48,6 +77,7 @@ async def run_cbssports_team_names_collector() -> None:
 
     await asyncio.gather(*tasks)
     print(collected_teams)
+    await db.teams.create_indexes()
     await db.teams.store_teams(collected_teams)
 
 
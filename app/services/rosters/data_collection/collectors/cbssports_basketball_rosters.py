@@ -2,6 +2,11 @@ import asyncio
 
 from bs4 import BeautifulSoup
 
+try:
+    from lxml import html as lxml_html
+except ImportError:
+    lxml_html = None
+
 from app.db import db
 from app.services.configs import load_configs
 from app.services.utils import utilities as utils
@@ -10,6 +15,56 @@ from app.services.utils import utilities as utils
 CONFIGS = load_configs('general')
 PAYLOAD = utils.requester.get_payload('teams', 'CBSSports')
 
+_PLAYER_NAME_XPATH = ".//span[contains(concat(' ', normalize-space(@class), ' '), ' CellPlayerName--long ')]//a"
+
+
+def _get_roster_table_html(html: str) -> str | None:
+    # the roster is the page's first table, only that slice is parsed instead of the whole page
+    if (start := html.find('<table')) == -1:
+        return None
+
+    end = html.find('</table>', start)
+    return html[start:end + len('</table>')] if end != -1 else html[start:]
+
+
+def _parse_players_with_lxml(table_html: str) -> list[dict]:
+    players = []
+    table = lxml_html.fragment_fromstring(table_html)
+    for row in list(table.iter('tr'))[1:]:
+        if (cells := row.findall('td')) and (len(cells) > 2):
+            if a_elems := cells[1].xpath(_PLAYER_NAME_XPATH):
+                players.append({
+                    'position': cells[2].text_content().strip(),
+                    'name': a_elems[0].text_content().strip(),
+                    'jersey_number': cells[0].text_content().strip(),
+                })
+
+    return players
+
+
+def _parse_players_with_bs4(table_html: str) -> list[dict]:
+    players = []
+    rows = BeautifulSoup(table_html, 'html.parser').find_all('tr')
+    for row in rows[1:]:
+        if (cells := row.find_all('td')) and (len(cells) > 2):
+            if span_elem := cells[1].find('span', {'class': 'CellPlayerName--long'}):
+                if a_elem := span_elem.find('a'):
+                    players.append({
+                        'position': cells[2].text.strip(),
+                        'name': a_elem.text.strip(),
+                        'jersey_number': cells[0].text.strip(),
+                    })
+
+    return players
+
+
+def _parse_rosters(league: str, team: dict, html: str) -> dict | None:
+    # runs on a worker thread, lxml parses without holding the gil
+    if table_html := _get_roster_table_html(html):
+        parse_players = _parse_players_with_lxml if lxml_html else _parse_players_with_bs4
+        if players := parse_players(table_html):  # a page without players would wipe the stored roster
+            return { 'league': league, 'team': team, 'players': players }
+
 
 async def _request_rosters(collected_rosters: list, league: str, team: dict) -> None:
     base_url = PAYLOAD['urls'][league]['rosters']
@@ -26,32 +81,18 @@ async def _request_rosters(collected_rosters: list, league: str, team: dict) ->
         full_team_name = PAYLOAD['ncaa_team_name_url_map'][league]['full_name'].get(full_team_name, full_team_name)
 
     url = base_url.format(abbr_team_name, full_team_name)
-    if resp_html := await utils.requester.fetch(url, to_html=True, headers=headers, cookies=cookies):
-        _parse_rosters(collected_rosters, league, team, resp_html)
-
-
-def _parse_rosters(collected_rosters: list, league: str, team: dict, html: str) -> None:
-    roster = { 'league': league, 'team': team, 'players': [] }
-    soup = BeautifulSoup(html, 'html.parser')
-    if table := soup.find('table'):
-        if (rows := table.find_all('tr')) and (len(rows) > 1):
-            for row in rows[1:]:
-                if (cells := row.find_all('td')) and (len(cells) > 2):
-                    if span_elem := cells[1].find('span', {'class': 'CellPlayerName--long'}):
-                        if a_elem := span_elem.find('a'):
-                            roster['players'].append({
-                                'position': cells[2].text.strip(),
-                                'name': a_elem.text.strip(),
-                                'jersey_number': cells[0].text.strip(),
-                            })
-
+    # the requester keeps at most CBSSports' max_concurrency requests in flight, the pages are parsed off the loop as
+    # they come in
+    if resp_html := await utils.requester.fetch(url, to_html=True, source_name='CBSSports', headers=headers,
+                                                cookies=cookies):
+        if roster := await asyncio.to_thread(_parse_rosters, league, team, resp_html):
             collected_rosters.append(roster)
 
 
 async def run_cbssports_basketball_rosters_collector(collected_rosters: list):
     tasks = []
     for league in CONFIGS['leagues_to_collect_from']:
-        if utils.standardizer.get_sport(league) == 'Basketball':
+        if utils.get_sport(league) == 'Basketball':
             teams = await db.teams.get_teams({ 'league': league if 'NCAA' not in league else 'NCAA' })  # Todo: fine for now...optimize in the future
             for team in teams:
                 tasks.append(_request_rosters(collected_rosters, league, team))
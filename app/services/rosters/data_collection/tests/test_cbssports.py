@@ -0,0 +1,61 @@
+from app.services.rosters.data_collection import cbssports_team_names
+from app.services.rosters.data_collection.collectors import cbssports_basketball_rosters
+
+
+ROSTER_HTML = '''
+<html><body><nav><ul><li>Scores</li></ul></nav>
+<table class="TableBase-table">
+  <thead><tr class="TableBase-headTr"><th>NO</th><th>PLAYER</th><th>POS</th></tr></thead>
+  <tbody>
+    <tr class="TableBase-bodyTr">
+      <td> 20 </td>
+      <td><span class="CellPlayerName--short"><a href="/p/1">A. Sarr</a></span>
+          <span class="CellPlayerName--long"><a href="/p/1">Alex Sarr</a></span></td>
+      <td> C </td>
+    </tr>
+    <tr class="TableBase-bodyTr">
+      <td>13</td>
+      <td><span class="CellPlayerName--long"><a href="/p/2">Jordan Poole</a></span></td>
+      <td>G</td>
+    </tr>
+  </tbody>
+</table>
+<table><tr><td>Not the roster</td></tr></table>
+</body></html>
+'''
+TEAMS_HTML = '''
+<html><body>
+<span class="TeamLogoNameLockup-name">Atlantic</span>
+<table><tr class="TableBase-headTr"><th>Team</th></tr>
+  <tr><td><span class="TeamName"><a href="/nba/teams/BOS/boston-celtics/">Boston Celtics</a></span></td></tr>
+</table>
+<span class="TeamLogoNameLockup-name">Southeast</span>
+<table><tr class="TableBase-headTr"><th>Team</th></tr>
+  <tr><td><span class="TeamName"><a href="/nba/teams/WAS/washington-wizards/">Washington Wizards</a></span></td></tr>
+</table>
+</body></html>
+'''
+
+
+def test_parse_rosters():
+    table_html = cbssports_basketball_rosters._get_roster_table_html(ROSTER_HTML)
+    assert 'Not the roster' not in table_html
+    players = cbssports_basketball_rosters._parse_players_with_lxml(table_html)
+    assert players == [
+        {'position': 'C', 'name': 'Alex Sarr', 'jersey_number': '20'},
+        {'position': 'G', 'name': 'Jordan Poole', 'jersey_number': '13'},
+    ]
+    assert cbssports_basketball_rosters._parse_players_with_bs4(table_html) == players
+
+    team = {'abbr_name': 'WAS', 'full_name': 'Washington Wizards'}
+    assert cbssports_basketball_rosters._parse_rosters('NBA', team, ROSTER_HTML)['players'] == players
+    assert cbssports_basketball_rosters._parse_rosters('NBA', team, '<html></html>') is None
+
+
+def test_parse_teams():
+    teams = cbssports_team_names._parse_teams_with_lxml('NBA', TEAMS_HTML)
+    assert teams == [
+        {'league': 'NBA', 'abbr_name': 'BOS', 'full_name': 'Boston Celtics'},
+        {'league': 'NBA', 'abbr_name': 'WAS', 'full_name': 'Washington Wizards'},
+    ]
+    assert cbssports_team_names._parse_teams_with_bs4('NBA', TEAMS_HTML) == teams
@@ -0,0 +1,67 @@
+import hashlib
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+
+from app.services.utils import utilities as utils
+
+
+def get_roster_content_hash(roster: dict) -> str:
+    # players sorted, so the same roster listed in another order is not a change
+    content = [roster['league'], roster['team'], sorted(roster['players'], key=lambda player: player['name'])]
+    return hashlib.blake2b(utils.serializer.dumps(content), digest_size=16).hexdigest()
+
+
+@dataclass
+class RosterDiff:
+    # what one rosters run changed, players are the stored player dicts plus their league and team ('from_team' too
+    # for moved players, the team they were stored on)
+    timestamp: datetime
+    teams: list[str] = field(default_factory=list)  # full names of the teams whose rosters were written
+    leagues: list[str] = field(default_factory=list)
+    added: list[dict] = field(default_factory=list)
+    removed: list[dict] = field(default_factory=list)
+    moved: list[dict] = field(default_factory=list)
+    updated: list[dict] = field(default_factory=list)  # same team, new position or jersey number
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def get_changed_rosters(rosters: list[dict], stored_hashes: dict[str, str]) -> list[dict]:
+    # the collected rosters whose content differs from the stored one, each with its new hash under 'hash'
+    changed_rosters = []
+    for roster in rosters:
+        roster_hash = get_roster_content_hash(roster)
+        if stored_hashes.get(roster['team']['full_name']) != roster_hash:
+            changed_rosters.append({**roster, 'hash': roster_hash})
+
+    return changed_rosters
+
+
+def get_roster_diff(changed_rosters: list[dict], stored_rosters: list[dict], timestamp: datetime) -> RosterDiff:
+    # players are told apart by (league, name). a player dropped by one changed team and picked up by another is moved,
+    # all the teams involved in a trade changed, so the stored rosters of the changed teams are enough. unless the old
+    # team's page failed or came back without players: that team is then not collected (so not changed), its stored
+    # roster is not looked at and the traded player shows up as added, while still stored on the old team as well
+    def get_players(rosters: list[dict]) -> dict[tuple[str, str], dict]:
+        return {
+            (roster['league'], player['name']): {**player, 'league': roster['league'], 'team': roster['team']['full_name']}
+            for roster in rosters for player in roster['players']
+        }
+
+    players, stored_players = get_players(changed_rosters), get_players(stored_rosters)
+    roster_diff = RosterDiff(
+        timestamp,
+        teams=[roster['team']['full_name'] for roster in changed_rosters],
+        leagues=sorted({roster['league'] for roster in changed_rosters}),
+    )
+    for player_key, player in players.items():
+        if (stored_player := stored_players.get(player_key)) is None:
+            roster_diff.added.append(player)
+        elif stored_player['team'] != player['team']:
+            roster_diff.moved.append({**player, 'from_team': stored_player['team']})
+        elif stored_player != player:
+            roster_diff.updated.append(player)
+
+    roster_diff.removed = [player for player_key, player in stored_players.items() if player_key not in players]
+    return roster_diff
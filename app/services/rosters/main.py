@@ -1,25 +1,57 @@
 import asyncio
-import time
+import logging
+from datetime import datetime
 
 from app.db import db
+from app.services.utils import utilities as utils
 from app.services.rosters.data_collection import run_collectors
+from app.services.rosters.diffing import get_changed_rosters, get_roster_diff
+
+
+logger = logging.getLogger(__name__)
 
 
-# Todo: if you are sleeping for an entire day make sure to release resources
 async def run_pipeline():
+    utils.instrumenter.start_logging()
+    loop = asyncio.get_running_loop()
+    await db.rosters.create_indexes()
     while True:
-        start_time = time.time()
-        print('[Rosters]: Running teams pipeline...')
-        print('[Rosters]: Starting data collectors...')
-        collected_rosters = await run_collectors()
-        print('[Rosters]: Finished data collection...')
-        print('[Rosters]: Storing collected rosters...')
-        await db.rosters.store_rosters(collected_rosters)
-        print(f'[Rosters]: Stored {len(collected_rosters)} collected rosters...')
-        end_time = time.time()
-        print(f'[Rosters]: Pipeline completed in {round(end_time - start_time, 2)} seconds. See you tomorrow...')
+        start_time = loop.time()
+        logger.info('Running rosters pipeline')
+        with utils.instrumenter.span('collect_rosters', source='CBSSports'):
+            collected_rosters = await run_collectors()
+
+        logger.info('Finished data collection', extra={'num_rosters': len(collected_rosters)})
+        # only the teams whose rosters changed are written, and what changed is stored as a diff event, so consumers
+        # only rebuild on real changes
+        with utils.instrumenter.span('diff_rosters'):
+            changed_rosters = get_changed_rosters(collected_rosters, await db.rosters.get_roster_hashes())
+            stored_rosters = await db.rosters.get_rosters({
+                'team.full_name': { '$in': [roster['team']['full_name'] for roster in changed_rosters] }
+            }) if changed_rosters else []
+            roster_diff = get_roster_diff(changed_rosters, stored_rosters, datetime.now())
+
+        if changed_rosters:
+            # the diff goes first: once the new hashes are stored the next run sees no change, so a diff that failed to
+            # store after them would never be emitted. a failure in between only emits the diff again next run
+            with utils.instrumenter.span('store_rosters'):
+                await db.rosters.store_roster_diff(roster_diff.to_dict())
+                await db.rosters.store_rosters(changed_rosters)
+
+            logger.info('Rosters changed', extra={
+                'leagues': roster_diff.leagues, 'num_teams': len(roster_diff.teams),
+                'num_added': len(roster_diff.added), 'num_removed': len(roster_diff.removed),
+                'num_moved': len(roster_diff.moved), 'num_updated': len(roster_diff.updated),
+                'moved': [f"{player['name']}: {player['from_team']} -> {player['team']}" for player in roster_diff.moved]
+            })
+
+        logger.info('Rosters pipeline completed, see you tomorrow', extra={
+            'num_rosters': len(collected_rosters), 'num_changed_rosters': len(changed_rosters),
+            'duration': round(loop.time() - start_time, 2)
+        })
+        await utils.requester.close('CBSSports')  # no reason to keep connections alive while sleeping for a day
         await asyncio.sleep(60 * 60 * 24)
 
 
 if __name__ == '__main__':
-    asyncio.run(run_pipeline())
\ No newline at end of file
+    asyncio.run(run_pipeline())
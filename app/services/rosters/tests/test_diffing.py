@@ -0,0 +1,44 @@
+from datetime import datetime
+
+from app.services.rosters.diffing import get_changed_rosters, get_roster_content_hash, get_roster_diff
+
+
+WIZARDS = {'abbr_name': 'WAS', 'full_name': 'Washington Wizards'}
+CELTICS = {'abbr_name': 'BOS', 'full_name': 'Boston Celtics'}
+SARR = {'name': 'Alex Sarr', 'position': 'C', 'jersey_number': '20'}
+POOLE = {'name': 'Jordan Poole', 'position': 'G', 'jersey_number': '13'}
+BROWN = {'name': 'Jaylen Brown', 'position': 'G', 'jersey_number': '7'}
+
+
+def _roster(team: dict, *players: dict) -> dict:
+    return {'league': 'NBA', 'team': team, 'players': list(players)}
+
+
+def test_get_changed_rosters():
+    stored_rosters = [_roster(WIZARDS, SARR, POOLE), _roster(CELTICS, BROWN)]
+    stored_hashes = {roster['team']['full_name']: get_roster_content_hash(roster) for roster in stored_rosters}
+    assert get_changed_rosters([_roster(WIZARDS, POOLE, SARR), _roster(CELTICS, BROWN)], stored_hashes) == []
+
+    (changed_roster,) = get_changed_rosters([_roster(WIZARDS, SARR), _roster(CELTICS, BROWN)], stored_hashes)
+    assert changed_roster == {**_roster(WIZARDS, SARR), 'hash': get_roster_content_hash(_roster(WIZARDS, SARR))}
+    assert len(get_changed_rosters([_roster(CELTICS, {**BROWN, 'jersey_number': '0'})], stored_hashes)) == 1
+
+
+def test_get_roster_diff():
+    timestamp = datetime(2025, 1, 1)
+    stored_rosters = [_roster(WIZARDS, SARR, POOLE), _roster(CELTICS, BROWN)]
+    rookie = {'name': 'Bub Carrington', 'position': 'G', 'jersey_number': '8'}
+    # poole is traded to boston, brown waived, sarr changes his number and washington signs a rookie
+    changed_rosters = [
+        _roster(WIZARDS, {**SARR, 'jersey_number': '1'}, rookie),
+        _roster(CELTICS, POOLE),
+    ]
+    roster_diff = get_roster_diff(changed_rosters, stored_rosters, timestamp)
+    assert (roster_diff.timestamp, roster_diff.teams, roster_diff.leagues) == (
+        timestamp, ['Washington Wizards', 'Boston Celtics'], ['NBA']
+    )
+    assert roster_diff.added == [{**rookie, 'league': 'NBA', 'team': 'Washington Wizards'}]
+    assert roster_diff.removed == [{**BROWN, 'league': 'NBA', 'team': 'Boston Celtics'}]
+    assert roster_diff.moved == [{**POOLE, 'league': 'NBA', 'team': 'Boston Celtics', 'from_team': 'Washington Wizards'}]
+    assert roster_diff.updated == [{**SARR, 'jersey_number': '1', 'league': 'NBA', 'team': 'Washington Wizards'}]
+    assert roster_diff.to_dict()['moved'] == roster_diff.moved
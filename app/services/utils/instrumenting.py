@@ -0,0 +1,162 @@
+import bisect
+import logging
+import queue
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener
+from typing import Iterator
+
+from app.services.configs import load_configs
+from app.services.utils.serializing import Serializing
+
+
+# attributes every LogRecord has, anything else on a record came in through extra= and is logged as a field
+_RECORD_ATTRIBUTES = set(logging.makeLogRecord({}).__dict__) | {'message', 'asctime', 'taskName'}
+
+_METRIC_TYPES = {
+    'pipeline_stage_duration_seconds': ('histogram', 'Time spent per pipeline stage.'),
+    'pipeline_stage_errors_total': ('counter', 'Pipeline stages that raised, by exception type.'),
+    'collector_betting_lines_total': ('counter', 'Betting lines collected per source.'),
+    'source_response_bytes_total': ('counter', 'Response body bytes received per source.'),
+    'collector_request_failures_total': ('counter', 'Requests a collector gave up on, without failing the collector.'),
+    'source_responses_total': ('counter', 'Responses received per source, by status code.'),
+    'betting_lines_stored_total': ('counter', 'Processed betting lines stored, per league.'),
+    'standardization_misses_total': ('counter', 'Lines dropped because a name could not be standardized.'),
+    'cache_requests_total': ('counter', 'Reads answered from the cache (hit) or left to mongo (miss).'),
+    'standardization_fuzzy_matches_total': ('counter', 'Names missing the exact map that were approximately matched, or not.'),
+}
+
+
+class StructuredFormatter(logging.Formatter):
+    # one json object per line: time, level, logger, message and every extra= field
+
+    def __init__(self, serializer: Serializing):
+        super().__init__()
+        self.serializer = serializer
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': record.created,
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            **{key: value for key, value in record.__dict__.items() if key not in _RECORD_ATTRIBUTES},
+        }
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+
+        return self.serializer.dumps(entry).decode('utf-8')
+
+
+class Instrumenting:
+    # structured logging and prometheus style metrics. records are handed to a queue and written by a listener thread,
+    # so logging never blocks the event loop on i/o. metrics are kept in this process, under a lock since the
+    # processors run on threads too (the process pool shards are only timed as a whole, from this process)
+
+    def __init__(self, serializer: Serializing = None):
+        self.serializer = serializer or Serializing()
+        self.configs = load_configs('instrumenting')
+        self._lock = threading.Lock()
+        self._counters: dict[tuple[str, tuple], float] = defaultdict(float)
+        # (non-cumulative bucket counts, sum, count) per histogram and label set
+        self._histograms: dict[tuple[str, tuple], list] = {}
+        self._listener: QueueListener | None = None
+
+    def start_logging(self) -> None:
+        if self._listener is not None:
+            return
+
+        stream_handler = logging.StreamHandler()
+        stream_handler.setFormatter(StructuredFormatter(self.serializer))
+        log_queue = queue.SimpleQueue()
+        self._listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+        self._listener.start()
+
+        root_logger = logging.getLogger()
+        root_logger.handlers = [QueueHandler(log_queue)]
+        root_logger.setLevel(self.configs['log_level'])
+
+    def stop_logging(self) -> None:
+        if self._listener is not None:
+            self._listener.stop()  # flushes whatever is still queued
+            self._listener = None
+
+    @staticmethod
+    def _get_key(name: str, labels: dict) -> tuple[str, tuple]:
+        return name, tuple(sorted((key, str(value)) for key, value in labels.items() if value is not None))
+
+    def inc(self, name: str, amount: float = 1, **labels) -> None:
+        key = self._get_key(name, labels)
+        with self._lock:
+            self._counters[key] += amount
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = self._get_key(name, labels)
+        buckets = self.configs['duration_buckets']
+        with self._lock:
+            if (histogram := self._histograms.get(key)) is None:
+                histogram = self._histograms[key] = [[0] * len(buckets), 0.0, 0]
+
+            if (i := bisect.bisect_left(buckets, value)) < len(buckets):
+                histogram[0][i] += 1
+
+            histogram[1] += value
+            histogram[2] += 1
+
+    @contextmanager
+    def span(self, stage: str, source: str = None, league: str = None) -> Iterator[None]:
+        # times a pipeline stage, spans nest (e.g. parse includes standardize), so stage totals overlap
+        start_time = time.perf_counter()
+        try:
+            yield
+
+        except Exception as e:  # a cancelled stage was not at fault, it is only timed
+            self.inc('pipeline_stage_errors_total', stage=stage, source=source, league=league, error=type(e).__name__)
+            raise
+
+        finally:
+            self.observe('pipeline_stage_duration_seconds', time.perf_counter() - start_time, stage=stage,
+                         source=source, league=league)
+
+    @staticmethod
+    def _format_labels(labels: tuple, extra_label: tuple[str, str] = None) -> str:
+        labels = [*labels, extra_label] if extra_label else labels
+        if not labels:
+            return ''
+
+        escaped_labels = [
+            (key, value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')) for key, value in labels
+        ]
+        return '{' + ','.join(f'{key}="{value}"' for key, value in escaped_labels) + '}'
+
+    def render(self) -> str:
+        # prometheus text exposition format (version 0.0.4)
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {
+                key: (list(bucket_counts), total, count) for key, (bucket_counts, total, count) in self._histograms.items()
+            }
+
+        samples = defaultdict(list)
+        for (name, labels), value in sorted(counters.items()):
+            samples[name].append(f'{name}{self._format_labels(labels)} {value:.17g}')
+
+        buckets = self.configs['duration_buckets']
+        for (name, labels), (bucket_counts, total, count) in sorted(histograms.items()):
+            cumulative_count = 0
+            for upper_bound, bucket_count in zip(buckets, bucket_counts):
+                cumulative_count += bucket_count
+                samples[name].append(f'{name}_bucket{self._format_labels(labels, ("le", f"{upper_bound:g}"))} {cumulative_count}')
+
+            samples[name].append(f'{name}_bucket{self._format_labels(labels, ("le", "+Inf"))} {count}')
+            samples[name].append(f'{name}_sum{self._format_labels(labels)} {total:.17g}')
+            samples[name].append(f'{name}_count{self._format_labels(labels)} {count}')
+
+        lines = []
+        for name in sorted(samples):
+            metric_type, description = _METRIC_TYPES.get(name, ('untyped', name))
+            lines.extend([f'# HELP {name} {description}', f'# TYPE {name} {metric_type}', *samples[name]])
+
+        return '\n'.join(lines) + '\n'
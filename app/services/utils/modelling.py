@@ -0,0 +1,44 @@
+from dataclasses import dataclass, fields
+from datetime import datetime
+from typing import Iterable
+
+
+@dataclass(slots=True)
+class BettingLine:
+    batch_num: int
+    batch_timestamp: datetime
+    collection_timestamp: datetime
+    bookmaker: str
+    league: str
+    market: str
+    subject: str
+    label: str
+    line: float
+    odds: float
+    impl_prb: float | None = None
+    tw_prb: float | None = None
+    ev: float | None = None
+    id: str | None = None  # stored as the document '_id', same format as Storing.get_betting_line_key
+
+    def __post_init__(self):
+        if self.id is None:
+            self.id = f'{self.bookmaker}:{self.league}:{self.market}:{self.subject}:{self.label}'
+
+    def to_dict(self) -> dict:
+        return {('_id' if name == 'id' else name): getattr(self, name) for name in BETTING_LINE_FIELDS}
+
+    @classmethod
+    def from_dict(cls, betting_line_dict: dict) -> 'BettingLine':
+        return cls(**{('id' if k == '_id' else k): v for k, v in betting_line_dict.items()})
+
+
+BETTING_LINE_FIELDS = [f.name for f in fields(BettingLine)]
+
+
+def to_columns(betting_lines: list[BettingLine], field_names: Iterable[str] = None) -> dict[str, list]:
+    return {name: [getattr(line, name) for line in betting_lines] for name in (field_names or BETTING_LINE_FIELDS)}
+
+
+def from_columns(columns: dict[str, list]) -> list[BettingLine]:
+    field_names = list(columns)
+    return [BettingLine(**dict(zip(field_names, values))) for values in zip(*columns.values())]
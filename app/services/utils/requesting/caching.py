@@ -0,0 +1,48 @@
+import hashlib
+from collections import OrderedDict
+from typing import Mapping
+
+
+class ResponseCache:
+    # remembers the validators and a content hash of the last response per request so unchanged payloads can be skipped
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: OrderedDict[str, dict] = OrderedDict()
+
+    @staticmethod
+    def get_key(method: str, url: str, params: Mapping | None, uncached_params: tuple[str, ...] = ()) -> str:
+        # uncached_params change every request (e.g. a moving time window) without making it another request
+        return f"{method} {url}?{sorted(item for item in (params or {}).items() if item[0] not in uncached_params)}"
+
+    def get_conditional_headers(self, key: str) -> dict:
+        conditional_headers = {}
+        if entry := self._entries.get(key):
+            if etag := entry.get('etag'):
+                conditional_headers['If-None-Match'] = etag
+
+            if last_modified := entry.get('last_modified'):
+                conditional_headers['If-Modified-Since'] = last_modified
+
+        return conditional_headers
+
+    def is_not_modified(self, key: str) -> bool:
+        # a 304 only means something when we sent validators from a cached response
+        if key in self._entries:
+            self._entries.move_to_end(key)
+            return True
+
+        return False
+
+    def is_unchanged(self, key: str, headers: Mapping, body: bytes) -> bool:
+        content_hash = hashlib.blake2b(body, digest_size=16).digest()
+        previous_entry = self._entries.pop(key, None)
+        self._entries[key] = {
+            'etag': headers.get('ETag'),
+            'last_modified': headers.get('Last-Modified'),
+            'content_hash': content_hash
+        }
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+        return (previous_entry is not None) and (previous_entry['content_hash'] == content_hash)
@@ -1,12 +1,38 @@
+import asyncio
 from typing import Optional
 
 import aiohttp
 
+from app.services.configs import load_configs
+from app.services.utils.instrumenting import Instrumenting
+from app.services.utils.requesting.caching import ResponseCache
 from app.services.utils.requesting.maps import PAYLOAD_MAP
+from app.services.utils.requesting.scheduling import TokenBucket, get_backoff_delay, parse_retry_after
+from app.services.utils.serializing import Serializing
+
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class _NotModified:
+    def __repr__(self):
+        return 'NOT_MODIFIED'
+
+
+NOT_MODIFIED = _NotModified()  # returned instead of a payload when a cached request's response has not changed
 
 
 class Requesting:
 
+    def __init__(self, serializer: Serializing = None, instrumenter: Instrumenting = None):
+        self.serializer = serializer or Serializing()
+        self.instrumenter = instrumenter or Instrumenting(self.serializer)
+        self.configs = load_configs('requesting')
+        self._sessions: dict[str, aiohttp.ClientSession] = {}
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+        self._token_buckets: dict[str, TokenBucket] = {}
+        self.response_cache = ResponseCache(self.configs['default']['response_cache_size'])
+
     @staticmethod
     def get_payload(domain: str, source_name: str):
         if payload_domain := PAYLOAD_MAP.get(domain):
@@ -16,20 +42,86 @@ class Requesting:
             raise ValueError(f"Payload for {source_name} not found")
         raise ValueError(f"Payload domain {domain} not found")
 
-    @staticmethod
-    async def post(url: str, to_html: bool = False, **kwargs) -> dict:
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, **kwargs) as resp:
-                if resp.status == 200:
-                    return await resp.json() if not to_html else await resp.text()
+    def _get_source_configs(self, source_name: str) -> dict:
+        return {**self.configs['default'], **self.configs.get(source_name, {})}
 
-                raise Exception(f"Failed to post to {url} with status code {resp.status}")
+    def _create_session(self, source_name: str) -> aiohttp.ClientSession:
+        configs = self._get_source_configs(source_name)
+        connector = aiohttp.TCPConnector(
+            limit=configs['limit'],
+            limit_per_host=configs['limit_per_host'],
+            ttl_dns_cache=configs['ttl_dns_cache'],
+            keepalive_timeout=configs['keepalive_timeout'],
+        )
+        return aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=configs['timeout']))
 
-    @staticmethod
-    async def fetch(url: str, to_html: bool = False, **kwargs) -> Optional[dict]:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, **kwargs) as resp:
-                if resp.status == 200:
-                    return await resp.json() if not to_html else await resp.text()
+    def get_session(self, source_name: str = 'default') -> aiohttp.ClientSession:
+        # one long-lived session (and connection pool) per source, created lazily inside the running event loop
+        session = self._sessions.get(source_name)
+        if (session is None) or session.closed:
+            session = self._sessions[source_name] = self._create_session(source_name)
+
+        return session
+
+    def _get_semaphore(self, source_name: str) -> asyncio.Semaphore:
+        if not (semaphore := self._semaphores.get(source_name)):
+            configs = self._get_source_configs(source_name)
+            semaphore = self._semaphores[source_name] = asyncio.Semaphore(configs['max_concurrency'])
+
+        return semaphore
+
+    def _get_token_bucket(self, source_name: str) -> TokenBucket:
+        if not (token_bucket := self._token_buckets.get(source_name)):
+            configs = self._get_source_configs(source_name)
+            token_bucket = self._token_buckets[source_name] = TokenBucket(configs['rate'], configs['burst'])
+
+        return token_bucket
+
+    async def close(self, source_name: str = None) -> None:
+        source_names = [source_name] if source_name else list(self._sessions)
+        for name in source_names:
+            if session := self._sessions.pop(name, None):
+                await session.close()
+
+    async def _request(self, method: str, url: str, to_html: bool, source_name: str, cache: bool,
+                       uncached_params: tuple[str, ...] = (), **kwargs):
+        configs = self._get_source_configs(source_name)
+        token_bucket = self._get_token_bucket(source_name)
+        if cache:
+            cache_key = self.response_cache.get_key(method, url, kwargs.get('params'), uncached_params)
+            kwargs['headers'] = {**(kwargs.get('headers') or {}), **self.response_cache.get_conditional_headers(cache_key)}
+
+        for attempt in range(configs['max_retries'] + 1):
+            async with self._get_semaphore(source_name):
+                await token_bucket.acquire()
+                async with self.get_session(source_name).request(method, url, **kwargs) as resp:
+                    self.instrumenter.inc('source_responses_total', source=source_name, status=resp.status)
+                    if resp.status == 200:
+                        body = await resp.read()
+                        self.instrumenter.inc('source_response_bytes_total', len(body), source=source_name)
+                        if cache and self.response_cache.is_unchanged(cache_key, resp.headers, body):
+                            return NOT_MODIFIED
+
+                        return self.serializer.loads(body) if not to_html else await resp.text()
+
+                    if (resp.status == 304) and cache and self.response_cache.is_not_modified(cache_key):
+                        return NOT_MODIFIED
+
+                    if (resp.status not in RETRY_STATUSES) or (attempt == configs['max_retries']):
+                        raise Exception(f"Failed to {method.lower()} {url} with status code {resp.status}")
+
+                    backoff_delay = get_backoff_delay(attempt, configs['backoff_base'], configs['backoff_max'])
+                    if (retry_after := parse_retry_after(resp.headers.get('Retry-After'))) is not None:
+                        token_bucket.pause(retry_after)  # holds back every request to this source, not just this one
+                        backoff_delay = max(backoff_delay, retry_after)
+
+            await asyncio.sleep(backoff_delay)
+
+    async def post(self, url: str, to_html: bool = False, source_name: str = 'default', **kwargs) -> dict:
+        return await self._request('POST', url, to_html, source_name, False, **kwargs)
 
-                raise Exception(f"Failed to fetch from {url} with status code {resp.status}")
+    async def fetch(self, url: str, to_html: bool = False, source_name: str = 'default', cache: bool = False,
+                    uncached_params: tuple[str, ...] = (), **kwargs) -> Optional[dict]:
+        # with cache=True, NOT_MODIFIED is returned when the payload is the same as the last time it was fetched, with
+        # the same params apart from uncached_params
+        return await self._request('GET', url, to_html, source_name, cache, uncached_params, **kwargs)
@@ -0,0 +1,62 @@
+import asyncio
+import random
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+
+class TokenBucket:
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate  # tokens per second
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    async def acquire(self) -> None:
+        async with self._lock:  # waiters are served in order
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        # the source asked us to back off, so nobody gets a token until then and the bucket starts empty after
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0.0
+        self._updated_at = self._paused_until
+
+
+def parse_retry_after(retry_after: str | None) -> float | None:
+    if not retry_after:
+        return None
+
+    try:
+        return max(0.0, float(retry_after))
+
+    except ValueError:
+        try:
+            retry_at = parsedate_to_datetime(retry_after)
+            return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+        except (TypeError, ValueError):
+            return None
+
+
+def get_backoff_delay(attempt: int, base: float, cap: float) -> float:
+    # exponential backoff with full jitter
+    return random.uniform(0, min(cap, base * 2 ** attempt))
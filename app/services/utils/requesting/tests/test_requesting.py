@@ -0,0 +1,122 @@
+import time
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from app.services.utils.requesting import Requesting, NOT_MODIFIED
+from app.services.utils.requesting.scheduling import TokenBucket, parse_retry_after
+
+
+async def _start_server(statuses: list[int], retry_after: str = None) -> tuple[TestServer, list[float]]:
+    request_times = []
+
+    async def handler(_):
+        request_times.append(time.monotonic())
+        status = statuses.pop(0) if statuses else 200
+        headers = {'Retry-After': retry_after} if retry_after and status == 429 else None
+        return web.json_response({'status': status}, status=status, headers=headers)
+
+    server_app = web.Application()
+    server_app.router.add_get('/', handler)
+    server = TestServer(server_app)
+    await server.start_server()
+    return server, request_times
+
+
+def _create_requester(**configs) -> Requesting:
+    requester = Requesting()
+    requester.configs = {**requester.configs, 'test': {'backoff_base': 0.01, 'backoff_max': 0.05, **configs}}
+    return requester
+
+
+@pytest.mark.asyncio
+async def test_retries_throttled_and_failed_responses():
+    server, request_times = await _start_server([429, 503])
+    requester = _create_requester()
+    try:
+        assert await requester.fetch(str(server.make_url('/')), source_name='test') == {'status': 200}
+        assert len(request_times) == 3
+
+    finally:
+        await requester.close()
+        await server.close()
+
+
+@pytest.mark.asyncio
+async def test_gives_up_after_max_retries_and_on_client_errors():
+    server, request_times = await _start_server([500, 500, 404])
+    requester = _create_requester(max_retries=1)
+    try:
+        with pytest.raises(Exception, match='status code 500'):
+            await requester.fetch(str(server.make_url('/')), source_name='test')
+
+        with pytest.raises(Exception, match='status code 404'):
+            await requester.fetch(str(server.make_url('/')), source_name='test')
+
+        assert len(request_times) == 3
+
+    finally:
+        await requester.close()
+        await server.close()
+
+
+@pytest.mark.asyncio
+async def test_honors_retry_after():
+    server, request_times = await _start_server([429], retry_after='0.3')
+    requester = _create_requester()
+    try:
+        await requester.fetch(str(server.make_url('/')), source_name='test')
+        assert request_times[1] - request_times[0] >= 0.3
+
+    finally:
+        await requester.close()
+        await server.close()
+
+
+@pytest.mark.asyncio
+async def test_token_bucket_limits_rate_after_burst():
+    token_bucket = TokenBucket(rate=20, capacity=2)
+    start_time = time.monotonic()
+    for _ in range(6):
+        await token_bucket.acquire()
+
+    assert time.monotonic() - start_time >= (6 - 2) / 20 * 0.9
+
+
+def test_parse_retry_after():
+    assert parse_retry_after('2') == 2.0
+    assert parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0.0
+    assert parse_retry_after('soon') is None
+    assert parse_retry_after(None) is None
+
+
+@pytest.mark.asyncio
+async def test_cached_fetch_reports_unchanged_payloads():
+    payloads = [{'odds': 1.9}, {'odds': 1.9}, {'odds': 2.0}]
+
+    async def handler(request):
+        if request.headers.get('If-None-Match') == '"v1"':
+            return web.Response(status=304)
+
+        return web.json_response(payloads.pop(0), headers={'ETag': '"v1"'} if request.path == '/etag' else None)
+
+    server_app = web.Application()
+    server_app.router.add_get('/{path}', handler)
+    server = TestServer(server_app)
+    await server.start_server()
+    requester = _create_requester()
+    try:
+        fetch = lambda path, **kwargs: requester.fetch(str(server.make_url(path)), source_name='test', **kwargs)
+        assert await fetch('/hash', cache=True, params={'offer': 1}) == {'odds': 1.9}
+        assert await fetch('/hash', cache=True, params={'offer': 1}) is NOT_MODIFIED
+        assert await fetch('/hash', cache=True, params={'offer': 1}) == {'odds': 2.0}
+        payloads.append({'odds': 2.0})
+        assert await fetch('/hash', cache=True, uncached_params=('start',), params={'offer': 1, 'start': 2}) is NOT_MODIFIED
+        payloads.append({'odds': 2.1})
+        assert await fetch('/etag', cache=True) == {'odds': 2.1}
+        assert await fetch('/etag', cache=True) is NOT_MODIFIED
+
+    finally:
+        await requester.close()
+        await server.close()
@@ -0,0 +1,56 @@
+import json
+from datetime import date, datetime
+from typing import Any
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+def _default(obj: Any) -> Any:
+    # datetime subclasses (e.g. pandas.Timestamp) and numpy scalars aren't handled natively by every backend
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+
+    if hasattr(obj, 'item'):
+        return obj.item()
+
+    raise TypeError(f"Object of type '{type(obj).__name__}' is not JSON serializable")
+
+
+class Serializing:
+
+    def __init__(self, backend: str = None):
+        available_backends = [name for name, module in [('orjson', orjson), ('msgspec', msgspec)] if module] + ['json']
+        if backend and (backend not in available_backends):
+            raise ValueError(f"JSON backend '{backend}' is not available, choose from {available_backends}")
+
+        self.backend = backend or available_backends[0]
+        if self.backend == 'msgspec':
+            self._encoder = msgspec.json.Encoder(enc_hook=_default)
+            self._decoder = msgspec.json.Decoder()
+
+    def dumps(self, obj: Any) -> bytes:
+        if self.backend == 'orjson':
+            return orjson.dumps(obj, default=_default)
+
+        if self.backend == 'msgspec':
+            return self._encoder.encode(obj)
+
+        return json.dumps(obj, default=_default, separators=(',', ':')).encode('utf-8')
+
+    def loads(self, data: bytes | str) -> Any:
+        # bytes are decoded directly, no intermediate str copy is made for orjson/msgspec
+        if self.backend == 'orjson':
+            return orjson.loads(data)
+
+        if self.backend == 'msgspec':
+            return self._decoder.decode(data)
+
+        return json.loads(data)
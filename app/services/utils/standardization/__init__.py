@@ -1 +1,4 @@
-from .standardization import Standardizer
\ No newline at end of file
+from .markets import MarketResolver, normalize_market_name
+from .standardization import Standardizer
+from .subjects import SubjectIndex, get_bounded_edit_distance
+from .vocabulary import Vocabulary
\ No newline at end of file
@@ -1,6 +1,11 @@
+import logging
+
 from app.services.utils.storing import Storing
 from app.services.utils.cleaning import Cleaning
 
+
+logger = logging.getLogger(__name__)
+
 # STANDARDIZATION MAPS
 LEAGUE_NAME_STRD_MAP = {
     'NBA': 'NBA',
@@ -560,37 +565,22 @@ SUBJECT_NAME_STRD_MAP = {
 }
 
 
-def load_in_subject_strd_identity_map(rosters: list[dict]):
-    global SUBJECT_NAME_STRD_MAP
+def get_subject_strd_identity_map(roster: dict) -> dict[str, str]:
     subject_name_strd_identity_map = {}
-
-    for roster in rosters:
-        for subject in roster['players']:
-            stored_subject_name = subject['name']
-            cleaned_subject_name = Cleaning.clean_subject_name(stored_subject_name)
-            # One for just the league and subject name
+    for subject in roster['players']:
+        stored_subject_name = subject['name']
+        cleaned_subject_name = Cleaning.clean_subject_name(stored_subject_name)
+        # One for just the league and subject name, and one for each subject attribute
+        for subject_attribute in [None, roster['team']['abbr_name'], subject['position']]:
             try:
-                subject_key = Storing.get_subject_key(roster['league'], cleaned_subject_name)
+                subject_key = Storing.get_subject_key(roster['league'], cleaned_subject_name, subject_attribute)
                 if subject_key in subject_name_strd_identity_map:
                     raise ValueError(f"Duplicate subject key found: '{subject_key}'")
 
                 subject_name_strd_identity_map[subject_key] = stored_subject_name
+                # Todo: think about adding more data for each subject instead of only 'name'?
 
             except Exception as e:
-                print('[Standardizer]: !! ERROR -', e, '!!')
-
-            # Two for the league, subject name, and each subject attribute
-            for subject_attribute_field in ['team', 'position']:
-                try:
-                    subject_attribute_field = roster['team']['abbr_name'] if subject_attribute_field == 'team' else subject['position']
-                    subject_key = Storing.get_subject_key(roster['league'], cleaned_subject_name, subject_attribute_field)
-                    if subject_key in subject_name_strd_identity_map:
-                        raise ValueError(f"Duplicate subject key found: '{subject_key}'")
-
-                    subject_name_strd_identity_map[subject_key] = stored_subject_name
-                    # Todo: think about adding more data for each subject instead of only 'name'?
-
-                except Exception as e:
-                    print('[Standardizer]: !! ERROR -', e, '!!')
+                logger.warning('Could not load subject key', extra={'error': str(e)})
 
-    SUBJECT_NAME_STRD_MAP.update(subject_name_strd_identity_map)
+    return subject_name_strd_identity_map
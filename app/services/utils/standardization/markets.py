@@ -0,0 +1,91 @@
+import logging
+import re
+from collections import Counter
+
+from app.services.utils import utilities as utils
+
+
+logger = logging.getLogger(__name__)
+
+_PUNCTUATION = re.compile(r"[.,()'’]")
+_SEPARATORS = re.compile(r'[\s_\-]+')
+_AND = re.compile(r'\s*(?:\+|\band\b)\s*')
+# leading period spellings, longest first so 'first qtr' is not read as 'first'
+_PERIOD_PREFIXES = [
+    (re.compile(rf'^{prefix}\b\s*'), period) for prefix, period in [
+        (r'(?:first|1st) (?:quarter|qtr)', '1q'), (r'(?:second|2nd) (?:quarter|qtr)', '2q'),
+        (r'(?:third|3rd) (?:quarter|qtr)', '3q'), (r'(?:fourth|4th) (?:quarter|qtr)', '4q'),
+        (r'(?:first|1st) half', '1h'), (r'(?:second|2nd) half', '2h'),
+        (r'[1-4]q', None), (r'[12]h', None),
+    ]
+]
+
+
+def normalize_market_name(market_name: str) -> str:
+    # one canonical key per spelling: lower case, no punctuation, '_'/'-'/spaces collapsed, 'and' read as '+', the parts
+    # of a combined market sorted (a sum does not depend on its order) and period spellings reduced to '1q', '1h', ...
+    normalized_name = _SEPARATORS.sub(' ', _PUNCTUATION.sub('', market_name.lower())).strip()
+    period = ''
+    for prefix, canonical_period in _PERIOD_PREFIXES:
+        if match := prefix.match(normalized_name):
+            period = (canonical_period or match.group().strip()) + ' '
+            normalized_name = normalized_name[match.end():]
+            break
+
+    return period + '+'.join(sorted(_AND.split(normalized_name)))
+
+
+class MarketResolver:
+    # compiled once from the hand written spelling map into {sport: {normalized spelling: market}}, so a lookup is a
+    # dict hit on the raw name (every resolution, hit or miss, is cached) and only new spellings get normalized.
+    # unknown markets return None and are counted, to be reported once per batch instead of once per line
+
+    def __init__(self, market_name_map: dict[str, dict[str, str]]):
+        self.market_name_map = market_name_map
+        self.markets: dict[str, dict[str, str]] = {}
+        for sport, sport_market_name_map in market_name_map.items():
+            sport_markets = self.markets[sport] = {}
+            ambiguous_names = set()
+            for market_name, std_market_name in sport_market_name_map.items():
+                normalized_name = normalize_market_name(market_name)
+                if sport_markets.setdefault(normalized_name, std_market_name) != std_market_name:
+                    ambiguous_names.add(normalized_name)
+
+            # spellings that only differ in case but mean different markets (e.g. 'Tackles' and 'tackles') only
+            # resolve as they are written in the map
+            for normalized_name in ambiguous_names:
+                del sport_markets[normalized_name]
+
+        self._resolved: dict[tuple[str, str, str | None], str | None] = {}
+        self.unknown_markets: Counter[tuple[str, str]] = Counter()
+
+    def resolve(self, market_name: str, sport: str, period: str = None) -> str | None:
+        key = (sport, market_name, period)
+        try:
+            std_market_name = self._resolved[key]
+
+        except KeyError:
+            full_market_name = f'{period} {market_name}' if period else market_name
+            std_market_name = self._resolved[key] = (
+                self.market_name_map.get(sport, {}).get(full_market_name) or
+                self.markets.get(sport, {}).get(normalize_market_name(full_market_name))
+            )
+
+        if std_market_name is None:
+            self.unknown_markets[(sport, f'{period} {market_name}' if period else market_name)] += 1
+
+        return std_market_name
+
+    def report_unknown_markets(self, max_reported: int = 50) -> None:
+        # the markets that missed since the last report, most frequent first, in one record
+        unknown_markets, self.unknown_markets = self.unknown_markets, Counter()
+        if not unknown_markets:
+            return
+
+        for (sport, _), count in unknown_markets.items():
+            utils.instrumenter.inc('standardization_misses_total', count, field='market', sport=sport)
+
+        logger.warning('Unknown markets', extra={
+            'num_lines': unknown_markets.total(), 'num_markets': len(unknown_markets),
+            'markets': {f'{sport}:{market_name}': count for (sport, market_name), count in unknown_markets.most_common(max_reported)}
+        })
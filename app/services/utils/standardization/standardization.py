@@ -1,15 +1,17 @@
 
 from app.services.utils.standardization import maps
+from app.services.utils.standardization.markets import MarketResolver
+from app.services.utils.standardization.subjects import SubjectIndex
+from app.services.utils.standardization.vocabulary import Vocabulary
 
 
 class Standardizer:
 
     def __init__(self, rosters: list[dict] = None):
         self.rosters = rosters
-
-        if rosters:
-            maps.load_in_subject_strd_identity_map(rosters)
-            self.subject_name_strd_map = maps.SUBJECT_NAME_STRD_MAP
+        self.vocabulary = Vocabulary()  # lives as long as the pipeline, so category codes are stable across batches
+        self.market_resolver = MarketResolver(maps.MARKET_NAME_STRD_MAP)
+        self.subject_index = SubjectIndex(rosters or [])
 
     @staticmethod
     def standardize_league_name(league_name: str) -> str:
@@ -25,21 +27,22 @@ class Standardizer:
 
         raise ValueError(f"Period '{period}' not found in period map")
 
-    @staticmethod
-    def standardize_market_name(market_name: str, sport: str, period: str = None) -> str:
-        if period:
-            market_name = f'{period} {market_name}'
-
-        if market_map_sport_filtered := maps.MARKET_NAME_STRD_MAP.get(sport):
-            if strd_market_name := market_map_sport_filtered.get(market_name):
-                return strd_market_name
+    def standardize_market_name(self, market_name: str, sport: str, period: str = None) -> str | None:
+        # None for unknown markets, which are reported in aggregate (see MarketResolver.report_unknown_markets)
+        return self.market_resolver.resolve(market_name, sport, period)
 
-            raise ValueError(f"Market '{market_name}' not found in '{sport}' market map")
+    def reload_subjects(self, rosters: list[dict]) -> bool:
+        # the new version is built aside and swapped in with one assignment, so lookups never take a lock and always
+        # see one whole version
+        subject_index = self.subject_index.rebuild(rosters)
+        if subject_index is self.subject_index:
+            return False
 
-        raise ValueError(f"Sport '{sport}' not found in market map")
+        self.subject_index, self.rosters = subject_index, rosters
+        return True
 
     def standardize_subject_name(self, subject_key: str) -> str:
-        if strd_subject_name := self.subject_name_strd_map.get(subject_key):
+        if strd_subject_name := self.subject_index.standardize(subject_key):
             return strd_subject_name
 
-        raise ValueError(f"Subject '{subject_key}' not found in subject strd map")
\ No newline at end of file
+        raise ValueError(f"Subject '{subject_key}' not found in subject strd map")
@@ -0,0 +1,204 @@
+import hashlib
+import logging
+import re
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from datetime import date
+
+from app.services.configs import load_configs
+from app.services.utils import utilities as utils
+from app.services.utils.cleaning import Cleaning
+from app.services.utils.standardization import maps
+
+
+logger = logging.getLogger(__name__)
+
+_SUFFIXES = re.compile(r'\s+(?:jr|sr|ii|iii|iv)$')  # one source writes them, the next drops them
+
+
+def _get_index_name(subject_name: str) -> str:
+    return _SUFFIXES.sub('', subject_name)
+
+
+def get_roster_hash(roster: dict) -> str:
+    # only what the subject keys and names are built from, a new jersey number changes nothing here
+    content = [roster['league'], roster['team']['abbr_name'],
+               sorted((subject['name'], subject.get('position') or '') for subject in roster['players'])]
+    return hashlib.blake2b(utils.serializer.dumps(content), digest_size=16).hexdigest()
+
+
+def get_trigrams(name: str) -> set[str]:
+    padded_name = f'  {name} '  # so the first letters, which rarely differ, weigh more
+    return {padded_name[i:i + 3] for i in range(len(padded_name) - 2)}
+
+
+def get_bounded_edit_distance(a: str, b: str, max_distance: int) -> int | None:
+    # levenshtein distance, or None as soon as it has to be above max_distance. only the diagonal band of width
+    # 2 * max_distance + 1 is filled in, so it is O(max_distance * len) instead of O(len * len)
+    if abs(len(a) - len(b)) > max_distance:
+        return None
+
+    too_far = max_distance + 1
+    previous_row = [i if i <= max_distance else too_far for i in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        current_row = [too_far] * (len(b) + 1)
+        if i <= max_distance:
+            current_row[0] = i
+
+        for j in range(max(1, i - max_distance), min(len(b), i + max_distance) + 1):
+            current_row[j] = min(
+                previous_row[j] + 1,
+                current_row[j - 1] + 1,
+                previous_row[j - 1] + (a[i - 1] != b[j - 1]),
+                too_far,
+            )
+
+        if min(current_row) > max_distance:
+            return None
+
+        previous_row = current_row
+
+    return previous_row[-1] if previous_row[-1] <= max_distance else None
+
+
+@dataclass
+class TeamSubjects:
+    # everything the index takes from one roster, kept between versions so an unchanged roster is not rebuilt
+    roster_hash: str
+    league: str
+    team: str
+    subject_name_strd_map: dict[str, str]
+    block: dict[str, list[tuple[str, str]]]  # trigram -> (cleaned, stored) subject names
+
+
+def _get_team_subjects(roster: dict, roster_hash: str) -> TeamSubjects:
+    block = defaultdict(list)
+    for subject in roster['players']:
+        cleaned_subject_name = _get_index_name(Cleaning.clean_subject_name(subject['name']))
+        for trigram in get_trigrams(cleaned_subject_name):
+            block[trigram].append((cleaned_subject_name, subject['name']))
+
+    return TeamSubjects(roster_hash, roster['league'], roster['team']['abbr_name'],
+                        maps.get_subject_strd_identity_map(roster), dict(block))
+
+
+class SubjectIndex:
+    # one version of the subjects: the exact subject key map plus approximate matches for the names that miss it.
+    # subjects are blocked by league and by (league, team), and within a block a trigram index picks the few names that
+    # share the most trigrams with the raw one, so only those go through the (bounded) edit distance. a raw name is
+    # matched once per day, misses included, the cache is dropped when the date changes.
+    # an index is never changed once built, rebuild() makes the next version from new rosters, reusing every team whose
+    # roster did not change, to be swapped in with one assignment (see Standardizer.reload_subjects)
+
+    def __init__(self, rosters: list[dict] = (), version: int = 0, previous: 'SubjectIndex' = None):
+        self.configs = load_configs('standardization')
+        self.version = version
+        previous_teams = previous.teams if previous else {}
+        self.teams: dict[tuple[str, str], TeamSubjects] = {}
+        for roster in rosters:
+            roster_hash = get_roster_hash(roster)
+            team_key = (roster['league'], roster['team']['full_name'])
+            if (team_subjects := previous_teams.get(team_key)) and (team_subjects.roster_hash == roster_hash):
+                self.teams[team_key] = team_subjects
+            else:
+                self.teams[team_key] = _get_team_subjects(roster, roster_hash)
+
+        self.changed_leagues = {
+            team_key[0] for team_key in self.teams.keys() ^ previous_teams.keys()
+        } | {
+            team_key[0] for team_key, team_subjects in self.teams.items()
+            if (team_key in previous_teams) and (previous_teams[team_key] is not team_subjects)
+        }
+
+        self.subject_name_strd_map = self._get_subject_name_strd_map()
+        self.blocks = self._get_blocks(previous)
+        # approximate matches stay valid for the leagues whose rosters did not change
+        self._matches: dict[tuple[str, str, str | None], str | None] = {
+            key: match for key, match in previous._matches.items() if key[0] not in self.changed_leagues
+        } if previous and (previous._matches_date == date.today()) else {}
+        self._matches_date = date.today()
+
+    def _get_subject_name_strd_map(self) -> dict[str, str]:
+        subject_name_strd_map, num_duplicates = dict(maps.SUBJECT_NAME_STRD_MAP), 0
+        identity_keys = set()
+        for team_subjects in self.teams.values():
+            for subject_key, stored_subject_name in team_subjects.subject_name_strd_map.items():
+                if subject_key in identity_keys:  # e.g. two players with the same name in a league, the first is kept
+                    num_duplicates += 1
+                    continue
+
+                identity_keys.add(subject_key)
+                subject_name_strd_map[subject_key] = stored_subject_name
+
+        if num_duplicates:
+            logger.warning('Duplicate subject keys', extra={'num_duplicates': num_duplicates, 'version': self.version})
+
+        return subject_name_strd_map
+
+    def _get_blocks(self, previous: 'SubjectIndex' = None) -> dict[tuple[str, str | None], dict[str, list[tuple[str, str]]]]:
+        blocks, league_blocks = {}, defaultdict(lambda: defaultdict(list))
+        for team_subjects in self.teams.values():
+            blocks[(team_subjects.league, team_subjects.team)] = team_subjects.block
+            if previous and (team_subjects.league not in self.changed_leagues):
+                blocks[(team_subjects.league, None)] = previous.blocks[(team_subjects.league, None)]
+            else:
+                for trigram, subject_names in team_subjects.block.items():
+                    league_blocks[team_subjects.league][trigram].extend(subject_names)
+
+        blocks.update({(league, None): dict(league_block) for league, league_block in league_blocks.items()})
+        return blocks
+
+    def rebuild(self, rosters: list[dict]) -> 'SubjectIndex':
+        subject_index = SubjectIndex(rosters, self.version + 1, previous=self)
+        return subject_index if subject_index.changed_leagues else self
+
+    def _search_block(self, block: dict[str, list[tuple[str, str]]], subject_name: str) -> str | None:
+        shared_trigrams = Counter()
+        for trigram in get_trigrams(subject_name):
+            shared_trigrams.update(block.get(trigram, ()))
+
+        # an edit per few characters at most, so short names do not match just any other short name
+        max_distance = min(self.configs['max_subject_distance'], len(subject_name) // self.configs['min_chars_per_edit'])
+        best_distance, best_subject_names = max_distance, set()
+        for (cleaned_subject_name, stored_subject_name), _ in shared_trigrams.most_common(self.configs['max_subject_candidates']):
+            distance = get_bounded_edit_distance(subject_name, cleaned_subject_name, best_distance)
+            if distance is None:
+                continue
+
+            if (distance < best_distance) or not best_subject_names:
+                best_distance, best_subject_names = distance, {stored_subject_name}
+            else:
+                best_subject_names.add(stored_subject_name)
+
+        # two subjects just as close to the raw name is no match at all
+        return best_subject_names.pop() if len(best_subject_names) == 1 else None
+
+    def match(self, league: str, subject_name: str, team: str = None) -> str | None:
+        if (today := date.today()) != self._matches_date:
+            self._matches, self._matches_date = {}, today
+
+        key = (league, subject_name, team)
+        if key in self._matches:
+            return self._matches[key]
+
+        subject_name = _get_index_name(subject_name)
+        matched_subject_name = None
+        if team and (team_block := self.blocks.get((league, team))):  # a traded player is still found in the league
+            matched_subject_name = self._search_block(team_block, subject_name)
+
+        if (matched_subject_name is None) and (league_block := self.blocks.get((league, None))):
+            matched_subject_name = self._search_block(league_block, subject_name)
+
+        utils.instrumenter.inc('standardization_fuzzy_matches_total', field='subject', league=league,
+                               matched=matched_subject_name is not None)
+        self._matches[key] = matched_subject_name
+        return matched_subject_name
+
+    def standardize(self, subject_key: str) -> str | None:
+        if strd_subject_name := self.subject_name_strd_map.get(subject_key):
+            return strd_subject_name
+
+        # spellings missing the exact map (nicknames, typos, dropped suffixes) are matched approximately, within the
+        # team when the key has one
+        league, *subject_attributes, subject_name = subject_key.split(':')
+        return self.match(league, subject_name, *subject_attributes[:1])
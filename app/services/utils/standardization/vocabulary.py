@@ -0,0 +1,37 @@
+from typing import Iterable
+
+import numpy as np
+import pandas as pd
+
+
+CATEGORICAL_FIELDS = ['bookmaker', 'league', 'market', 'subject', 'label']
+
+
+class Vocabulary:
+    # codes are handed out in first-seen order and never reused, so a code means the same value in every batch
+
+    def __init__(self, field_names: Iterable[str] = CATEGORICAL_FIELDS):
+        self.codes = { field_name: {} for field_name in field_names }
+        self.values = { field_name: [] for field_name in field_names }
+
+    def _get_code(self, field_name: str, value: str) -> int:
+        codes = self.codes[field_name]
+        if (code := codes.get(value)) is None:
+            code = codes[value] = len(self.values[field_name])
+            self.values[field_name].append(value)
+
+        return code
+
+    def encode(self, field_name: str, values: list[str]) -> np.ndarray:
+        # hashes each distinct value of the batch once, the per-row work is an int32 take
+        batch_codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+        vocabulary_codes = np.fromiter(
+            (self._get_code(field_name, value) for value in uniques), dtype=np.int32, count=len(uniques)
+        )
+        return vocabulary_codes[batch_codes]
+
+    def decode(self, field_name: str, code: int) -> str:
+        return self.values[field_name][code]
+
+    def to_categorical(self, field_name: str, values: list[str]) -> pd.Categorical:
+        return pd.Categorical.from_codes(self.encode(field_name, values), categories=self.values[field_name])
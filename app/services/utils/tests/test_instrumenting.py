@@ -0,0 +1,55 @@
+import json
+import logging
+
+import pytest
+
+from app.services.utils.instrumenting import Instrumenting, StructuredFormatter
+from app.services.utils.serializing import Serializing
+
+
+def test_spans_are_timed_and_their_errors_counted():
+    instrumenter = Instrumenting()
+    with instrumenter.span('parse', source='OddsShopper', league='NBA'):
+        pass
+
+    with pytest.raises(ValueError):
+        with instrumenter.span('parse', source='OddsShopper', league='NBA'):
+            raise ValueError('bad payload')
+
+    rendered = instrumenter.render()
+    labels = 'league="NBA",source="OddsShopper",stage="parse"'
+    assert f'pipeline_stage_duration_seconds_count{{{labels}}} 2' in rendered
+    assert f'pipeline_stage_duration_seconds_bucket{{{labels},le="+Inf"}} 2' in rendered
+    assert f'pipeline_stage_errors_total{{error="ValueError",{labels}}} 1' in rendered
+
+
+def test_render_prometheus_text_format():
+    instrumenter = Instrumenting()
+    instrumenter.inc('source_response_bytes_total', 12_345_678, source='OddsShopper')
+    instrumenter.inc('source_response_bytes_total', 2, source='OddsShopper')
+    instrumenter.observe('pipeline_stage_duration_seconds', 0.2, stage='store')
+    instrumenter.observe('pipeline_stage_duration_seconds', 3, stage='store')
+    instrumenter.observe('pipeline_stage_duration_seconds', 100, stage='store')
+
+    lines = instrumenter.render().splitlines()
+    assert '# TYPE source_response_bytes_total counter' in lines
+    assert 'source_response_bytes_total{source="OddsShopper"} 12345680' in lines
+    assert '# TYPE pipeline_stage_duration_seconds histogram' in lines
+    buckets = [line for line in lines if line.startswith('pipeline_stage_duration_seconds_bucket')]
+    assert buckets[0] == 'pipeline_stage_duration_seconds_bucket{stage="store",le="0.005"} 0'
+    assert 'pipeline_stage_duration_seconds_bucket{stage="store",le="0.25"} 1' in buckets
+    assert 'pipeline_stage_duration_seconds_bucket{stage="store",le="5"} 2' in buckets
+    assert buckets[-2:] == ['pipeline_stage_duration_seconds_bucket{stage="store",le="60"} 2',
+                            'pipeline_stage_duration_seconds_bucket{stage="store",le="+Inf"} 3']
+    assert 'pipeline_stage_duration_seconds_sum{stage="store"} 103.2' in lines
+
+
+def test_structured_formatter_logs_extra_fields():
+    record = logging.makeLogRecord({
+        'name': 'app.services.betting_lines.main', 'levelname': 'INFO', 'msg': 'Batch completed',
+        'league': 'NBA', 'num_betting_lines': 3,
+    })
+    entry = json.loads(StructuredFormatter(Serializing()).format(record))
+    assert entry['message'] == 'Batch completed'
+    assert (entry['league'], entry['num_betting_lines']) == ('NBA', 3)
+    assert entry['logger'] == 'app.services.betting_lines.main'
@@ -0,0 +1,40 @@
+from app.services.utils.standardization import MarketResolver, maps, normalize_market_name
+
+
+def test_normalize_market_name():
+    assert normalize_market_name('POINTS_AND_REBOUNDS') == normalize_market_name('Points + Rebounds')
+    assert normalize_market_name('Rebounds+Points') == normalize_market_name('Points + Rebounds')
+    assert normalize_market_name('first_qtr_points') == normalize_market_name('1Q POINTS') == '1q points'
+    assert normalize_market_name('1st Half Pts + Rebs') == '1h pts+rebs'
+    assert normalize_market_name('3-Pointers') == normalize_market_name('3 pointers')
+    assert normalize_market_name('Player points (incl. overtime)') == 'player points incl overtime'
+
+
+def test_resolver_keeps_every_mapped_spelling():
+    market_resolver = MarketResolver(maps.MARKET_NAME_STRD_MAP)
+    for sport, market_name_map in maps.MARKET_NAME_STRD_MAP.items():
+        for market_name, std_market_name in market_name_map.items():
+            assert market_resolver.resolve(market_name, sport) == std_market_name
+
+    assert not market_resolver.unknown_markets
+
+
+def test_resolver_matches_new_spellings_and_counts_unknown_markets():
+    market_resolver = MarketResolver({'Basketball': {
+        'Points + Rebounds': 'Points + Rebounds', '1Q POINTS': '1Q Points', 'Tackles': 'Total', 'tackles': 'Solo'
+    }})
+    assert market_resolver.resolve('rebounds and points', 'Basketball') == 'Points + Rebounds'
+    assert market_resolver.resolve('Points', 'Basketball', period='1Q') == '1Q Points'
+    assert market_resolver.resolve('first_qtr_points', 'Basketball') == '1Q Points'
+    # only differ in case but mean different markets, so only the exact spellings resolve
+    assert (market_resolver.resolve('Tackles', 'Basketball'), market_resolver.resolve('tackles', 'Basketball')) == ('Total', 'Solo')
+    assert market_resolver.resolve('TACKLES', 'Basketball') is None
+
+    assert market_resolver.resolve('Dunks', 'Basketball') is None
+    assert market_resolver.resolve('Dunks', 'Basketball') is None
+    assert market_resolver.resolve('Points', 'Curling') is None
+    assert market_resolver.unknown_markets == {
+        ('Basketball', 'TACKLES'): 1, ('Basketball', 'Dunks'): 2, ('Curling', 'Points'): 1
+    }
+    market_resolver.report_unknown_markets()
+    assert not market_resolver.unknown_markets
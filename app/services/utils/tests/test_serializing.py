@@ -0,0 +1,35 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.utils.serializing import Serializing, orjson, msgspec
+
+
+BACKENDS = [backend for backend, module in [('orjson', orjson), ('msgspec', msgspec), ('json', True)] if module]
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_round_trip(backend):
+    serializer = Serializing(backend)
+    betting_line = {'_id': 'FanDuel:NBA:Points:LeBron James:Over', 'line': 24.5, 'odds': 1.9, 'batch_num': 3}
+    assert serializer.loads(serializer.dumps(betting_line)) == betting_line
+    assert serializer.loads(serializer.dumps(betting_line).decode('utf-8')) == betting_line
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_encodes_timestamps_and_numpy_scalars_the_same_way(backend):
+    serializer = Serializing(backend)
+    timestamp = datetime(2025, 1, 1, 12, 30, 15, 500)
+    encoded = serializer.loads(serializer.dumps({
+        'batch_timestamp': timestamp, 'collection_timestamp': pd.Timestamp(timestamp), 'ev': np.float64(0.25)
+    }))
+    assert encoded == {
+        'batch_timestamp': timestamp.isoformat(), 'collection_timestamp': timestamp.isoformat(), 'ev': 0.25
+    }
+
+
+def test_unavailable_backend():
+    with pytest.raises(ValueError):
+        Serializing('simdjson')
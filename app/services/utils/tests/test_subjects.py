@@ -0,0 +1,103 @@
+from datetime import date, timedelta
+
+import pytest
+
+from app.services.utils.standardization import Standardizer, SubjectIndex, get_bounded_edit_distance
+
+
+ROSTERS = [
+    {'league': 'NBA', 'team': {'abbr_name': 'WAS', 'full_name': 'Washington Wizards'}, 'players': [
+        {'name': 'Alex Sarr', 'position': 'C', 'jersey_number': '20'},
+        {'name': 'Jordan Poole', 'position': 'G', 'jersey_number': '13'},
+    ]},
+    {'league': 'NBA', 'team': {'abbr_name': 'BOS', 'full_name': 'Boston Celtics'}, 'players': [
+        {'name': 'Jaylen Brown', 'position': 'G', 'jersey_number': '7'},
+        {'name': 'Jrue Holiday', 'position': 'G', 'jersey_number': '4'},
+    ]},
+    {'league': 'NBA', 'team': {'abbr_name': 'HOU', 'full_name': 'Houston Rockets'}, 'players': [
+        {'name': 'Jalen Green', 'position': 'G', 'jersey_number': '4'},
+        {'name': 'Jabari Smith Jr.', 'position': 'F', 'jersey_number': '10'},
+    ]},
+]
+
+
+def test_get_bounded_edit_distance():
+    assert get_bounded_edit_distance('jaylen brown', 'jaylen brown', 2) == 0
+    assert get_bounded_edit_distance('jalen brown', 'jaylen brown', 2) == 1
+    assert get_bounded_edit_distance('kitten', 'sitting', 3) == 3
+    assert get_bounded_edit_distance('kitten', 'sitting', 2) is None
+    assert get_bounded_edit_distance('jalen green', 'jaylen brown', 2) is None
+
+
+def test_subject_index_matches_within_blocks():
+    subject_index = SubjectIndex(ROSTERS)
+    assert subject_index.match('NBA', 'jalen brown') == 'Jaylen Brown'
+    assert subject_index.match('NBA', 'jabari smith jr') == 'Jabari Smith Jr.'
+    assert subject_index.match('NBA', 'jabari smith') == 'Jabari Smith Jr.'
+    assert subject_index.match('NBA', 'jabari smyth iii') == 'Jabari Smith Jr.'
+    assert subject_index.match('NBA', 'jordan pool', 'WAS') == 'Jordan Poole'
+    assert subject_index.match('NBA', 'jordan pool', 'BOS') == 'Jordan Poole'  # traded since the rosters were collected
+    assert subject_index.match('NBA', 'jordan pool', 'G') == 'Jordan Poole'  # a position is no team block
+    assert subject_index.match('NBA', 'lebron james') is None
+    assert subject_index.match('NCAAM', 'jalen brown') is None
+    assert subject_index.match('NBA', 'jo') is None
+
+
+def test_subject_index_memoizes_per_day():
+    subject_index = SubjectIndex(ROSTERS)
+    assert subject_index.match('NBA', 'jalen brown') == 'Jaylen Brown'
+    subject_index._matches[('NBA', 'jalen brown', None)] = 'Someone Else'
+    assert subject_index.match('NBA', 'jalen brown') == 'Someone Else'
+
+    subject_index._matches_date -= timedelta(days=1)
+    assert subject_index.match('NBA', 'jalen brown') == 'Jaylen Brown'
+    assert subject_index._matches_date == date.today()
+
+
+def test_standardizer_falls_back_to_subject_index():
+    standardizer = Standardizer(ROSTERS)
+    assert standardizer.standardize_subject_name('NBA:jaylen brown') == 'Jaylen Brown'
+    assert standardizer.standardize_subject_name('NBA:BOS:jalen brown') == 'Jaylen Brown'
+    assert standardizer.standardize_subject_name('NBA:jabari smith') == 'Jabari Smith Jr.'
+    with pytest.raises(ValueError):
+        standardizer.standardize_subject_name('NBA:lebron james')
+
+
+def test_subject_index_rebuilds_only_changed_teams():
+    subject_index = SubjectIndex(ROSTERS)
+    assert subject_index.match('NBA', 'jalen brown') == 'Jaylen Brown'
+    assert subject_index.rebuild([dict(roster) for roster in ROSTERS]) is subject_index
+
+    ncaam_roster = {'league': 'NCAAM', 'team': {'abbr_name': 'DUKE', 'full_name': 'Duke Blue Devils'}, 'players': [
+        {'name': 'Cooper Flagg', 'position': 'F', 'jersey_number': '2'}
+    ]}
+    ncaam_subject_index = subject_index.rebuild([*ROSTERS, ncaam_roster])
+    assert (ncaam_subject_index.version, ncaam_subject_index.changed_leagues) == (1, {'NCAAM'})
+    assert ncaam_subject_index.teams[('NBA', 'Boston Celtics')] is subject_index.teams[('NBA', 'Boston Celtics')]
+    assert ncaam_subject_index.blocks[('NBA', None)] is subject_index.blocks[('NBA', None)]
+    assert ('NBA', 'jalen brown', None) in ncaam_subject_index._matches
+    assert ncaam_subject_index.standardize('NCAAM:cooper flag') == 'Cooper Flagg'
+
+    # jordan poole is traded to boston
+    traded_rosters = [
+        {**ROSTERS[0], 'players': ROSTERS[0]['players'][:1]},
+        {**ROSTERS[1], 'players': [*ROSTERS[1]['players'], ROSTERS[0]['players'][1]]},
+        ROSTERS[2],
+    ]
+    traded_subject_index = ncaam_subject_index.rebuild(traded_rosters)
+    assert (traded_subject_index.version, traded_subject_index.changed_leagues) == (2, {'NBA', 'NCAAM'})
+    assert traded_subject_index.teams[('NBA', 'Houston Rockets')] is subject_index.teams[('NBA', 'Houston Rockets')]
+    assert not traded_subject_index._matches
+    assert traded_subject_index.standardize('NBA:BOS:jordan poole') == 'Jordan Poole'
+    assert traded_subject_index.standardize('NBA:WAS:jordan poole') == 'Jordan Poole'  # by its league block
+    assert traded_subject_index.standardize('NCAAM:cooper flagg') is None
+    assert ncaam_subject_index.standardize('NBA:WAS:jordan poole') == 'Jordan Poole'  # a version never changes
+
+
+def test_standardizer_reloads_subjects():
+    standardizer = Standardizer(ROSTERS[:1])
+    subject_index = standardizer.subject_index
+    assert not standardizer.reload_subjects(ROSTERS[:1])
+    assert standardizer.reload_subjects(ROSTERS)
+    assert standardizer.subject_index is not subject_index
+    assert standardizer.standardize_subject_name('NBA:HOU:jalen green') == 'Jalen Green'
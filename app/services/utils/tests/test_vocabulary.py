@@ -0,0 +1,19 @@
+from app.services.utils.standardization import Vocabulary
+
+
+def test_codes_are_stable_across_batches():
+    vocabulary = Vocabulary()
+    first_batch = vocabulary.encode('bookmaker', ['FanDuel', 'BetOnline', 'FanDuel'])
+    second_batch = vocabulary.encode('bookmaker', ['Caesars', 'FanDuel', 'BetOnline'])
+    assert first_batch.tolist() == [0, 1, 0]
+    assert second_batch.tolist() == [2, 0, 1]
+    assert vocabulary.decode('bookmaker', 2) == 'Caesars'
+    assert vocabulary.encode('label', ['Over']).tolist() == [0]  # each field has its own codes
+
+
+def test_to_categorical_keeps_values():
+    vocabulary = Vocabulary()
+    vocabulary.encode('subject', ['LeBron James'])
+    categorical = vocabulary.to_categorical('subject', ['Stephen Curry', 'LeBron James'])
+    assert categorical.tolist() == ['Stephen Curry', 'LeBron James']
+    assert categorical.codes.tolist() == [1, 0]
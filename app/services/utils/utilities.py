@@ -1,9 +1,15 @@
-from app.services.utils.requesting import Requesting
+from app.services.utils.requesting import Requesting, NOT_MODIFIED
 from app.services.utils.storing import Storing
 from app.services.utils.cleaning import Cleaning
+from app.services.utils.serializing import Serializing
+from app.services.utils.instrumenting import Instrumenting
 
 
-requester = Requesting()
+serializer = Serializing()
+
+instrumenter = Instrumenting(serializer)
+
+requester = Requesting(serializer, instrumenter)
 
 storer = Storing()
 
@@ -0,0 +1,47 @@
+import asyncio
+import os
+
+import pytest
+
+from app.services.utils import Standardizer
+from app.services.betting_lines.tests.synthetic import SLATE_SIZES, generate_oddsshopper_resp, generate_rosters
+
+
+@pytest.fixture(scope='session')
+def oddsshopper_resps() -> dict[str, tuple[list[dict], int]]:
+    return {slate: generate_oddsshopper_resp(num_betting_lines) for slate, num_betting_lines in SLATE_SIZES.items()}
+
+
+@pytest.fixture(scope='session')
+def standardizer(oddsshopper_resps) -> Standardizer:
+    # every subject of the largest slate is on a roster, so the lookups below all hit
+    return Standardizer(generate_rosters(max(num_subjects for _, num_subjects in oddsshopper_resps.values())))
+
+
+@pytest.fixture
+def loop():
+    loop = asyncio.new_event_loop()
+    yield loop
+    loop.close()
+
+
+@pytest.fixture
+def get_database():
+    # a local mongod when BENCHMARK_MONGO_URI is set (e.g. mongodb://localhost:27017), mongomock otherwise. the
+    # client binds to the loop of its first operation, so each benchmark creates its own
+    clients = []
+
+    def _get_database():
+        if mongo_uri := os.environ.get('BENCHMARK_MONGO_URI'):
+            from motor.motor_asyncio import AsyncIOMotorClient
+            client = AsyncIOMotorClient(mongo_uri)
+        else:
+            mongomock_motor = pytest.importorskip('mongomock_motor')
+            client = mongomock_motor.AsyncMongoMockClient()
+
+        clients.append(client)
+        return client['sauce-benchmark']
+
+    yield _get_database
+    for client in clients:
+        client.close()
@@ -0,0 +1,111 @@
+"""
+Compares the vectorized betting lines processors against the original row-wise implementation.
+
+Usage (from the repo root):
+    python -m benchmarks.processors [--sizes 10000 50000 100000 500000] [--baseline-max 20000]
+"""
+import argparse
+import time
+
+import pandas as pd
+
+from app.services.betting_lines.data_processing import processors
+from app.services.utils.modelling import BettingLine
+from app.services.betting_lines.tests.synthetic import generate_betting_lines
+
+
+def _rowwise_run_processors(betting_lines: list[BettingLine]) -> list[dict]:
+    # the original DataFrame.apply(axis=1) implementation on per-line dicts, kept only as a baseline
+    weights_map = processors.SHARP_PROP_BOOKMAKERS_WEIGHTS
+    df = pd.DataFrame([betting_line.to_dict() for betting_line in betting_lines]).drop(columns=['impl_prb', 'tw_prb', 'ev'])
+    df['impl_prb'] = 1 / df['odds']
+    sharp_betting_lines = df[df['bookmaker'].isin(weights_map.keys())]
+
+    def devig(row):
+        matching_prop_lines = sharp_betting_lines[
+            (sharp_betting_lines['line'] == row['line']) &
+            (sharp_betting_lines['league'] == row['league']) &
+            (sharp_betting_lines['subject'] == row['subject']) &
+            (sharp_betting_lines['market'] == row['market']) &
+            (sharp_betting_lines['bookmaker'] == row['bookmaker']) &
+            (sharp_betting_lines['label'] != row['label'])
+        ]
+        if len(matching_prop_lines) == 1:
+            row['tw_prb'] = row['impl_prb'] / (matching_prop_lines.iloc[0]['impl_prb'] + row['impl_prb'])
+
+        return row
+
+    def weighted_market_avg(grouped_df):
+        weighted_market_avg_betting_line_df = grouped_df.iloc[[0]].drop(['bookmaker', 'odds', 'impl_prb'], axis=1)
+        if len(grouped_df) > 1:
+            weights_sum = 0
+            weighted_market_total = 0
+            for _, row in grouped_df.iterrows():
+                weights = weights_map[row['bookmaker']]
+                weights_sum += weights
+                weighted_market_total += weights * row['tw_prb']
+
+            weighted_market_avg_betting_line_df['tw_prb'] = weighted_market_total / weights_sum
+
+        return weighted_market_avg_betting_line_df
+
+    group_fields = ['line', 'league', 'subject', 'market', 'label']
+    devigged_betting_lines = sharp_betting_lines.apply(devig, axis=1).dropna()
+    consensus = (
+        devigged_betting_lines.groupby(group_fields)
+                              .apply(weighted_market_avg, include_groups=False)
+                              .reset_index(level=group_fields)
+    )
+
+    def expected_value(row):
+        matching_sharp_prop_line = consensus[
+            (consensus['line'] == row['line']) &
+            (consensus['league'] == row['league']) &
+            (consensus['subject'] == row['subject']) &
+            (consensus['market'] == row['market']) &
+            (consensus['label'] == row['label'])
+        ]
+        if len(matching_sharp_prop_line) == 1:
+            prb_of_winning = matching_sharp_prop_line.iloc[0]['tw_prb']
+            row['tw_prb'] = prb_of_winning
+            row['ev'] = (prb_of_winning * (row['odds'] - 1)) - (1 - prb_of_winning)
+
+        return row
+
+    return df.apply(expected_value, axis=1).dropna().sort_values(by='ev', ascending=False).to_dict(orient='records')
+
+
+def _time(func, *args) -> tuple[float, list]:
+    start_time = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start_time, result
+
+
+def _assert_identical(expected: list[dict], actual: list[BettingLine]) -> None:
+    expected_values = {(line['_id'], line['line']): (line['tw_prb'], line['ev']) for line in expected}
+    actual_values = {(line.id, line.line): (line.tw_prb, line.ev) for line in actual}
+    assert expected_values == actual_values, 'vectorized tw_prb/ev differ from the row-wise baseline'
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 50_000, 100_000, 500_000])
+    parser.add_argument('--baseline-max', type=int, default=20_000,
+                        help='largest batch to also run through the row-wise baseline (it is quadratic)')
+    args = parser.parse_args()
+
+    print(f"{'lines':>10} {'vectorized (s)':>15} {'row-wise (s)':>13} {'speedup':>9}")
+    for size in args.sizes:
+        betting_lines = generate_betting_lines(size)
+        if size <= args.baseline_max:
+            rowwise_secs, rowwise_result = _time(_rowwise_run_processors, betting_lines)
+            vectorized_secs, vectorized_result = _time(processors.run_processors, betting_lines)
+            _assert_identical(rowwise_result, vectorized_result)
+            print(f'{size:>10} {vectorized_secs:>15.3f} {rowwise_secs:>13.3f} {rowwise_secs / vectorized_secs:>8.1f}x')
+        else:
+            vectorized_secs, _ = _time(processors.run_processors, betting_lines)
+            print(f"{size:>10} {vectorized_secs:>15.3f} {'-':>13} {'-':>9}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Requests per second of the OddsShopper fan-out pattern (one matchups request, then every offer's outcomes
+concurrently) against a local aiohttp server, with a new ClientSession per request (before) and the pooled,
+keep-alive Requesting client (after).
+
+Usage (from the repo root):
+    python -m benchmarks.requesting [--offers 200] [--rounds 5]
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import aiohttp
+from aiohttp import web
+
+from app.services.utils.requesting import Requesting
+
+
+HOST, PORT = '127.0.0.1', 8765
+OUTCOMES_PAYLOAD = json.dumps([
+    {'offerName': 'Points', 'participants': [{'name': f'Subject {i}'}], 'sides': [
+        {'label': label, 'outcomes': [{'sportsbookCode': 'FanDuel', 'odds': 1.9, 'line': '24.5'}]}
+        for label in ['Over', 'Under']
+    ]} for i in range(50)
+])
+
+
+def _create_server_app(num_offers: int) -> web.Application:
+    async def matchups(_):
+        return web.json_response({'offerCategories': [{'name': 'PlayerProps', 'offers': [
+            {'id': str(i), 'leagueCode': 'NBA'} for i in range(num_offers)
+        ]}]})
+
+    async def outcomes(_):
+        return web.Response(text=OUTCOMES_PAYLOAD, content_type='application/json')
+
+    server_app = web.Application()
+    server_app.add_routes([web.get('/offers', matchups), web.get('/offers/{offer_id}/outcomes', outcomes)])
+    return server_app
+
+
+async def _fetch_with_new_session(url: str) -> dict:
+    # the original Requesting.fetch: a new session (and TCP connection) for every request
+    async with aiohttp.ClientSession() as session:
+        async with session.get(url) as resp:
+            return await resp.json()
+
+
+async def _fan_out(fetch) -> int:
+    matchups = await fetch(f'http://{HOST}:{PORT}/offers')
+    offers = matchups['offerCategories'][0]['offers']
+    await asyncio.gather(*[fetch(f"http://{HOST}:{PORT}/offers/{offer['id']}/outcomes") for offer in offers])
+    return len(offers) + 1
+
+
+async def _requests_per_second(fetch, num_rounds: int) -> float:
+    num_requests = 0
+    start_time = time.perf_counter()
+    for _ in range(num_rounds):
+        num_requests += await _fan_out(fetch)
+
+    return num_requests / (time.perf_counter() - start_time)
+
+
+async def main(num_offers: int, num_rounds: int):
+    runner = web.AppRunner(_create_server_app(num_offers), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, HOST, PORT).start()
+    try:
+        before = await _requests_per_second(_fetch_with_new_session, num_rounds)
+        requester = Requesting()
+        # same pool settings as OddsShopper but without its rate limit, so the transport itself is measured
+        requester.configs = {**requester.configs, 'benchmark': {
+            **requester.configs['OddsShopper'], 'rate': 1_000_000, 'burst': 1_000_000
+        }}
+        fetch = lambda url: requester.fetch(url, source_name='benchmark')
+        await _fan_out(fetch)  # warm up the pool, as it would be from the previous batch
+        after = await _requests_per_second(fetch, num_rounds)
+        await requester.close()
+
+    finally:
+        await runner.cleanup()
+
+    print(f'new session per request: {before:>8.0f} req/s')
+    print(f'pooled keep-alive client: {after:>7.0f} req/s ({after / before:.1f}x)')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--offers', type=int, default=200)
+    parser.add_argument('--rounds', type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.offers, args.rounds))
@@ -0,0 +1,83 @@
+"""
+Benchmarks of storing processed betting lines and serving them from /betting_lines, against a local mongod when
+BENCHMARK_MONGO_URI is set and mongomock (mongomock-motor) otherwise. mongomock is far slower than mongod, so only
+compare runs made against the same backend.
+
+Usage (from the repo root, needs pytest-benchmark):
+    BENCHMARK_MONGO_URI=mongodb://localhost:27017 python -m pytest benchmarks/test_db.py --benchmark-only
+"""
+from dataclasses import replace
+from datetime import timedelta
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+from fastapi.testclient import TestClient
+
+from app import main
+from app.db import db
+from app.db.collections import BettingLines
+from app.main import app
+from app.services.betting_lines.data_processing import run_processors
+from app.services.betting_lines.tests.synthetic import SLATE_SIZES, generate_betting_lines
+
+
+SLATES = ['small', 'medium']  # a large slate takes minutes per round on mongomock
+
+
+def _get_processed_betting_lines(slate: str) -> list:
+    return run_processors(generate_betting_lines(SLATE_SIZES[slate]))
+
+
+async def _reset(betting_lines_collection: BettingLines) -> None:
+    await betting_lines_collection.delete_betting_lines()
+    await betting_lines_collection.create_indexes()
+
+
+@pytest.mark.parametrize('slate', SLATES)
+def test_store_new_betting_lines(benchmark, slate, loop, get_database):
+    # the first batch of the day: every line is inserted and opens a stream bucket
+    betting_lines_collection = BettingLines(get_database())
+    betting_lines = _get_processed_betting_lines(slate)
+    benchmark.pedantic(
+        lambda: loop.run_until_complete(betting_lines_collection.store_betting_lines(betting_lines)),
+        setup=lambda: loop.run_until_complete(_reset(betting_lines_collection)),
+        rounds=5,
+    )
+
+
+@pytest.mark.parametrize('slate', SLATES)
+def test_store_unchanged_betting_lines(benchmark, slate, loop, get_database):
+    # the steady state: every line is already stored and only its stream's tail record is extended
+    betting_lines_collection = BettingLines(get_database())
+    betting_lines = _get_processed_betting_lines(slate)
+    batches = (
+        [replace(betting_line, batch_num=batch_num, batch_timestamp=betting_line.batch_timestamp + timedelta(minutes=batch_num))
+         for betting_line in betting_lines]
+        for batch_num in range(1, 10_000)
+    )
+    loop.run_until_complete(_reset(betting_lines_collection))
+    loop.run_until_complete(betting_lines_collection.store_betting_lines(betting_lines))
+    benchmark.pedantic(
+        lambda batch: loop.run_until_complete(betting_lines_collection.store_betting_lines(batch)),
+        setup=lambda: ((next(batches),), {}),
+        rounds=5,
+    )
+
+
+@pytest.mark.parametrize('slate', SLATES)
+def test_betting_lines_endpoint(benchmark, slate, get_database, monkeypatch):
+    async def create_indexes():
+        pass
+
+    monkeypatch.setattr(main, '_create_indexes', create_indexes)  # created on the benchmark's database by _reset
+    with TestClient(app) as client:
+        # created and filled on the app's loop, which the requests below are served on
+        betting_lines_collection = BettingLines(get_database())
+        client.portal.call(_reset, betting_lines_collection)
+        client.portal.call(betting_lines_collection.store_betting_lines, _get_processed_betting_lines(slate))
+        monkeypatch.setattr(db, 'betting_lines', betting_lines_collection)
+
+        resp = benchmark(client.get, '/betting_lines', params={'league': 'NBA', 'min_ev': 0, 'limit': 100})
+        assert resp.status_code == 200
@@ -0,0 +1,61 @@
+"""
+Benchmarks of the betting lines pipeline's cpu bound stages on synthetic slates.
+
+Usage (from the repo root, needs pytest-benchmark):
+    python -m pytest benchmarks/test_pipeline.py --benchmark-only [--benchmark-autosave | --benchmark-compare]
+"""
+import asyncio
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+from app.services.betting_lines.data_collection.collectors import OddsShopperCollector
+from app.services.betting_lines.data_processing import run_processors
+from app.services.utils import utilities as utils
+from app.services.utils.standardization import Vocabulary
+from app.services.betting_lines.tests.synthetic import SLATE_SIZES, generate_betting_lines
+
+
+SLATES = list(SLATE_SIZES)
+
+
+def _get_collector(standardizer) -> OddsShopperCollector:
+    return OddsShopperCollector(0, datetime(2025, 1, 1), asyncio.Queue(), standardizer)
+
+
+@pytest.mark.parametrize('slate', SLATES)
+def test_parse_betting_lines(benchmark, slate, oddsshopper_resps, standardizer):
+    events, _ = oddsshopper_resps[slate]
+    collector = _get_collector(standardizer)
+    betting_lines = benchmark(collector._parse_betting_lines, 'NBA', events)
+    assert len(betting_lines) >= SLATE_SIZES[slate]
+
+
+@pytest.mark.parametrize('slate', SLATES)
+def test_standardizer_lookups(benchmark, slate, oddsshopper_resps, standardizer):
+    # what the collectors do per event: clean + key + look up the subject, look up the market
+    events, _ = oddsshopper_resps[slate]
+    raw_names = [(event['participants'][0]['name'], event['offerName']) for event in events]
+    sport = utils.get_sport('NBA')
+
+    def standardize() -> int:
+        num_standardized = 0
+        for raw_subject_name, raw_market_name in raw_names:
+            subject_key = utils.storer.get_subject_key('NBA', utils.cleaner.clean_subject_name(raw_subject_name))
+            standardizer.standardize_subject_name(subject_key)
+            standardizer.standardize_market_name(raw_market_name, sport)
+            num_standardized += 1
+
+        return num_standardized
+
+    assert benchmark(standardize) == len(events)
+
+
+@pytest.mark.parametrize('slate', SLATES)
+def test_run_processors(benchmark, slate):
+    betting_lines = generate_betting_lines(SLATE_SIZES[slate])
+    vocabulary = Vocabulary()  # kept between rounds, like the pipeline's
+    evaluated_betting_lines = benchmark(run_processors, betting_lines, vocabulary)
+    assert evaluated_betting_lines
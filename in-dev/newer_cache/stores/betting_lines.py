@@ -1,10 +1,10 @@
-import json
 from typing import Iterable
 
 import redis.asyncio as redis
 import pandas as pd
 
 from app.cache.stores.base import DataStore
+from app.services.utils import utilities as utils
 
 
 LINE_ID_ORDERED_FIELDS = ['bookmaker', 'league', 'subject', 'market', 'label', 'line']
@@ -34,7 +34,7 @@ class BettingLines(DataStore):
     async def getlines(self, query: dict[str, str] = None) -> Iterable:
         pattern = self._get_query(query) if query else '*' # Todo: limitation...can only query for one value per field
         async for line_id, line_json in self._r.hscan_iter(self.info_name, match=pattern):
-            line_dict = json.loads(line_json)
+            line_dict = utils.serializer.loads(line_json)
             self._add_id_info_to_dict(line_id.decode('utf-8'), line_dict)
             yield line_dict
 
@@ -48,7 +48,7 @@ class BettingLines(DataStore):
         try:
             async with self._r.pipeline(transaction=True) as pipe:
                 for line in lines.to_dict(orient='records'):
-                    novel_line_info = json.dumps({k: v for k, v in line.items() if k in ['timestamp', 'dflt_odds',
+                    novel_line_info = utils.serializer.dumps({k: v for k, v in line.items() if k in ['timestamp', 'dflt_odds',
                                                                                          'odds', 'multiplier', 'ev',
                                                                                          'impl_prb', 'tw_prb']})
                     await pipe.hset(self.info_name, self._get_key(line), novel_line_info)